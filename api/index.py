@@ -15,6 +15,10 @@ sys.path.insert(0, str(parent_dir / "src"))
 os.environ.setdefault("HOST", "0.0.0.0")
 os.environ.setdefault("PORT", "8000")
 os.environ.setdefault("DEBUG", "false")
+# Start Gemini clients on the first request and keep them while the instance is warm
+os.environ.setdefault("LAZY_INIT", "true")
+# Batch jobs need a writable, persistent directory and background workers
+os.environ.setdefault("BATCH_ENABLED", "false")
 
 # Import and run FastAPI app
 from main import app
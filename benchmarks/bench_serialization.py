@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark of the completion response path.
+
+Compares the Pydantic path (models built by the converter, validated
+again through ``response_model`` and rendered by ``JSONResponse``) with
+the fast path (plain payload rendered by ``FastJSONResponse``), both as
+bare functions and through a FastAPI route. Token counting is the same
+on both paths and is replaced by a constant-cost counter.
+
+Usage:
+    python benchmarks/bench_serialization.py
+    python benchmarks/bench_serialization.py --sizes 200 20000 --choices 4
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+import time
+from pathlib import Path
+from typing import List, Dict, Any, Callable
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse
+
+from src.converters import GeminitoOpenAIConverter
+from src.models.gemini_models import ChatCompletionResponse
+from src.utils import serialization
+from src.utils.serialization import FastJSONResponse
+from src.utils.tokenizer import TokenCounter
+
+
+class LengthTokenCounter(TokenCounter):
+    """Constant-cost counter; both paths count tokens the same way, so it is left out."""
+
+    name = "length"
+
+    def count(self, text: str) -> int:
+        return len(text) // 4
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark the completion response path")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[200, 4000, 40000], help="Answer sizes in characters")
+    parser.add_argument("--choices", type=int, default=1, help="Choices per response")
+    parser.add_argument("--seconds", type=float, default=1.0, help="Measuring time per case")
+    return parser.parse_args()
+
+
+def measure(function: Callable[[], Any], seconds: float) -> float:
+    """Mean microseconds per call."""
+    function()
+    calls = 0
+    started_at = time.perf_counter()
+    while time.perf_counter() - started_at < seconds:
+        for _ in range(20):
+            function()
+        calls += 20
+    return (time.perf_counter() - started_at) / calls * 1e6
+
+
+def build_app(converter: GeminitoOpenAIConverter, texts: List[str], prompt: List[str]) -> FastAPI:
+    """App with one route per response path."""
+    app = FastAPI()
+
+    @app.post("/pydantic", response_model=ChatCompletionResponse)
+    async def pydantic_path():
+        return converter.convert_choices_response(texts, "gemini-2.5-flash", prompt_parts=prompt)
+
+    @app.post("/fast", response_model=ChatCompletionResponse)
+    async def fast_path():
+        return FastJSONResponse(converter.build_choices_payload(texts, "gemini-2.5-flash", prompt_parts=prompt))
+
+    return app
+
+
+async def call(app: FastAPI, path: str) -> bytes:
+    """Send one request through the ASGI app and collect the body."""
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "POST",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": b"",
+        "root_path": "",
+        "headers": [(b"host", b"bench")],
+        "client": ("127.0.0.1", 50000),
+        "server": ("bench", 80),
+    }
+    body = []
+
+    async def receive() -> Dict[str, Any]:
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message: Dict[str, Any]) -> None:
+        if message["type"] == "http.response.body":
+            body.append(message.get("body", b""))
+
+    await app(scope, receive, send)
+    return b"".join(body)
+
+
+async def measure_route(app: FastAPI, path: str, seconds: float) -> float:
+    """Mean microseconds per request through the app."""
+    await call(app, path)
+    calls = 0
+    started_at = time.perf_counter()
+    while time.perf_counter() - started_at < seconds:
+        for _ in range(20):
+            await call(app, path)
+        calls += 20
+    return (time.perf_counter() - started_at) / calls * 1e6
+
+
+def run_case(size: int, args: argparse.Namespace) -> Dict[str, Any]:
+    """Benchmark both paths for one answer size."""
+    converter = GeminitoOpenAIConverter(token_counter=LengthTokenCounter())
+    text = ("Gemini 回答 with some code: `x = [1, 2, 3]`\n" * (size // 40 + 1))[:size]
+    texts = [text] * args.choices
+    prompt = ["Explain the code in detail."]
+
+    def pydantic_function() -> bytes:
+        response = converter.convert_choices_response(texts, "gemini-2.5-flash", prompt_parts=prompt)
+        # FastAPI validates the returned model against response_model before rendering it
+        validated = ChatCompletionResponse.model_validate(response.model_dump())
+        return JSONResponse(validated.model_dump(mode="json")).body
+
+    def fast_function() -> bytes:
+        return FastJSONResponse(
+            converter.build_choices_payload(texts, "gemini-2.5-flash", prompt_parts=prompt)
+        ).body
+
+    # Both paths must produce the same document
+    slow, fast = json.loads(pydantic_function()), json.loads(fast_function())
+    for document in (slow, fast):
+        document.pop("id")
+        document.pop("created")
+    assert slow == fast, "fast payload differs from the Pydantic response"
+
+    app = build_app(converter, texts, prompt)
+    pydantic_route = asyncio.run(measure_route(app, "/pydantic", args.seconds))
+    fast_route = asyncio.run(measure_route(app, "/fast", args.seconds))
+    pydantic_us = measure(pydantic_function, args.seconds)
+    fast_us = measure(fast_function, args.seconds)
+
+    return {
+        "answer_chars": size,
+        "choices": args.choices,
+        "function_us": {"pydantic": round(pydantic_us, 1), "fast": round(fast_us, 1)},
+        "route_us": {"pydantic": round(pydantic_route, 1), "fast": round(fast_route, 1)},
+        "function_speedup": round(pydantic_us / fast_us, 2),
+        "route_speedup": round(pydantic_route / fast_route, 2),
+    }
+
+
+def main() -> None:
+    args = parse_args()
+    results = {
+        "encoder": serialization.BACKEND,
+        "cases": [run_case(size, args) for size in args.sizes],
+    }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
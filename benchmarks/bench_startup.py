@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+Startup benchmark of eager versus lazy (serverless) initialization.
+
+Every run starts a fresh interpreter, as a cold serverless instance
+would, and measures the import of the app, the lifespan startup, the
+first request and a second request on the warm instance. Client init
+and gem fetches are simulated by the fake upstream; ``gemini_webapi`` is
+still imported where the real client would be, when it is installed.
+
+Usage:
+    python benchmarks/bench_startup.py
+    python benchmarks/bench_startup.py --runs 10 --init-latency 0.8 --gems-latency 0.5
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import List, Dict, Any
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / "benchmarks"))
+
+MODES = ("eager", "lazy")
+PHASES = ("import_ms", "startup_ms", "first_request_ms", "warm_request_ms", "cold_total_ms")
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Compare eager and lazy startup")
+    parser.add_argument("--runs", type=int, default=5, help="Fresh processes per mode")
+    parser.add_argument("--init-latency", type=float, default=0.5, help="Simulated client init in seconds")
+    parser.add_argument("--gems-latency", type=float, default=0.3, help="Simulated gem fetch in seconds")
+    parser.add_argument("--latency", type=float, default=0.05, help="Simulated generation in seconds")
+    parser.add_argument("--child", choices=MODES, help=argparse.SUPPRESS)
+    return parser.parse_args()
+
+
+def environment(mode: str) -> Dict[str, str]:
+    """Isolated settings for one child process."""
+    env = dict(os.environ)
+    env.update({
+        "SECURE_1PSID": "bench",
+        "SECURE_1PSIDTS": "bench",
+        "GEMINI_ACCOUNTS": "[]",
+        "RATE_LIMIT_ENABLED": "false",
+        "CACHE_ENABLED": "false",
+        "BATCH_ENABLED": "false",
+        "LOG_LEVEL": "CRITICAL",
+        "WORKERS": "1",
+        "LAZY_INIT": "true" if mode == "lazy" else "false",
+    })
+    env.pop("SHARED_COOKIE_PATH", None)
+    return env
+
+
+async def request(app: Any) -> None:
+    """Send one chat completion through the app."""
+    import httpx
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        response = await client.post("/v1/chat/completions", json={
+            "model": "gemini-2.5-flash",
+            "messages": [{"role": "user", "content": "Hello"}],
+        })
+        response.raise_for_status()
+
+
+async def measure_child(args: argparse.Namespace) -> Dict[str, Any]:
+    """Measure one cold start inside this process."""
+    started_at = time.perf_counter()
+    import src.main as app_module
+    imported_at = time.perf_counter()
+    upstream_imported = "gemini_webapi" in sys.modules
+
+    import fake_gemini
+
+    def client_class() -> Any:
+        # Pay the import of the real client where the app would
+        try:
+            import gemini_webapi  # noqa: F401
+        except ImportError:
+            pass
+        return fake_gemini.FakeGeminiClient
+
+    app_module._gemini_client_class = client_class
+    fake_gemini.configure(
+        latency=args.latency,
+        init_latency=args.init_latency,
+        gems_latency=args.gems_latency,
+    )
+
+    app = app_module.app
+    async with app.router.lifespan_context(app):
+        started_up_at = time.perf_counter()
+        await request(app)
+        first_at = time.perf_counter()
+        await request(app)
+        warm_at = time.perf_counter()
+
+    return {
+        "import_ms": (imported_at - started_at) * 1000,
+        "startup_ms": (started_up_at - imported_at) * 1000,
+        "first_request_ms": (first_at - started_up_at) * 1000,
+        "warm_request_ms": (warm_at - first_at) * 1000,
+        "cold_total_ms": (first_at - started_at) * 1000,
+        "gemini_webapi_imported_by_app": upstream_imported,
+        "client_inits": fake_gemini.stats.inits,
+        "gem_fetches": fake_gemini.stats.gem_fetches,
+    }
+
+
+def run_child(args: argparse.Namespace, mode: str) -> Dict[str, Any]:
+    """Run one measurement in a fresh interpreter."""
+    command = [
+        sys.executable, __file__,
+        "--child", mode,
+        "--init-latency", str(args.init_latency),
+        "--gems-latency", str(args.gems_latency),
+        "--latency", str(args.latency),
+    ]
+    output = subprocess.run(
+        command, env=environment(mode), cwd=ROOT, capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def summarize(runs: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Median of every phase, plus the counters of the last run."""
+    summary = {phase: round(statistics.median(run[phase] for run in runs), 1) for phase in PHASES}
+    for key in ("gemini_webapi_imported_by_app", "client_inits", "gem_fetches"):
+        summary[key] = runs[-1][key]
+    return summary
+
+
+def main() -> None:
+    args = parse_args()
+    if args.child:
+        print(json.dumps(asyncio.run(measure_child(args))))
+        return
+
+    results = {
+        "config": {
+            "runs": args.runs,
+            "init_latency": args.init_latency,
+            "gems_latency": args.gems_latency,
+            "latency": args.latency,
+        },
+    }
+    for mode in MODES:
+        results[mode] = summarize([run_child(args, mode) for _ in range(args.runs)])
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
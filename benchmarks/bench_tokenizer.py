@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Benchmark the token counters.
+
+Reports the cost per KB of text for prose, CJK, code and mixed samples,
+with and without memoization, and compares counts against tiktoken when
+it is installed.
+
+Usage:
+    python benchmarks/bench_tokenizer.py [--size-kb 16] [--repeat 200]
+"""
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+# Allow running from the repository root without installing the package
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from src.utils.tokenizer import HeuristicTokenCounter, create_token_counter
+
+SAMPLES = {
+    "english": (
+        "The quick brown fox jumps over the lazy dog. Streaming responses are relayed "
+        "to the client as soon as the upstream model produces them, which keeps the "
+        "perceived latency low even for long answers.\n"
+    ),
+    "chinese": (
+        "今天的天气很好，我们一起去公园散步吧。这个接口会把 OpenAI 格式的请求转换成 "
+        "Gemini 的格式，然后把结果以流式的方式返回给客户端。\n"
+    ),
+    "japanese": "このサービスは複数のアカウントを使って負荷を分散します。応答はストリーミングで返されます。\n",
+    "code": (
+        "def convert(messages: List[ChatMessage]) -> str:\n"
+        "    parts = [f\"{m.role}: {m.content}\" for m in messages if m.content]\n"
+        "    return \"\\n\\n\".join(parts)  # 1234567890\n"
+    ),
+}
+SAMPLES["mixed"] = "".join(SAMPLES.values())
+
+
+def make_text(sample: str, size_kb: int) -> str:
+    """Repeat a sample until it reaches the requested size."""
+    repeats = size_kb * 1024 // len(sample.encode("utf-8")) + 1
+    return sample * repeats
+
+
+def time_per_kb(func, text: str, repeat: int) -> float:
+    """Time a counting function in microseconds per KB of UTF-8 text."""
+    size_kb = len(text.encode("utf-8")) / 1024
+    started_at = time.perf_counter()
+    for _ in range(repeat):
+        func(text)
+    elapsed = time.perf_counter() - started_at
+    return elapsed / repeat / size_kb * 1e6
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--size-kb", type=int, default=16, help="Text size per sample")
+    parser.add_argument("--repeat", type=int, default=200, help="Iterations per measurement")
+    args = parser.parse_args()
+
+    heuristic = HeuristicTokenCounter()
+    reference = create_token_counter("tiktoken")
+    if reference.name != "tiktoken":
+        reference = None
+
+    results = {}
+    for name, sample in SAMPLES.items():
+        text = make_text(sample, args.size_kb)
+        heuristic.count_cached(text)
+        result = {
+            "bytes": len(text.encode("utf-8")),
+            "tokens": heuristic.count(text),
+            "uncached_us_per_kb": round(time_per_kb(heuristic.count, text, args.repeat), 2),
+            "cached_us_per_kb": round(time_per_kb(heuristic.count_cached, text, args.repeat), 3),
+            "legacy_len_div_4_tokens": len(text) // 4,
+        }
+        if reference is not None:
+            exact = reference.count(text)
+            result["tiktoken_tokens"] = exact
+            result["heuristic_error_pct"] = round((result["tokens"] - exact) / exact * 100, 1)
+            result["legacy_error_pct"] = round((len(text) // 4 - exact) / exact * 100, 1)
+            result["tiktoken_us_per_kb"] = round(time_per_kb(reference.count, text, args.repeat), 2)
+        results[name] = result
+
+    # A conversation growing turn by turn only counts the new turn
+    turns = [f"User: {SAMPLES['mixed']}", f"Assistant: {SAMPLES['chinese']}"] * 20
+    fresh = HeuristicTokenCounter()
+    started_at = time.perf_counter()
+    for index in range(1, len(turns) + 1):
+        fresh.count_prompt(turns[:index])
+    results["conversation_40_turns_ms"] = round((time.perf_counter() - started_at) * 1000, 3)
+
+    print(json.dumps(results, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+"""
+Local stand-in for ``gemini_webapi.GeminiClient`` used by the benchmarks.
+
+Latency, streaming cadence and failures are configured through
+``FakeGeminiConfig``; no network access is needed.
+"""
+
+import asyncio
+import random
+import re
+import time
+from dataclasses import dataclass, field
+from typing import List, Dict, Any, Optional, AsyncIterator
+
+# Benchmarks tag every prompt so upstream time can be matched to requests
+REQUEST_TAG = re.compile(r"\[bench-(\d+)\]")
+
+
+@dataclass
+class FakeGeminiConfig:
+    """Behaviour of the fake upstream."""
+
+    # Seconds until a non-streaming response, or until the first chunk
+    latency: float = 0.05
+    # Uniform jitter added to the latency, in seconds
+    jitter: float = 0.0
+    # Streaming chunks and the delay between them
+    chunks: int = 8
+    chunk_interval: float = 0.01
+    # Words per chunk of generated text
+    chunk_words: int = 6
+    # Candidate drafts per response
+    candidates: int = 1
+    # Fraction of calls failing with ``error`` after the latency
+    error_rate: float = 0.0
+    error: str = "Upstream error injected by benchmark"
+    seed: Optional[int] = None
+    # Seconds spent by client init and by fetching gems
+    init_latency: float = 0.0
+    gems_latency: float = 0.0
+
+
+@dataclass
+class FakeGeminiStats:
+    """What the fake upstream observed."""
+
+    calls: int = 0
+    errors: int = 0
+    inits: int = 0
+    gem_fetches: int = 0
+    # Simulated upstream seconds per tagged request
+    upstream_time: Dict[int, float] = field(default_factory=dict)
+
+
+config = FakeGeminiConfig()
+stats = FakeGeminiStats()
+_random = random.Random()
+
+
+def configure(**kwargs) -> None:
+    """Replace the fake's configuration and reset its statistics."""
+    global config, stats
+    config = FakeGeminiConfig(**kwargs)
+    stats = FakeGeminiStats()
+    _random.seed(config.seed)
+
+
+class FakeCandidate:
+    """Candidate draft of a fake response."""
+
+    def __init__(self, text: str, rcid: str):
+        self.text = text
+        self.rcid = rcid
+
+
+class FakeModelOutput:
+    """Mimics ``gemini_webapi.types.ModelOutput``."""
+
+    def __init__(self, texts: List[str], text_delta: Optional[str] = None):
+        self.metadata = ["c_bench", "r_bench", "rc_bench"]
+        self.candidates = [FakeCandidate(text, f"rc_{index}") for index, text in enumerate(texts)]
+        self.text = texts[0]
+        self.text_delta = text_delta
+        self.rcid = "rc_0"
+
+
+class FakeGemJar(dict):
+    """Mimics ``gemini_webapi.types.GemJar``."""
+
+    def get(self, id: Optional[str] = None, name: Optional[str] = None, default: Any = None) -> Any:
+        return super().get(id, default)
+
+    def filter(self, name: Optional[str] = None, **kwargs) -> "FakeGemJar":
+        return FakeGemJar()
+
+
+class FakeChatSession:
+    """Mimics ``gemini_webapi.ChatSession``."""
+
+    def __init__(self, metadata: Optional[List[str]] = None, **kwargs):
+        self.metadata = list(metadata or ["", "", ""])
+
+
+def _chunk_text(index: int) -> str:
+    """Generate the text of one streaming chunk."""
+    return " ".join(f"word{index}_{word}" for word in range(config.chunk_words)) + " "
+
+
+class FakeGeminiClient:
+    """Drop-in replacement for ``GeminiClient`` with simulated latency."""
+
+    def __init__(self, secure_1psid: Optional[str] = None, secure_1psidts: Optional[str] = None, **kwargs):
+        self.cookies: Dict[str, str] = {}
+        self.gems = FakeGemJar()
+
+    async def init(self, **kwargs) -> None:
+        stats.inits += 1
+        await asyncio.sleep(config.init_latency)
+
+    async def close(self, delay: float = 0) -> None:
+        pass
+
+    async def fetch_gems(self, **kwargs) -> FakeGemJar:
+        stats.gem_fetches += 1
+        await asyncio.sleep(config.gems_latency)
+        return self.gems
+
+    def list_models(self) -> None:
+        return None
+
+    def start_chat(self, **kwargs) -> FakeChatSession:
+        return FakeChatSession(**kwargs)
+
+    async def _delay(self) -> float:
+        """Sleep for the configured latency and maybe fail."""
+        delay = config.latency + _random.uniform(0, config.jitter)
+        await asyncio.sleep(delay)
+        if _random.random() < config.error_rate:
+            stats.errors += 1
+            raise RuntimeError(config.error)
+        return delay
+
+    def _record(self, prompt: str, started_at: float) -> None:
+        """Remember the simulated upstream time of a tagged request."""
+        match = REQUEST_TAG.search(prompt)
+        if match:
+            stats.upstream_time[int(match.group(1))] = time.perf_counter() - started_at
+
+    async def generate_content(self, prompt: str, chat: Optional[FakeChatSession] = None, **kwargs) -> FakeModelOutput:
+        stats.calls += 1
+        started_at = time.perf_counter()
+        try:
+            await self._delay()
+        finally:
+            self._record(prompt, started_at)
+        text = "".join(_chunk_text(index) for index in range(config.chunks))
+        output = FakeModelOutput([text] * config.candidates)
+        if chat is not None:
+            chat.metadata = output.metadata
+        return output
+
+    async def generate_content_stream(
+        self,
+        prompt: str,
+        chat: Optional[FakeChatSession] = None,
+        **kwargs,
+    ) -> AsyncIterator[FakeModelOutput]:
+        stats.calls += 1
+        started_at = time.perf_counter()
+        try:
+            await self._delay()
+            text = ""
+            for index in range(config.chunks):
+                if index:
+                    await asyncio.sleep(config.chunk_interval)
+                delta = _chunk_text(index)
+                text += delta
+                yield FakeModelOutput([text], delta)
+        finally:
+            self._record(prompt, started_at)
+        if chat is not None:
+            chat.metadata = ["c_bench", "r_bench", "rc_bench"]
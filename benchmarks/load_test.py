@@ -0,0 +1,322 @@
+#!/usr/bin/env python3
+"""
+Load test of the ASGI app against the fake Gemini upstream.
+
+Drives the app in-process with many concurrent requests and reports
+latency percentiles, throughput, the wrapper's own overhead per request
+and memory growth as JSON. With ``--baseline`` the run fails when the
+overhead regressed beyond ``--max-regression`` percent.
+
+Usage:
+    python benchmarks/load_test.py --requests 2000 --concurrency 200
+    python benchmarks/load_test.py --stream --chunks 20 --output stream.json
+    python benchmarks/load_test.py --baseline baseline.json
+"""
+
+import argparse
+import asyncio
+import gc
+import json
+import os
+import platform
+import resource
+import statistics
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+from typing import List, Dict, Any, Optional
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / "benchmarks"))
+
+import fake_gemini
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Load test the wrapper against a fake Gemini upstream")
+    parser.add_argument("--requests", type=int, default=1000, help="Measured requests")
+    parser.add_argument("--warmup", type=int, default=100, help="Unmeasured requests sent first")
+    parser.add_argument("--concurrency", type=int, default=100, help="Requests in flight at once")
+    parser.add_argument("--stream", action="store_true", help="Use streaming completions")
+    parser.add_argument("--n", type=int, default=1, help="Choices per request")
+    parser.add_argument("--messages", type=int, default=1, help="Messages per request")
+    parser.add_argument("--message-size", type=int, default=200, help="Characters per message")
+    parser.add_argument("--latency", type=float, default=0.05, help="Upstream latency in seconds")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Upstream latency jitter in seconds")
+    parser.add_argument("--chunks", type=int, default=8, help="Chunks per response")
+    parser.add_argument("--chunk-interval", type=float, default=0.01, help="Seconds between stream chunks")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of failing upstream calls")
+    parser.add_argument("--seed", type=int, default=1, help="Random seed of the fake upstream")
+    parser.add_argument("--log-level", default="CRITICAL", help="Wrapper log level; logs share stdout with the results")
+    parser.add_argument("--tracemalloc", action="store_true", help="Also trace Python allocations (slower)")
+    parser.add_argument("--output", help="Write results to this JSON file")
+    parser.add_argument("--baseline", help="Compare against the results in this JSON file")
+    parser.add_argument("--max-regression", type=float, default=20.0, help="Allowed overhead regression in percent")
+    return parser.parse_args()
+
+
+def configure_environment(args: argparse.Namespace) -> None:
+    """Isolate the run from local settings before the app is imported."""
+    os.environ.update({
+        "SECURE_1PSID": "bench",
+        "SECURE_1PSIDTS": "bench",
+        "GEMINI_ACCOUNTS": "[]",
+        "GEMINI_ACCOUNT_MAX_INFLIGHT": str(max(args.concurrency * args.n, 1)),
+        "RATE_LIMIT_ENABLED": "false",
+        "CACHE_ENABLED": "false",
+        "BATCH_ENABLED": "false",
+        "ADMISSION_MAX_CONCURRENCY": str(max(args.concurrency * args.n, 1)),
+        "ADMISSION_MAX_QUEUE": str(max(args.requests, args.warmup)),
+        "LOG_LEVEL": args.log_level,
+        "WORKERS": "1",
+    })
+    os.environ.pop("SHARED_COOKIE_PATH", None)
+
+
+def rss_bytes() -> int:
+    """Current resident set size, falling back to the peak where unavailable."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if platform.system() == "Darwin" else peak * 1024
+
+
+def percentile(values: List[float], pct: float) -> Optional[float]:
+    """Nearest-rank percentile."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[rank]
+
+
+def summarize(values: List[float]) -> Dict[str, Optional[float]]:
+    """Latency summary in milliseconds."""
+    def ms(value: Optional[float]) -> Optional[float]:
+        return round(value * 1000, 3) if value is not None else None
+
+    return {
+        "mean": ms(statistics.fmean(values)) if values else None,
+        "p50": ms(percentile(values, 50)),
+        "p95": ms(percentile(values, 95)),
+        "p99": ms(percentile(values, 99)),
+        "max": ms(max(values)) if values else None,
+    }
+
+
+def build_payload(args: argparse.Namespace, index: int) -> Dict[str, Any]:
+    """Build a unique request, tagged so upstream time can be matched to it."""
+    filler = ("Benchmark 基准测试 payload. " * (args.message_size // 20 + 1))[: args.message_size]
+    messages = []
+    for turn in range(args.messages - 1):
+        role = "user" if turn % 2 == 0 else "assistant"
+        messages.append({"role": role, "content": filler})
+    messages.append({"role": "user", "content": f"[bench-{index}] {filler}"})
+    return {
+        "model": "gemini-2.5-flash",
+        "messages": messages,
+        "stream": args.stream,
+        "n": args.n,
+    }
+
+
+async def call_app(app: Any, payload: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Call the ASGI app directly and time the response body as it is sent.
+
+    Test transports buffer the whole body, which would hide streaming
+    behaviour such as time to first byte.
+    """
+    body = json.dumps(payload).encode()
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "POST",
+        "scheme": "http",
+        "path": "/v1/chat/completions",
+        "raw_path": b"/v1/chat/completions",
+        "query_string": b"",
+        "root_path": "",
+        "headers": [
+            (b"host", b"bench"),
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+        ],
+        "client": ("127.0.0.1", 50000),
+        "server": ("bench", 80),
+    }
+    request_sent = False
+    finished = asyncio.Event()
+    response: Dict[str, Any] = {"status": None, "first_byte": None, "chunks": []}
+    started_at = time.perf_counter()
+
+    async def receive() -> Dict[str, Any]:
+        nonlocal request_sent
+        if not request_sent:
+            request_sent = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        # The client stays connected until the response is complete
+        await finished.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message: Dict[str, Any]) -> None:
+        if message["type"] == "http.response.start":
+            response["status"] = message["status"]
+        elif message["type"] == "http.response.body":
+            chunk = message.get("body", b"")
+            if chunk:
+                if response["first_byte"] is None and b'"content"' in chunk:
+                    response["first_byte"] = time.perf_counter() - started_at
+                response["chunks"].append(chunk)
+            if not message.get("more_body", False):
+                finished.set()
+
+    await app(scope, receive, send)
+    finished.set()
+    response["latency"] = time.perf_counter() - started_at
+    response["body"] = b"".join(response["chunks"])
+    return response
+
+
+async def send(app: Any, args: argparse.Namespace, index: int) -> Dict[str, Any]:
+    """Send one request and time it."""
+    response = await call_app(app, build_payload(args, index))
+    failed = response["status"] != 200
+    if args.stream:
+        failed = failed or b'data: {"error"' in response["body"]
+    else:
+        json.loads(response["body"])
+    return {
+        "index": index,
+        "status": response["status"],
+        "failed": failed,
+        "latency": response["latency"],
+        "ttfb": response["first_byte"] if args.stream else None,
+    }
+
+
+async def drive(app: Any, args: argparse.Namespace, start: int, count: int) -> List[Dict[str, Any]]:
+    """Send requests with bounded concurrency."""
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def bounded(index: int) -> Dict[str, Any]:
+        async with semaphore:
+            return await send(app, args, index)
+
+    return await asyncio.gather(*(bounded(index) for index in range(start, start + count)))
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    """Run the warmup and the measured load against the app."""
+    import src.main as app_module
+
+    app_module.GeminiClient = fake_gemini.FakeGeminiClient
+    fake_gemini.configure(
+        latency=args.latency,
+        jitter=args.jitter,
+        chunks=args.chunks,
+        chunk_interval=args.chunk_interval,
+        error_rate=args.error_rate,
+        seed=args.seed,
+    )
+
+    app = app_module.app
+    async with app.router.lifespan_context(app):
+        await drive(app, args, 0, args.warmup)
+
+        gc.collect()
+        if args.tracemalloc:
+            tracemalloc.start()
+        rss_before = rss_bytes()
+        upstream_calls_before = fake_gemini.stats.calls
+
+        started_at = time.perf_counter()
+        results = await drive(app, args, args.warmup, args.requests)
+        elapsed = time.perf_counter() - started_at
+
+        gc.collect()
+        rss_after = rss_bytes()
+        traced = tracemalloc.get_traced_memory() if args.tracemalloc else None
+        if args.tracemalloc:
+            tracemalloc.stop()
+
+    succeeded = [result for result in results if not result["failed"]]
+    latencies = [result["latency"] for result in succeeded]
+    ttfbs = [result["ttfb"] for result in succeeded if result["ttfb"] is not None]
+    # Overhead is everything the wrapper adds on top of the simulated upstream time
+    overheads = [
+        result["latency"] - fake_gemini.stats.upstream_time[result["index"]]
+        for result in succeeded
+        if result["index"] in fake_gemini.stats.upstream_time and args.n == 1
+    ]
+
+    return {
+        "config": {key: value for key, value in vars(args).items() if key not in ("output", "baseline")},
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+        },
+        "requests": len(results),
+        "succeeded": len(succeeded),
+        "failed": len(results) - len(succeeded),
+        "upstream_calls": fake_gemini.stats.calls - upstream_calls_before,
+        "duration_seconds": round(elapsed, 3),
+        "throughput_rps": round(len(results) / elapsed, 2),
+        "latency_ms": summarize(latencies),
+        "ttfb_ms": summarize(ttfbs) if args.stream else None,
+        "overhead_ms": summarize(overheads),
+        "memory": {
+            "rss_before_bytes": rss_before,
+            "rss_after_bytes": rss_after,
+            "rss_growth_bytes": rss_after - rss_before,
+            "traced_current_bytes": traced[0] if traced else None,
+            "traced_peak_bytes": traced[1] if traced else None,
+        },
+    }
+
+
+def compare(results: Dict[str, Any], baseline_path: str, max_regression: float) -> List[str]:
+    """List overhead and throughput regressions against a baseline run."""
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+
+    regressions = []
+    for pct in ("p50", "p95", "p99"):
+        before = (baseline.get("overhead_ms") or {}).get(pct)
+        after = results["overhead_ms"][pct]
+        if before and after and (after - before) / before * 100 > max_regression:
+            regressions.append(f"overhead {pct}: {before:.3f}ms -> {after:.3f}ms")
+
+    before = baseline.get("throughput_rps")
+    after = results["throughput_rps"]
+    if before and (before - after) / before * 100 > max_regression:
+        regressions.append(f"throughput: {before:.1f} -> {after:.1f} rps")
+    return regressions
+
+
+def main() -> None:
+    args = parse_args()
+    configure_environment(args)
+    results = asyncio.run(run(args))
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+    print(output)
+
+    if args.baseline:
+        regressions = compare(results, args.baseline, args.max_regression)
+        for regression in regressions:
+            print(f"REGRESSION {regression}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -3,7 +3,7 @@ Configuration settings for the FastAPI wrapper.
 """
 
 import os
-from typing import Optional, List
+from typing import Optional, List, Dict
 from pydantic import Field
 from pydantic_settings import BaseSettings
 
@@ -15,6 +15,17 @@ class Settings(BaseSettings):
     host: str = Field(default="0.0.0.0", env="HOST")
     port: int = Field(default=8000, env="PORT")
     debug: bool = Field(default=False, env="DEBUG")
+    # Worker processes; each runs its own event loop and Gemini clients
+    workers: int = Field(default=1, env="WORKERS")
+    # Seconds to let in-flight generations finish on shutdown
+    shutdown_drain_timeout: float = Field(default=30.0, env="SHUTDOWN_DRAIN_TIMEOUT")
+    # File sharing refreshed cookies between workers; defaults to a file in
+    # the system temp directory when WORKERS > 1
+    shared_cookie_path: Optional[str] = Field(default=None, env="SHARED_COOKIE_PATH")
+    shared_cookie_sync_interval: float = Field(default=60.0, env="SHARED_COOKIE_SYNC_INTERVAL")
+    # Serverless mode: start Gemini clients on the first request instead of
+    # at startup, fetch gems on demand and keep clients across invocations
+    lazy_init: bool = Field(default=False, env="LAZY_INIT")
 
     # Gemini API settings
     secure_1psid: Optional[str] = Field(default=None, env="SECURE_1PSID")
@@ -23,6 +34,134 @@ class Settings(BaseSettings):
     gemini_timeout: int = Field(default=300, env="GEMINI_TIMEOUT")
     gemini_auto_refresh: bool = Field(default=True, env="GEMINI_AUTO_REFRESH")
 
+    # Upstream transport settings, applied to every Gemini client's connection pool
+    # Concurrent requests, and idle connections kept, per account
+    gemini_max_connections: int = Field(default=10, env="GEMINI_MAX_CONNECTIONS")
+    # Seconds an idle connection is kept for reuse
+    gemini_keepalive_expiry: float = Field(default=120.0, env="GEMINI_KEEPALIVE_EXPIRY")
+    # Multiplex requests over HTTP/2 connections; false forces HTTP/1.1
+    gemini_http2: bool = Field(default=True, env="GEMINI_HTTP2")
+    # Seconds allowed to establish a connection; gemini_timeout bounds the whole request
+    gemini_connect_timeout: float = Field(default=10.0, env="GEMINI_CONNECT_TIMEOUT")
+    # Seconds a response stream may stay silent, e.g. before its first byte, before it is reconnected
+    gemini_first_byte_timeout: float = Field(default=120.0, env="GEMINI_FIRST_BYTE_TIMEOUT")
+
+    # Gemini account pool settings
+    # JSON list of {"name": ..., "secure_1psid": ..., "secure_1psidts": ...};
+    # falls back to the single SECURE_1PSID/SECURE_1PSIDTS pair when empty
+    gemini_accounts: List[Dict[str, str]] = Field(default=[], env="GEMINI_ACCOUNTS")
+    gemini_account_max_inflight: int = Field(default=4, env="GEMINI_ACCOUNT_MAX_INFLIGHT")
+    gemini_account_cooldown: float = Field(default=30.0, env="GEMINI_ACCOUNT_COOLDOWN")
+    gemini_account_max_cooldown: float = Field(default=900.0, env="GEMINI_ACCOUNT_MAX_COOLDOWN")
+
+    # Account authentication settings
+    # Backoff before retrying an account that failed to authenticate, in seconds
+    auth_retry_base_delay: float = Field(default=5.0, env="AUTH_RETRY_BASE_DELAY")
+    auth_retry_max_delay: float = Field(default=300.0, env="AUTH_RETRY_MAX_DELAY")
+    # Seconds between proactive re-authentications of a ready account; 0 disables them
+    auth_refresh_interval: float = Field(default=3600.0, env="AUTH_REFRESH_INTERVAL")
+
+    # Health probe settings
+    # Seconds an upstream check of /health/deep is reused; probes in between never reach Gemini
+    health_probe_interval: float = Field(default=30.0, env="HEALTH_PROBE_INTERVAL")
+    health_probe_timeout: float = Field(default=10.0, env="HEALTH_PROBE_TIMEOUT")
+    # Share of admission slots and queue in use at which /health/ready reports not ready
+    health_ready_saturation: float = Field(default=0.9, env="HEALTH_READY_SATURATION")
+
+    # Upstream resilience settings
+    # Attempts per error class, including the first; quota errors retry on another account
+    retry_timeout_attempts: int = Field(default=2, env="RETRY_TIMEOUT_ATTEMPTS")
+    retry_transient_attempts: int = Field(default=3, env="RETRY_TRANSIENT_ATTEMPTS")
+    retry_quota_attempts: int = Field(default=2, env="RETRY_QUOTA_ATTEMPTS")
+    retry_base_delay: float = Field(default=0.5, env="RETRY_BASE_DELAY")
+    retry_max_delay: float = Field(default=8.0, env="RETRY_MAX_DELAY")
+    # Maximum seconds of a single non-streaming attempt; unset waits until the request deadline
+    upstream_attempt_timeout: Optional[float] = Field(default=None, env="UPSTREAM_ATTEMPT_TIMEOUT")
+    # Start a second attempt once the first is slower than this latency percentile
+    hedge_enabled: bool = Field(default=False, env="HEDGE_ENABLED")
+    hedge_percentile: float = Field(default=95.0, env="HEDGE_PERCENTILE")
+    hedge_min_samples: int = Field(default=20, env="HEDGE_MIN_SAMPLES")
+    hedge_min_delay: float = Field(default=1.0, env="HEDGE_MIN_DELAY")
+    # Fail fast per account and model once this share of recent calls failed
+    circuit_enabled: bool = Field(default=True, env="CIRCUIT_ENABLED")
+    circuit_failure_ratio: float = Field(default=0.5, env="CIRCUIT_FAILURE_RATIO")
+    circuit_min_calls: int = Field(default=10, env="CIRCUIT_MIN_CALLS")
+    circuit_window: int = Field(default=20, env="CIRCUIT_WINDOW")
+    circuit_open_seconds: float = Field(default=30.0, env="CIRCUIT_OPEN_SECONDS")
+
+    # Token counting settings
+    # Prompt tokens count the prompt actually sent: a resumed chat session sends, and is billed for, only its new turns
+    # "heuristic" (offline, CJK-aware) or "tiktoken" (exact BPE, optional dependency)
+    tokenizer_backend: str = Field(default="heuristic", env="TOKENIZER_BACKEND")
+    tokenizer_encoding: str = Field(default="o200k_base", env="TOKENIZER_ENCODING")
+    tokenizer_cache_size: int = Field(default=4096, env="TOKENIZER_CACHE_SIZE")
+
+    # Model catalog settings
+    # Seconds between rediscoveries of the models and gems of every account
+    model_refresh_interval: float = Field(default=600.0, env="MODEL_REFRESH_INTERVAL")
+    # Seconds clients may cache /v1/models
+    model_list_max_age: int = Field(default=60, env="MODEL_LIST_MAX_AGE")
+    # Gemini model serving gems addressed as "gem-<gem id>" model ids
+    gem_model: str = Field(default="unspecified", env="GEM_MODEL")
+
+    # Attachment settings
+    # Directory for base64 images and files decoded from requests; defaults to a temp directory
+    attachment_dir: Optional[str] = Field(default=None, env="ATTACHMENT_DIR")
+    # Decoded files kept for reuse by later turns, in bytes
+    attachment_cache_bytes: int = Field(default=256 * 1024 * 1024, env="ATTACHMENT_CACHE_BYTES")
+    attachment_max_bytes: int = Field(default=20 * 1024 * 1024, env="ATTACHMENT_MAX_BYTES")
+    # Attachments with a larger base64 payload are decoded to disk as soon as the request is parsed; 0 disables
+    attachment_spill_bytes: int = Field(default=256 * 1024, env="ATTACHMENT_SPILL_BYTES")
+
+    # Request body settings
+    # Largest request body accepted on /v1/chat/ endpoints; larger ones get a 413
+    max_request_bytes: int = Field(default=32 * 1024 * 1024, env="MAX_REQUEST_BYTES")
+    # Bodies larger than this are buffered in a temp file while they are received
+    request_spool_bytes: int = Field(default=1024 * 1024, env="REQUEST_SPOOL_BYTES")
+    # Spooled bodies parsed at once; bodies in memory stay under this times MAX_REQUEST_BYTES
+    max_concurrent_large_bodies: int = Field(default=4, gt=0, env="MAX_CONCURRENT_LARGE_BODIES")
+
+    # Prompt settings
+    # Context budget in characters for the flattened conversation; 0 sends every turn
+    prompt_max_chars: int = Field(default=0, env="PROMPT_MAX_CHARS")
+    # "truncate" drops the oldest turns, "summarize" keeps the start of each dropped turn
+    prompt_overflow: str = Field(default="truncate", env="PROMPT_OVERFLOW")
+    prompt_summary_chars: int = Field(default=200, env="PROMPT_SUMMARY_CHARS")
+
+    # Conversation session settings
+    session_enabled: bool = Field(default=True, env="SESSION_ENABLED")
+    session_max_entries: int = Field(default=10000, env="SESSION_MAX_ENTRIES")
+    session_ttl: float = Field(default=3600.0, env="SESSION_TTL")
+
+    # Response cache settings
+    cache_enabled: bool = Field(default=False, env="CACHE_ENABLED")
+    cache_max_entries: int = Field(default=1024, env="CACHE_MAX_ENTRIES")
+    cache_max_bytes: int = Field(default=64 * 1024 * 1024, env="CACHE_MAX_BYTES")
+    cache_ttl: float = Field(default=3600.0, env="CACHE_TTL")
+    cache_disk_path: Optional[str] = Field(default=None, env="CACHE_DISK_PATH")
+    cache_disk_max_entries: int = Field(default=100000, env="CACHE_DISK_MAX_ENTRIES")
+
+    # Request coalescing settings
+    coalesce_enabled: bool = Field(default=True, env="COALESCE_ENABLED")
+
+    # Admission control settings
+    admission_enabled: bool = Field(default=True, env="ADMISSION_ENABLED")
+    admission_max_concurrency: int = Field(default=32, env="ADMISSION_MAX_CONCURRENCY")
+    admission_max_queue: int = Field(default=256, env="ADMISSION_MAX_QUEUE")
+    # Defaults to gemini_timeout; clients may shorten it with X-Request-Timeout
+    admission_request_timeout: Optional[float] = Field(default=None, env="ADMISSION_REQUEST_TIMEOUT")
+    # JSON map of API key to priority class ("high", "normal" or "low")
+    admission_priority_keys: Dict[str, str] = Field(default={}, env="ADMISSION_PRIORITY_KEYS")
+
+    # Batch settings
+    # Off by default; batches are kept in BATCH_DIR relative to the working directory
+    batch_enabled: bool = Field(default=False, env="BATCH_ENABLED")
+    batch_dir: str = Field(default="batches", env="BATCH_DIR")
+    batch_concurrency: int = Field(default=4, env="BATCH_CONCURRENCY")
+    batch_max_retries: int = Field(default=3, env="BATCH_MAX_RETRIES")
+    batch_retry_backoff: float = Field(default=2.0, env="BATCH_RETRY_BACKOFF")
+    batch_max_requests: int = Field(default=50000, env="BATCH_MAX_REQUESTS")
+
     # CORS settings
     cors_origins: str = Field(
         default="*",
@@ -39,6 +178,13 @@ class Settings(BaseSettings):
 
     # Logging settings
     log_level: str = Field(default="INFO", env="LOG_LEVEL")
+    # "json" writes one structured record per line, "text" the classic format
+    log_format: str = Field(default="json", env="LOG_FORMAT")
+    # Records buffered for the background writer; further records are dropped
+    log_queue_size: int = Field(default=10000, env="LOG_QUEUE_SIZE")
+    # Records below WARNING let through per source line and window; 0 disables sampling
+    log_sample_burst: int = Field(default=20, env="LOG_SAMPLE_BURST")
+    log_sample_window: float = Field(default=1.0, env="LOG_SAMPLE_WINDOW")
 
     # API settings
     api_title: str = Field(default="Gemini API Wrapper", env="API_TITLE")
@@ -50,8 +196,15 @@ class Settings(BaseSettings):
 
     # Rate limiting
     rate_limit_enabled: bool = Field(default=False, env="RATE_LIMIT_ENABLED")
-    rate_limit_requests: int = Field(default=60, env="RATE_LIMIT_REQUESTS")
-    rate_limit_window: int = Field(default=60, env="RATE_LIMIT_WINDOW")
+    rate_limit_requests: int = Field(default=60, gt=0, env="RATE_LIMIT_REQUESTS")
+    rate_limit_window: int = Field(default=60, gt=0, env="RATE_LIMIT_WINDOW")
+    rate_limit_burst: Optional[int] = Field(default=None, gt=0, env="RATE_LIMIT_BURST")
+    # "memory" keeps buckets per process; "sqlite" shares them between workers
+    rate_limit_backend: str = Field(default="memory", env="RATE_LIMIT_BACKEND")
+    rate_limit_backend_path: str = Field(default="rate_limit.db", env="RATE_LIMIT_BACKEND_PATH")
+    rate_limit_trust_forwarded: bool = Field(default=False, env="RATE_LIMIT_TRUST_FORWARDED")
+    # JSON list of API keys given their own bucket; other callers are limited per client IP
+    rate_limit_api_keys: List[str] = Field(default=[], env="RATE_LIMIT_API_KEYS")
 
     class Config:
         env_file = ".env"
@@ -2,7 +2,8 @@
 Converters for transforming between OpenAI and Gemini API formats.
 """
 
+from .prompt_builder import PromptBuilder
 from .request_converter import OpenAItoGeminiConverter
 from .response_converter import GeminitoOpenAIConverter
 
-__all__ = ["OpenAItoGeminiConverter", "GeminitoOpenAIConverter"]
\ No newline at end of file
+__all__ = ["OpenAItoGeminiConverter", "GeminitoOpenAIConverter", "PromptBuilder"]
\ No newline at end of file
@@ -0,0 +1,204 @@
+"""
+Prompt builder flattening chat messages into a single Gemini prompt.
+"""
+
+import hashlib
+from typing import List, Optional, Tuple
+from src.models.gemini_models import ChatMessage
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Strategies for conversations longer than the context budget
+OVERFLOW_STRATEGIES = ("truncate", "summarize")
+
+
+class PromptBuilder:
+    """
+    Formats chat messages as ``Role: content`` parts joined by blank lines.
+
+    All system messages are merged, in order, into one leading system part.
+    When a context budget is set, the oldest turns are dropped until the
+    prompt fits and are replaced by a marker or a short extractive summary.
+    The prompt is assembled from fragments with a single join, so message
+    contents are copied once.
+    """
+
+    SEPARATOR = "\n\n"
+    PREFIXES = {"system": "System: ", "user": "User: ", "assistant": "Assistant: "}
+    OMITTED_MARKER = "[{count} earlier messages omitted]"
+
+    def __init__(self, max_chars: int = 0, overflow: str = "truncate", summary_chars: int = 200):
+        """
+        Initialize the builder.
+
+        Args:
+            max_chars: Context budget in characters; 0 disables the budget
+            overflow: "truncate" drops the oldest turns, "summarize" also
+                keeps the start of each dropped turn
+            summary_chars: Characters kept from each dropped turn when summarizing
+        """
+        if overflow not in OVERFLOW_STRATEGIES:
+            logger.warning(f"Unknown prompt overflow strategy '{overflow}', truncating instead")
+            overflow = "truncate"
+        self.max_chars = max(0, max_chars)
+        self.overflow = overflow
+        self.summary_chars = max(1, summary_chars)
+
+    def build(self, messages: List[ChatMessage]) -> str:
+        """
+        Build the prompt sent to Gemini.
+
+        Args:
+            messages: List of OpenAI messages
+
+        Returns:
+            Prompt text
+        """
+        return self.build_with_stats(messages)[0]
+
+    def build_with_stats(self, messages: List[ChatMessage]) -> Tuple[str, int]:
+        """
+        Build the prompt and report how many turns did not fit the budget.
+
+        Args:
+            messages: List of OpenAI messages
+
+        Returns:
+            Prompt text and the number of dropped turns
+        """
+        prompt, _, dropped = self.build_with_layout(messages)
+        return prompt, dropped
+
+    def build_with_layout(self, messages: List[ChatMessage]) -> Tuple[str, List[List[str]], int]:
+        """
+        Build the prompt and keep the fragments it was joined from.
+
+        The fragments reference the message contents, so keeping them
+        costs no copy of the conversation.
+
+        Args:
+            messages: List of OpenAI messages
+
+        Returns:
+            Prompt text, the fragments of every prompt part, system prompt
+            first, and the number of dropped turns
+        """
+        layout, dropped = self._layout(messages)
+        fragments: List[str] = []
+        for index, part in enumerate(layout):
+            if index:
+                fragments.append(self.SEPARATOR)
+            fragments.extend(part)
+        return "".join(fragments), layout, dropped
+
+    def _layout(self, messages: List[ChatMessage]) -> Tuple[List[List[str]], int]:
+        """
+        Select the turns that fit the budget and lay out their fragments.
+
+        Returns:
+            Fragments of every prompt part and the number of dropped turns
+        """
+        system: List[str] = []
+        turns: List[Tuple[str, str]] = []
+        for message in messages:
+            role = message.role.value
+            if role == "system":
+                content = message.text()
+                if content:
+                    system.extend((self.SEPARATOR, content) if system else (content,))
+            elif role in self.PREFIXES:
+                turns.append((self.PREFIXES[role], message.text()))
+
+        layout: List[List[str]] = []
+        used = 0
+        if system:
+            layout.append([self.PREFIXES["system"], *system])
+            used = len(self.PREFIXES["system"]) + sum(len(fragment) for fragment in system)
+
+        if not self.max_chars or not turns:
+            layout.extend([prefix, content] for prefix, content in turns)
+            return layout, 0
+
+        total = used + sum(len(prefix) + len(content) + len(self.SEPARATOR) for prefix, content in turns)
+        if total <= self.max_chars:
+            layout.extend([prefix, content] for prefix, content in turns)
+            return layout, 0
+
+        # Leave room for what replaces the dropped turns
+        available = self.max_chars - used
+        if self.overflow == "summarize":
+            summary_budget = available // 4
+        else:
+            summary_budget = len(self.OMITTED_MARKER) + 16
+        available -= summary_budget
+        kept, available = self._fit_turns(turns, available)
+        dropped = len(turns) - len(kept)
+
+        if dropped:
+            if self.overflow == "summarize":
+                # A latest turn longer than its share leaves less room for the summary
+                layout.append(self._summary(turns[:dropped], summary_budget + min(available, 0)))
+            else:
+                layout.append([self.OMITTED_MARKER.format(count=dropped)])
+        layout.extend(kept)
+
+        return layout, dropped
+
+    def _fit_turns(self, turns: List[Tuple[str, str]], available: int) -> Tuple[List[List[str]], int]:
+        """
+        Keep the newest turns that fit, cutting the start of the latest turn if needed.
+
+        Returns:
+            Fragments of the kept turns and the characters left over, negative
+            when the latest turn alone took more than was available
+        """
+        prefix, content = turns[-1]
+        # The latest turn keeps at least half the budget, even after a long system prompt
+        room = max(available, self.max_chars // 2) - len(prefix) - len(self.SEPARATOR)
+        if len(content) > room:
+            marker = "[truncated] "
+            content = content[len(content) - max(room - len(marker), 0):]
+            kept = [[prefix, marker, content]]
+        else:
+            kept = [[prefix, content]]
+        available -= sum(len(fragment) for fragment in kept[0]) + len(self.SEPARATOR)
+
+        for prefix, content in reversed(turns[:-1]):
+            cost = len(prefix) + len(content) + len(self.SEPARATOR)
+            if cost > available:
+                break
+            kept.append([prefix, content])
+            available -= cost
+
+        kept.reverse()
+        return kept, available
+
+    def _summary(self, dropped: List[Tuple[str, str]], budget: int) -> List[str]:
+        """Summarize dropped turns by their openings, newest first within the budget."""
+        header = f"Summary of {len(dropped)} earlier messages"
+        # The header may still gain a count of the turns left out
+        budget -= len(header) + 24
+        lines: List[str] = []
+        for prefix, content in reversed(dropped):
+            excerpt = " ".join(content[:self.summary_chars].split())
+            if len(content) > self.summary_chars:
+                excerpt += "…"
+            line = f"- {prefix}{excerpt}"
+            if len(line) + 1 > budget:
+                break
+            lines.append(line)
+            budget -= len(line) + 1
+
+        lines.reverse()
+        omitted = len(dropped) - len(lines)
+        if omitted:
+            header += f" ({omitted} not shown)"
+        return [header + ":", *("\n" + line for line in lines)]
+
+
+def prompt_digest(prompt: str) -> Optional[str]:
+    """Short content hash identifying a prompt in logs without logging it."""
+    if not prompt:
+        return None
+    return hashlib.sha256(prompt.encode("utf-8", "surrogatepass")).hexdigest()[:16]
@@ -2,59 +2,88 @@
 Converter for transforming OpenAI chat completion requests to Gemini API format.
 """
 
-from typing import List, Optional, Dict, Any
-from src.models.gemini_models import ChatCompletionRequest, ChatMessage
+import hashlib
+import json
+from typing import List, Optional, Dict, Any, Tuple
+from src.models.gemini_models import ChatCompletionRequest, ChatMessage, ContentPart
+from .prompt_builder import PromptBuilder, prompt_digest
 import logging
 
 logger = logging.getLogger(__name__)
 
 
+# Static model ids, accepting both GPT-style names (for compatibility) and Gemini names
+MODEL_ALIASES = {
+    # GPT-style names (for backward compatibility)
+    "gpt-4": "gemini-2.5-pro",
+    "gpt-4-turbo": "gemini-2.5-pro",
+    "gpt-3.5-turbo": "gemini-2.5-flash",
+    "gpt-3.5-turbo-16k": "gemini-2.5-flash",
+    # Gemini names (passed through directly)
+    "gemini-2.5-pro": "gemini-2.5-pro",
+    "gemini-2.5-flash": "gemini-2.5-flash",
+    "gemini-3.0-pro": "gemini-3.0-pro",
+    "unspecified": "unspecified",
+}
+
+
 class OpenAItoGeminiConverter:
     """Converts OpenAI format requests to Gemini format."""
 
-    def __init__(self):
-        """Initialize the converter."""
-        # Use Gemini model names directly
-        # Accept both GPT-style names (for compatibility) and Gemini names
-        self.model_mapping = {
-            # GPT-style names (for backward compatibility)
-            "gpt-4": "gemini-2.5-pro",
-            "gpt-4-turbo": "gemini-2.5-pro",
-            "gpt-3.5-turbo": "gemini-2.5-flash",
-            "gpt-3.5-turbo-16k": "gemini-2.5-flash",
-            # Gemini names (passed through directly)
-            "gemini-2.5-pro": "gemini-2.5-pro",
-            "gemini-2.5-flash": "gemini-2.5-flash",
-            "gemini-3.0-pro": "gemini-3.0-pro",
-            "unspecified": "unspecified",
-        }
+    def __init__(
+        self,
+        prompt_builder: Optional[PromptBuilder] = None,
+        model_registry: Optional[Any] = None,
+    ):
+        """
+        Initialize the converter.
 
-    def convert_request(self, request: ChatCompletionRequest) -> Dict[str, Any]:
+        Args:
+            prompt_builder: Builder flattening messages into the prompt;
+                defaults to one without a context budget
+            model_registry: ``ModelRegistry`` routing model ids, including
+                discovered models and gems; defaults to the static aliases
+        """
+        self.prompt_builder = prompt_builder or PromptBuilder()
+        self.model_registry = model_registry
+        self.model_mapping = dict(MODEL_ALIASES)
+
+    def convert_request(
+        self,
+        request: ChatCompletionRequest,
+        history_length: int = 0,
+    ) -> Dict[str, Any]:
         """
         Convert OpenAI chat completion request to Gemini format.
 
         Args:
             request: OpenAI chat completion request
+            history_length: Number of leading messages the Gemini chat
+                session already holds; only the remaining turns are sent
 
         Returns:
-            Dictionary with Gemini-compatible parameters
+            Dictionary with Gemini-compatible parameters; ``prompt_parts``
+            holds the fragments of every part of the prompt, for counting
+            the tokens actually sent
         """
         try:
             # Extract conversation history
-            conversation = self._convert_messages(request.messages)
+            messages = request.messages[history_length:] if history_length else request.messages
+            conversation, prompt_parts, dropped = self.prompt_builder.build_with_layout(messages)
 
-            # Get mapped model or use provided model
-            gemini_model = self.model_mapping.get(request.model, request.model)
+            # Get mapped model or use provided model; gem model ids also select a gem
+            gemini_model, gem = self.route_model(request.model)
 
             # Build Gemini request parameters
             gemini_params = {
                 "prompt": conversation,
+                "prompt_parts": prompt_parts,
                 "model": gemini_model,
             }
 
             # Add optional parameters
-            if request.gem_id:
-                gemini_params["gem"] = request.gem_id
+            if request.gem_id or gem:
+                gemini_params["gem"] = request.gem_id or gem
 
             if request.files:
                 gemini_params["files"] = request.files
@@ -66,7 +95,13 @@ class OpenAItoGeminiConverter:
             if request.max_tokens is not None:
                 gemini_params["max_tokens"] = request.max_tokens
 
-            logger.info(f"Converted OpenAI request to Gemini format: {gemini_params}")
+            # Prompts can be huge and private, so only their size and hash are logged
+            if logger.isEnabledFor(logging.INFO):
+                logger.info(
+                    f"Converted OpenAI request to Gemini format: model={gemini_model}, "
+                    f"messages={len(messages)}, dropped={dropped}, prompt_chars={len(conversation)}, "
+                    f"prompt_sha256={prompt_digest(conversation)}, files={len(request.files or [])}"
+                )
             return gemini_params
 
         except Exception as e:
@@ -83,30 +118,51 @@ class OpenAItoGeminiConverter:
         Returns:
             Formatted conversation string for Gemini
         """
-        conversation_parts = []
-        system_prompt = None
+        return self.prompt_builder.build(messages)
+
+    def attachment_parts(self, request: ChatCompletionRequest, history_length: int = 0) -> List[ContentPart]:
+        """
+        Collect the images and files of the turns sent to Gemini.
 
-        for message in messages:
-            if message.role == "system":
-                system_prompt = message.content
-                continue
+        Attachments of turns a resumed chat session already holds are not
+        sent again.
 
-            # Format message for Gemini
-            if message.role == "user":
-                prefix = "User: "
-            elif message.role == "assistant":
-                prefix = "Assistant: "
-            else:
-                continue  # Skip other roles
+        Args:
+            request: OpenAI chat completion request
+            history_length: Number of leading messages the Gemini chat
+                session already holds
 
-            content = message.content or ""
-            conversation_parts.append(f"{prefix}{content}")
+        Returns:
+            Attachment content parts in order of appearance
+        """
+        messages = request.messages[history_length:] if history_length else request.messages
+        return [part for message in messages for part in message.attachments()]
 
-        # Add system prompt at the beginning if present
-        if system_prompt:
-            conversation_parts.insert(0, f"System: {system_prompt}")
+    def fingerprint(self, request: ChatCompletionRequest) -> str:
+        """
+        Compute a canonical hash of everything that shapes the Gemini output.
 
-        return "\n\n".join(conversation_parts)
+        Requests that differ only in ignored sampling parameters or in
+        field order share a fingerprint.
+
+        Args:
+            request: OpenAI chat completion request
+
+        Returns:
+            Hex digest identifying the request
+        """
+        model, gem = self.route_model(request.model)
+        canonical = {
+            "model": model,
+            "messages": [
+                [message.role.value, message.identity()] for message in request.messages
+            ],
+            "gem": request.gem_id or gem,
+            "files": request.files or [],
+            "n": request.n or 1,
+        }
+        encoded = json.dumps(canonical, ensure_ascii=False, separators=(",", ":"))
+        return hashlib.sha256(encoded.encode("utf-8", "surrogatepass")).hexdigest()
 
     def map_model(self, openai_model: str) -> str:
         """
@@ -118,4 +174,18 @@ class OpenAItoGeminiConverter:
         Returns:
             Mapped Gemini model name
         """
-        return self.model_mapping.get(openai_model, openai_model)
\ No newline at end of file
+        return self.route_model(openai_model)[0]
+
+    def route_model(self, openai_model: str) -> Tuple[str, Optional[str]]:
+        """
+        Map a model id to the Gemini model and gem serving it.
+
+        Args:
+            openai_model: Model id from the request
+
+        Returns:
+            Gemini model name and gem id, if the id addresses a gem
+        """
+        if self.model_registry is not None:
+            return self.model_registry.route(openai_model)
+        return self.model_mapping.get(openai_model, openai_model), None
\ No newline at end of file
@@ -4,16 +4,20 @@ Converter for transforming Gemini API responses to OpenAI format.
 
 import time
 import uuid
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, AsyncIterator
 from src.models.gemini_models import (
     ChatCompletionResponse,
-    Choice,
-    ChatMessage,
+    ChatCompletionChunk,
+    ChunkChoice,
+    DeltaMessage,
     Usage,
     ModelInfo,
     ModelsResponse,
     Role,
 )
+from src.utils.exceptions import map_upstream_error
+from src.utils.serialization import dumps
+from src.utils.tokenizer import PromptPart, TokenCounter, HeuristicTokenCounter
 import logging
 
 logger = logging.getLogger(__name__)
@@ -22,8 +26,15 @@ logger = logging.getLogger(__name__)
 class GeminitoOpenAIConverter:
     """Converts Gemini format responses to OpenAI format."""
 
-    def __init__(self):
-        """Initialize the converter."""
+    def __init__(self, token_counter: Optional[TokenCounter] = None):
+        """
+        Initialize the converter.
+
+        Args:
+            token_counter: Counter used for usage reporting; defaults to
+                the heuristic counter
+        """
+        self.token_counter = token_counter or HeuristicTokenCounter()
         # Keep original Gemini model names
         # No mapping needed - return the model name as-is
         self.model_mapping = {}  # Empty dict means no mapping, return model names as-is
@@ -33,6 +44,7 @@ class GeminitoOpenAIConverter:
         gemini_response: Any,
         model: str,
         request_id: Optional[str] = None,
+        prompt_parts: Optional[List[PromptPart]] = None,
     ) -> ChatCompletionResponse:
         """
         Convert Gemini response to OpenAI chat completion format.
@@ -41,55 +53,279 @@ class GeminitoOpenAIConverter:
             gemini_response: Gemini API response
             model: Model name used for the request
             request_id: Optional request ID
+            prompt_parts: Parts of the prompt sent, counted for usage
 
         Returns:
             OpenAI-compatible chat completion response
         """
-        try:
-            # Generate response ID
-            response_id = request_id or f"chatcmpl-{uuid.uuid4().hex[:8]}"
-            timestamp = int(time.time())
-
-            # Extract text from Gemini response
-            text_content = getattr(gemini_response, 'text', '')
-
-            # Create choice
-            choice = Choice(
-                index=0,
-                message=ChatMessage(
-                    role=Role.ASSISTANT,
-                    content=text_content,
-                ),
-                finish_reason="stop",
-            )
+        # Extract text from Gemini response
+        text_content = getattr(gemini_response, 'text', '')
+        return self.convert_choices_response([text_content], model, request_id, prompt_parts)
 
-            # Create usage info (estimated)
-            usage = Usage(
-                prompt_tokens=self._estimate_tokens(str(gemini_response.metadata) if hasattr(gemini_response, 'metadata') else ''),
-                completion_tokens=self._estimate_tokens(text_content),
-                total_tokens=0,
-            )
-            usage.total_tokens = usage.prompt_tokens + usage.completion_tokens
+    def build_chat_payload(
+        self,
+        gemini_response: Any,
+        model: str,
+        request_id: Optional[str] = None,
+        prompt_parts: Optional[List[PromptPart]] = None,
+    ) -> Dict[str, Any]:
+        """
+        Build an OpenAI chat completion payload from a Gemini response.
+
+        Args:
+            gemini_response: Gemini API response
+            model: Model name used for the request
+            request_id: Optional request ID
+            prompt_parts: Parts of the prompt sent, counted for usage
 
-            # Use original model name
-            openai_model = model
+        Returns:
+            JSON-compatible chat completion
+        """
+        text_content = getattr(gemini_response, 'text', '')
+        return self.build_choices_payload([text_content], model, request_id, prompt_parts)
 
-            # Create response
-            response = ChatCompletionResponse(
-                id=response_id,
-                created=timestamp,
-                model=openai_model,
-                choices=[choice],
-                usage=usage,
-            )
+    def convert_choices_response(
+        self,
+        texts: List[str],
+        model: str,
+        request_id: Optional[str] = None,
+        prompt_parts: Optional[List[PromptPart]] = None,
+    ) -> ChatCompletionResponse:
+        """
+        Convert generated texts to an OpenAI chat completion with one choice each.
+
+        Args:
+            texts: Generated texts, in choice order
+            model: Model name used for the request
+            request_id: Optional request ID
+            prompt_parts: Parts of the prompt sent, counted for usage
+
+        Returns:
+            OpenAI-compatible chat completion response
+        """
+        return ChatCompletionResponse(**self.build_choices_payload(texts, model, request_id, prompt_parts))
+
+    def build_choices_payload(
+        self,
+        texts: List[str],
+        model: str,
+        request_id: Optional[str] = None,
+        prompt_parts: Optional[List[PromptPart]] = None,
+    ) -> Dict[str, Any]:
+        """
+        Build an OpenAI chat completion payload with one choice per text.
+
+        The payload has the shape of ``ChatCompletionResponse`` but is built
+        as plain dictionaries, ready for ``FastJSONResponse`` without
+        another round of validation.
+
+        Args:
+            texts: Generated texts, in choice order
+            model: Model name used for the request
+            request_id: Optional request ID
+            prompt_parts: Parts of the prompt sent, counted for usage
+
+        Returns:
+            JSON-compatible chat completion
+        """
+        try:
+            payload = {
+                "id": request_id or f"chatcmpl-{uuid.uuid4().hex[:8]}",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                # Use original model name
+                "model": model,
+                "choices": [
+                    {
+                        "index": index,
+                        "message": {
+                            "role": Role.ASSISTANT.value,
+                            "content": text,
+                            "name": None,
+                            "tool_calls": None,
+                            "tool_call_id": None,
+                        },
+                        "finish_reason": "stop",
+                        "logprobs": None,
+                    }
+                    for index, text in enumerate(texts)
+                ],
+                "usage": self.count_usage(prompt_parts or [], texts),
+            }
 
             logger.info(f"Converted Gemini response to OpenAI format")
-            return response
+            return payload
 
         except Exception as e:
             logger.error(f"Error converting response: {str(e)}")
             raise
 
+    def convert_cached_response(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Rebuild a cached chat completion under a fresh ID and timestamp.
+
+        Args:
+            payload: Cached chat completion payload
+
+        Returns:
+            JSON-compatible chat completion
+        """
+        return {
+            **payload,
+            "id": f"chatcmpl-{uuid.uuid4().hex[:8]}",
+            "created": int(time.time()),
+        }
+
+    async def convert_chat_stream(
+        self,
+        gemini_stream: AsyncIterator[Any],
+        model: str,
+        request_id: Optional[str] = None,
+    ) -> AsyncIterator[str]:
+        """
+        Convert a stream of Gemini outputs to OpenAI server-sent events.
+
+        Args:
+            gemini_stream: Async iterator of partial Gemini outputs
+            model: Model name used for the request
+            request_id: Optional request ID
+
+        Yields:
+            SSE-formatted ``chat.completion.chunk`` events, ending with ``[DONE]``
+        """
+        response_id = request_id or f"chatcmpl-{uuid.uuid4().hex[:8]}"
+        timestamp = int(time.time())
+
+        yield self.format_sse(
+            self._stream_chunk_payload(response_id, timestamp, model, {"role": Role.ASSISTANT.value})
+        )
+
+        try:
+            previous_text = ""
+            async for gemini_output in gemini_stream:
+                delta = self._extract_text_delta(gemini_output, previous_text)
+                previous_text = getattr(gemini_output, 'text', '') or ''
+                if delta:
+                    yield self.format_sse(
+                        self._stream_chunk_payload(response_id, timestamp, model, {"content": delta})
+                    )
+
+            yield self.format_sse(
+                self._stream_chunk_payload(response_id, timestamp, model, {}, finish_reason="stop")
+            )
+
+        except Exception as e:
+            # Headers are already sent, so report the failure in-band
+            logger.error(f"Error while streaming response: {str(e)}")
+            error = map_upstream_error(e, model)
+            yield self.format_sse(
+                self.convert_error_response(
+                    f"Stream interrupted: {error.message}", error.error_type, error.status_code
+                )
+            )
+
+        yield "data: [DONE]\n\n"
+
+    def convert_stream_chunk(
+        self,
+        response_id: str,
+        created: int,
+        model: str,
+        content: Optional[str] = None,
+        role: Optional[Role] = None,
+        finish_reason: Optional[str] = None,
+    ) -> ChatCompletionChunk:
+        """
+        Build a single OpenAI chat completion chunk.
+
+        Args:
+            response_id: ID shared by all chunks of the response
+            created: Creation timestamp shared by all chunks
+            model: Model name used for the request
+            content: Text delta carried by this chunk
+            role: Role announced by the first chunk
+            finish_reason: Finish reason carried by the last chunk
+
+        Returns:
+            OpenAI-compatible chat completion chunk
+        """
+        return ChatCompletionChunk(
+            id=response_id,
+            created=created,
+            model=model,
+            choices=[
+                ChunkChoice(
+                    index=0,
+                    delta=DeltaMessage(role=role, content=content),
+                    finish_reason=finish_reason,
+                )
+            ],
+        )
+
+    def _stream_chunk_payload(
+        self,
+        response_id: str,
+        created: int,
+        model: str,
+        delta: Dict[str, Any],
+        finish_reason: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """Build a chunk as plain dictionaries, equal to a serialized ``convert_stream_chunk``."""
+        return {
+            "id": response_id,
+            "object": "chat.completion.chunk",
+            "created": created,
+            "model": model,
+            "choices": [
+                {
+                    "index": 0,
+                    "delta": delta,
+                    "finish_reason": finish_reason,
+                    "logprobs": None,
+                }
+            ],
+        }
+
+    def format_sse(self, payload: Any) -> str:
+        """
+        Format a chunk or error body as a server-sent event.
+
+        Args:
+            payload: Chunk model or JSON-compatible dictionary
+
+        Returns:
+            SSE ``data:`` line terminated by a blank line
+        """
+        if isinstance(payload, ChatCompletionChunk):
+            payload = payload.model_dump(mode="json")
+            # OpenAI only sends the delta fields that are set
+            for choice in payload["choices"]:
+                choice["delta"] = {
+                    key: value for key, value in choice["delta"].items() if value is not None
+                }
+        return f"data: {dumps(payload).decode('utf-8')}\n\n"
+
+    def _extract_text_delta(self, gemini_output: Any, previous_text: str) -> str:
+        """
+        Get the text added by a partial Gemini output.
+
+        Args:
+            gemini_output: Partial Gemini output
+            previous_text: Accumulated text of the previous output
+
+        Returns:
+            Newly generated text
+        """
+        text_delta = getattr(gemini_output, 'text_delta', None)
+        if text_delta is not None:
+            return text_delta
+
+        # Older clients only expose the accumulated text
+        text = getattr(gemini_output, 'text', '') or ''
+        if text.startswith(previous_text):
+            return text[len(previous_text):]
+        return text
+
     def convert_models_list(self, available_models: List[str]) -> ModelsResponse:
         """
         Convert list of available Gemini models to OpenAI models format.
@@ -116,22 +352,40 @@ class GeminitoOpenAIConverter:
             data=model_data,
         )
 
-    def _estimate_tokens(self, text: str) -> int:
+    def build_usage(self, prompt_parts: List[PromptPart], completion_texts: List[str]) -> Usage:
         """
-        Estimate token count (rough approximation).
+        Count prompt and completion tokens.
+
+        Prompt parts are memoized individually, so earlier turns resent
+        with every request are only counted once.
 
         Args:
-            text: Text to estimate tokens for
+            prompt_parts: Parts of the prompt sent
+            completion_texts: Generated text of every choice
 
         Returns:
-            Estimated token count
+            Token usage
         """
-        if not text:
-            return 0
+        return Usage(**self.count_usage(prompt_parts, completion_texts))
 
-        # Rough estimation: ~4 characters per token for English
-        # This is a simplified estimation - in production, use a proper tokenizer
-        return max(1, len(text) // 4)
+    def count_usage(self, prompt_parts: List[PromptPart], completion_texts: List[str]) -> Dict[str, int]:
+        """
+        Count prompt and completion tokens as a usage payload.
+
+        Args:
+            prompt_parts: Parts of the prompt sent
+            completion_texts: Generated text of every choice
+
+        Returns:
+            JSON-compatible token usage
+        """
+        prompt_tokens = self.token_counter.count_prompt(prompt_parts)
+        completion_tokens = sum(self.token_counter.count(text or "") for text in completion_texts)
+        return {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        }
 
     def convert_error_response(
         self,
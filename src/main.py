@@ -3,31 +3,104 @@ FastAPI server for Gemini API wrapper.
 """
 
 import asyncio
+import itertools
+import logging
+import math
 import sys
 import os
-from contextlib import asynccontextmanager
-from typing import Dict, Any
+import tempfile
+import time
+from contextlib import asynccontextmanager, nullcontext
+from typing import Dict, Any, AsyncIterator, Collection, List, Optional, Tuple
 
-from fastapi import FastAPI, HTTPException, Depends
+from fastapi import FastAPI, HTTPException, Depends, Request, File, UploadFile
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import StreamingResponse, PlainTextResponse, Response
 
 # Add parent directory to path to import gemini_webapi
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
 
-from gemini_webapi import GeminiClient, set_log_level
 from src.models.gemini_models import (
     ChatCompletionRequest,
     ChatCompletionResponse,
     ModelsResponse,
+    Role,
+)
+from src.converters import OpenAItoGeminiConverter, GeminitoOpenAIConverter, PromptBuilder
+from src.converters.request_converter import MODEL_ALIASES
+from pydantic import ValidationError
+from src.services import (
+    AdmissionController,
+    PRIORITY_CLASSES,
+    AttachmentStore,
+    AuthSupervisor,
+    BatchManager,
+    GeminiAccount,
+    GeminiClientPool,
+    CandidateFanOut,
+    ModelRegistry,
+    CircuitBreaker,
+    LatencyTracker,
+    RetryPolicy,
+    UpstreamResilience,
+    SharedCookieStore,
+    ConversationSessionStore,
+    ResponseCache,
+    SingleFlight,
+    UpstreamProbe,
+    UpstreamTransport,
+)
+from src.middleware import (
+    BodyLimitMiddleware,
+    MemoryRateLimitBackend,
+    SQLiteRateLimitBackend,
+    RateLimitMiddleware,
+    RequestContextMiddleware,
+)
+from src.utils import setup_logger, APIError
+from src.utils.logger import logging_stats, stop_logging
+from src.utils.exceptions import (
+    InvalidRequestError,
+    ModelNotFoundError,
+    ServiceUnavailableError,
+    map_upstream_error,
+)
+from src.utils.serialization import FastJSONResponse, parse_body
+from src.utils.tokenizer import create_token_counter
+from src.utils.metrics import (
+    REGISTRY,
+    REQUESTS,
+    REQUEST_LATENCY,
+    UPSTREAM_TTFB,
+    TOKENS,
+    ERRORS,
+    INFLIGHT,
 )
-from src.converters import OpenAItoGeminiConverter, GeminitoOpenAIConverter
-from src.utils import setup_logger, APIError, AuthenticationError
 from config.settings import settings
 
+# Endpoint label used by completion metrics
+CHAT_ENDPOINT = "/v1/chat/completions"
+
 
 # Global variables
-gemini_client: GeminiClient = None
+GeminiClient = None
+client_pool: GeminiClientPool = None
+client_pool_init: Optional[asyncio.Future] = None
+cookie_sync_task: Optional[asyncio.Task] = None
+cookie_store: Optional[SharedCookieStore] = None
+session_store: Optional[ConversationSessionStore] = None
+response_cache: Optional[ResponseCache] = None
+single_flight: Optional[SingleFlight] = None
+admission: Optional[AdmissionController] = None
+fan_out: CandidateFanOut = None
+resilience: UpstreamResilience = None
+batch_manager: Optional[BatchManager] = None
+model_registry: ModelRegistry = None
+attachment_store: Optional[AttachmentStore] = None
+upstream_transport: UpstreamTransport = None
+auth_supervisor: Optional[AuthSupervisor] = None
+upstream_probe: UpstreamProbe = None
+large_body_slots: Optional[asyncio.Semaphore] = None
 request_converter: OpenAItoGeminiConverter = None
 response_converter: GeminitoOpenAIConverter = None
 logger = None
@@ -36,51 +109,272 @@ logger = None
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Manage application lifespan."""
-    global gemini_client, request_converter, response_converter, logger
+    global client_pool, client_pool_init, cookie_store, session_store, response_cache, single_flight
+    global admission, fan_out, resilience, batch_manager, model_registry, attachment_store, upstream_transport
+    global upstream_probe, large_body_slots
+    global request_converter, response_converter, logger
+
+    if settings.lazy_init and client_pool is not None:
+        # A warm serverless instance keeps its clients across invocations
+        yield
+        return
 
-    # Setup logging
-    logger = setup_logger(__name__, settings.log_level)
-    set_log_level(settings.log_level)
+    # Setup logging; every src.* logger writes through one background queue
+    setup_logger(
+        "src",
+        settings.log_level,
+        json_format=settings.log_format == "json",
+        queue_size=settings.log_queue_size,
+        sample_burst=settings.log_sample_burst,
+        sample_window=settings.log_sample_window,
+    )
+    # Fixed name: start.py and api/index.py import this module as "main", outside the "src" tree
+    logger = logging.getLogger("src.main")
+
+    # Static aliases are served until the accounts' models and gems are discovered
+    model_registry = ModelRegistry(
+        MODEL_ALIASES,
+        gem_model=settings.gem_model,
+        refresh_interval=settings.model_refresh_interval,
+        max_age=settings.model_list_max_age,
+    )
 
     # Initialize converters
-    request_converter = OpenAItoGeminiConverter()
-    response_converter = GeminitoOpenAIConverter()
+    request_converter = OpenAItoGeminiConverter(
+        prompt_builder=PromptBuilder(
+            max_chars=settings.prompt_max_chars,
+            overflow=settings.prompt_overflow,
+            summary_chars=settings.prompt_summary_chars,
+        ),
+        model_registry=model_registry,
+    )
+    response_converter = GeminitoOpenAIConverter(
+        token_counter=create_token_counter(
+            settings.tokenizer_backend,
+            settings.tokenizer_encoding,
+            settings.tokenizer_cache_size,
+        )
+    )
 
-    # Initialize Gemini client
-    try:
-        logger.info("Initializing Gemini client...")
-        client_kwargs = {
+    large_body_slots = asyncio.Semaphore(settings.max_concurrent_large_bodies)
+    attachment_store = AttachmentStore(
+        settings.attachment_dir,
+        max_bytes=settings.attachment_cache_bytes,
+        max_file_bytes=settings.attachment_max_bytes,
+        # Files must outlive the slowest upload that may still read them
+        min_age=float(settings.gemini_timeout),
+    )
+
+    if settings.session_enabled:
+        session_store = ConversationSessionStore(
+            max_entries=settings.session_max_entries,
+            ttl=settings.session_ttl,
+        )
+
+    if settings.cache_enabled:
+        response_cache = ResponseCache(
+            max_entries=settings.cache_max_entries,
+            max_bytes=settings.cache_max_bytes,
+            ttl=settings.cache_ttl,
+            disk_path=settings.cache_disk_path,
+            disk_max_entries=settings.cache_disk_max_entries,
+        )
+
+    if settings.coalesce_enabled:
+        single_flight = SingleFlight()
+
+    fan_out = CandidateFanOut()
+
+    retry_policies = {
+        error_class: RetryPolicy(attempts, settings.retry_base_delay, settings.retry_max_delay)
+        for error_class, attempts in (
+            ("timeout", settings.retry_timeout_attempts),
+            ("quota", settings.retry_quota_attempts),
+            ("transient", settings.retry_transient_attempts),
+        )
+    }
+    resilience = UpstreamResilience(
+        retry_policies=retry_policies,
+        attempt_timeout=settings.upstream_attempt_timeout,
+        hedge_percentile=settings.hedge_percentile if settings.hedge_enabled else None,
+        hedge_min_delay=settings.hedge_min_delay,
+        latency_tracker=LatencyTracker(min_samples=settings.hedge_min_samples),
+        circuit_breaker_factory=(
+            lambda: CircuitBreaker(
+                failure_ratio=settings.circuit_failure_ratio,
+                min_calls=settings.circuit_min_calls,
+                window=settings.circuit_window,
+                open_seconds=settings.circuit_open_seconds,
+            )
+        ) if settings.circuit_enabled else None,
+    )
+
+    if settings.admission_enabled:
+        admission = AdmissionController(
+            max_concurrency=settings.admission_max_concurrency,
+            max_queue=settings.admission_max_queue,
+        )
+
+    # Initialize Gemini client pool
+    logger.info("Initializing Gemini client pool...")
+    accounts = settings.gemini_accounts or [
+        {
             "secure_1psid": settings.secure_1psid,
             "secure_1psidts": settings.secure_1psidts,
         }
+    ]
+
+    upstream_transport = UpstreamTransport(
+        max_connections=settings.gemini_max_connections,
+        keepalive_expiry=settings.gemini_keepalive_expiry,
+        http2=settings.gemini_http2,
+        connect_timeout=settings.gemini_connect_timeout,
+        total_timeout=settings.gemini_timeout,
+    )
+
+    def client_factory(**cookies) -> Any:
         if settings.gemini_proxy:
-            client_kwargs["proxy"] = settings.gemini_proxy
+            cookies["proxy"] = settings.gemini_proxy
+        return _gemini_client_class()(**cookies)
+
+    client_pool = GeminiClientPool(
+        accounts,
+        client_factory,
+        max_inflight=settings.gemini_account_max_inflight,
+        cooldown=settings.gemini_account_cooldown,
+        max_cooldown=settings.gemini_account_max_cooldown,
+    )
+    upstream_probe = UpstreamProbe(
+        client_pool,
+        interval=settings.health_probe_interval,
+        timeout=settings.health_probe_timeout,
+    )
+
+    # Workers share refreshed cookies and take turns initializing their clients
+    cookie_path = settings.shared_cookie_path
+    if not cookie_path and settings.workers > 1:
+        cookie_path = os.path.join(tempfile.gettempdir(), "gemini_wrapper_cookies.json")
+    cookie_store = SharedCookieStore(cookie_path) if cookie_path else None
+
+    if settings.lazy_init:
+        logger.info("Lazy init enabled - Gemini clients start on the first request")
+    else:
+        client_pool_init = asyncio.ensure_future(_init_client_pool())
+        await client_pool_init
+
+    if settings.batch_enabled:
+        batch_manager = BatchManager(
+            settings.batch_dir,
+            _run_batch_request,
+            concurrency=settings.batch_concurrency,
+            max_retries=settings.batch_max_retries,
+            retry_backoff=settings.batch_retry_backoff,
+            max_requests=settings.batch_max_requests,
+        )
+        await batch_manager.start()
+
+    REGISTRY.clear_collectors()
+    REGISTRY.add_collector(_collect_service_metrics)
+
+    yield
+
+    if settings.lazy_init:
+        # Serverless instances are frozen between invocations; closing would lose the warm clients
+        return
+
+    # Cleanup; the server has stopped accepting requests, let in-flight ones finish
+    if cookie_sync_task:
+        cookie_sync_task.cancel()
+    await model_registry.stop()
+    await upstream_probe.close()
+    if auth_supervisor:
+        await auth_supervisor.stop()
+    if batch_manager:
+        # Interrupted batch requests are rerun when the server restarts
+        await batch_manager.close()
+    if client_pool:
+        await client_pool.drain(settings.shutdown_drain_timeout)
+        if cookie_store:
+            await client_pool.sync_cookies(cookie_store)
+        await client_pool.close()
+        logger.info("Gemini client pool closed")
+    if response_cache:
+        response_cache.close()
+    attachment_store.close()
+    stop_logging()
+
+
+def _gemini_client_class() -> Any:
+    """Import the Gemini client on first use, keeping it off the import path of the app."""
+    global GeminiClient
+    if GeminiClient is None:
+        from gemini_webapi import GeminiClient as client_class, set_log_level
 
-        gemini_client = GeminiClient(**client_kwargs)
+        set_log_level(settings.log_level)
+        # Every session the client builds gets the configured pool and timeouts
+        GeminiClient = upstream_transport.wrap(client_class)
+    return GeminiClient
 
-        await gemini_client.init(
+
+async def _init_client_pool() -> None:
+    """Initialize the Gemini clients and start sharing their cookies."""
+    global cookie_sync_task, auth_supervisor
+
+    async with cookie_store.hold() if cookie_store else nullcontext():
+        if cookie_store:
+            await client_pool.sync_cookies(cookie_store)
+
+        # Failed accounts are kept out of rotation - allow server to start for testing purposes
+        await client_pool.init(
+            # Gems are fetched on demand by requests that use one
+            fetch_gems=not settings.lazy_init,
             timeout=settings.gemini_timeout,
             auto_close=False,
             auto_refresh=settings.gemini_auto_refresh,
+            watchdog_timeout=settings.gemini_first_byte_timeout,
         )
+    if client_pool.primary is None:
+        logger.warning("Server will start in limited mode - API endpoints will return authentication errors")
 
-        logger.info("Gemini client initialized successfully")
+    # Failed accounts are retried and ready ones refreshed in the background
+    auth_supervisor = AuthSupervisor(
+        client_pool,
+        retry_base_delay=settings.auth_retry_base_delay,
+        retry_max_delay=settings.auth_retry_max_delay,
+        refresh_interval=settings.auth_refresh_interval,
+        close_delay=float(settings.gemini_timeout),
+        cookie_store=cookie_store,
+    )
+    auth_supervisor.start()
 
-        # Fetch available gems
-        await gemini_client.fetch_gems()
-        logger.info(f"Fetched {len(gemini_client.gems)} gems")
+    # Lazy instances list gems once a request needs them
+    await model_registry.refresh(client_pool, gems=not settings.lazy_init)
+    if not settings.lazy_init:
+        model_registry.start(client_pool)
 
-    except Exception as e:
-        logger.warning(f"Failed to initialize Gemini client: {str(e)}")
-        logger.warning("Server will start in limited mode - API endpoints will return authentication errors")
-        # Don't raise - allow server to start for testing purposes
+    if cookie_store:
+        await client_pool.sync_cookies(cookie_store)
+        cookie_sync_task = asyncio.create_task(_sync_cookies_periodically())
 
-    yield
 
-    # Cleanup
-    if gemini_client:
-        await gemini_client.close()
-        logger.info("Gemini client closed")
+async def _ensure_client_pool() -> None:
+    """Wait for the client pool, initializing it on first use when startup is lazy."""
+    global client_pool_init
+    if client_pool_init is None:
+        client_pool_init = asyncio.ensure_future(_init_client_pool())
+    if not client_pool_init.done():
+        # Shielded so a cancelled request does not abort the shared initialization
+        await asyncio.shield(client_pool_init)
+
+
+async def _sync_cookies_periodically():
+    """Exchange refreshed cookies with the other workers in the background."""
+    while True:
+        await asyncio.sleep(settings.shared_cookie_sync_interval)
+        try:
+            await client_pool.sync_cookies(cookie_store)
+        except Exception as e:
+            logger.warning(f"Failed to sync shared cookies: {str(e)}")
 
 
 # Create FastAPI app
@@ -91,6 +385,46 @@ app = FastAPI(
     lifespan=lifespan,
 )
 
+
+def _openapi() -> Dict[str, Any]:
+    """Build the OpenAPI schema, registering the hand-parsed chat completion body."""
+    if app.openapi_schema is None:
+        schema = FastAPI.openapi(app)
+        request_schema = ChatCompletionRequest.model_json_schema(ref_template="#/components/schemas/{model}")
+        components = schema.setdefault("components", {}).setdefault("schemas", {})
+        for name, definition in request_schema.pop("$defs", {}).items():
+            components.setdefault(name, definition)
+        components["ChatCompletionRequest"] = request_schema
+    return app.openapi_schema
+
+
+app.openapi = _openapi
+
+
+# Add rate limiting middleware (registered first so CORS headers wrap its 429s)
+if settings.rate_limit_enabled:
+    if settings.rate_limit_backend == "sqlite":
+        rate_limit_backend = SQLiteRateLimitBackend(settings.rate_limit_backend_path)
+    else:
+        rate_limit_backend = MemoryRateLimitBackend()
+
+    app.add_middleware(
+        RateLimitMiddleware,
+        backend=rate_limit_backend,
+        requests=settings.rate_limit_requests,
+        window=settings.rate_limit_window,
+        burst=settings.rate_limit_burst,
+        trust_forwarded=settings.rate_limit_trust_forwarded,
+        api_keys=settings.rate_limit_api_keys,
+    )
+
+# Reject oversized bodies before they are buffered; batch uploads stream to disk instead
+app.add_middleware(
+    BodyLimitMiddleware,
+    max_bytes=settings.max_request_bytes,
+    path_prefixes=("/v1/chat/",),
+)
+
 # Add CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -100,27 +434,24 @@ app.add_middleware(
     allow_headers=settings.cors_headers,
 )
 
-
-# Exception handlers
-@app.exception_handler(AuthenticationError)
-async def auth_exception_handler(request, exc):
-    """Handle authentication errors."""
-    return JSONResponse(
-        status_code=401,
-        content=response_converter.convert_error_response(
-            str(exc), "authentication_error", 401
-        ),
-    )
+# Tag requests with an ID for the logs (registered last so it wraps everything)
+app.add_middleware(RequestContextMiddleware)
 
 
+# Exception handlers
 @app.exception_handler(APIError)
 async def api_exception_handler(request, exc):
     """Handle API errors."""
-    return JSONResponse(
+    headers = None
+    if exc.retry_after is not None:
+        # Tell clients and load balancers when to come back instead of retrying at once
+        headers = {"Retry-After": str(max(1, math.ceil(exc.retry_after)))}
+    return FastJSONResponse(
         status_code=exc.status_code,
         content=response_converter.convert_error_response(
-            exc.message, "api_error", exc.status_code
+            exc.message, exc.error_type, exc.status_code
         ),
+        headers=headers,
     )
 
 
@@ -128,7 +459,7 @@ async def api_exception_handler(request, exc):
 async def general_exception_handler(request, exc):
     """Handle general exceptions."""
     logger.error(f"Unhandled exception: {str(exc)}")
-    return JSONResponse(
+    return FastJSONResponse(
         status_code=500,
         content=response_converter.convert_error_response(
             "Internal server error", "internal_server_error", 500
@@ -139,70 +470,912 @@ async def general_exception_handler(request, exc):
 # Health check endpoint
 @app.get("/health")
 async def health_check():
-    """Check if the service is healthy."""
-    return {"status": "healthy", "service": settings.api_title}
+    """Check if the service is healthy, reporting the authentication state of the accounts."""
+    if auth_supervisor is None:
+        # Clients start on the first request when startup is lazy
+        return {"status": "healthy", "service": settings.api_title, "auth": None}
+
+    auth = auth_supervisor.health()
+    if auth["ready"] == auth["total"]:
+        status = "healthy"
+    elif auth["ready"]:
+        status = "degraded"
+    else:
+        status = "unhealthy"
+    return {"status": status, "service": settings.api_title, "auth": auth}
+
+
+def _readiness() -> Tuple[bool, Dict[str, Any]]:
+    """
+    Check whether this instance should receive traffic.
+
+    Returns:
+        Overall readiness and the outcome of the client, account and queue checks
+    """
+    if client_pool.draining:
+        clients = {"ok": False, "state": "draining"}
+    elif client_pool_init is None:
+        # Lazy instances start their clients on the first request they get
+        clients = {"ok": True, "state": "lazy"}
+    elif not client_pool_init.done():
+        clients = {"ok": False, "state": "initializing"}
+    elif client_pool_init.cancelled() or client_pool_init.exception() is not None:
+        clients = {"ok": False, "state": "failed"}
+    else:
+        ready = sum(1 for account in client_pool.accounts if account.ready)
+        clients = {
+            "ok": ready > 0,
+            "state": "ready" if ready else "unauthenticated",
+            "ready": ready,
+            "total": len(client_pool.accounts),
+        }
+    checks: Dict[str, Any] = {"clients": clients}
+
+    # Accounts cooling down after a quota error or with every circuit open cannot take a request
+    now = time.monotonic()
+    blocked = resilience.blocked_accounts() if resilience else set()
+    available = [
+        account for account in client_pool.accounts
+        if account.ready and account.name not in blocked and account.cooldown_until <= now
+    ]
+    checks["accounts"] = {
+        "ok": clients["state"] == "lazy" or bool(available),
+        "available": len(available),
+        "circuit_open": sorted(blocked),
+    }
+
+    if admission:
+        saturation = (admission.active + admission.queued) / (admission.max_concurrency + admission.max_queue)
+        checks["queue"] = {
+            "ok": saturation < settings.health_ready_saturation,
+            "active": admission.active,
+            "queued": admission.queued,
+            "saturation": round(saturation, 3),
+        }
+
+    return all(check["ok"] for check in checks.values()), checks
+
+
+@app.get("/health/live")
+async def liveness_check():
+    """Check that the process answers requests, independently of Gemini."""
+    return {"status": "alive"}
+
+
+@app.get("/health/ready")
+async def readiness_check():
+    """Check whether this instance should receive traffic, answering 503 when it should not."""
+    ready, checks = _readiness()
+    return FastJSONResponse(
+        status_code=200 if ready else 503,
+        content={"status": "ready" if ready else "not_ready", "checks": checks},
+    )
+
+
+@app.get("/health/deep")
+async def deep_health_check():
+    """
+    Check readiness and that Gemini answers, answering 503 if either fails.
+
+    The upstream check is cached for ``HEALTH_PROBE_INTERVAL`` seconds, so
+    probes in between never reach Gemini.
+    """
+    ready, checks = _readiness()
+    if client_pool_init is not None and client_pool_init.done():
+        checks["upstream"] = await upstream_probe.check()
+        ready = ready and checks["upstream"]["ok"]
+    else:
+        # Nothing to check until the clients have started
+        checks["upstream"] = None
+    return FastJSONResponse(
+        status_code=200 if ready else 503,
+        content={"status": "ready" if ready else "not_ready", "checks": checks},
+    )
+
+
+# Stats endpoint
+@app.get("/stats")
+async def get_stats():
+    """Get runtime statistics of the wrapper."""
+    return {
+        "accounts": client_pool.stats(),
+        "sessions": session_store.stats() if session_store else None,
+        "cache": response_cache.stats() if response_cache else None,
+        "coalescing": single_flight.stats() if single_flight else None,
+        "admission": admission.stats() if admission else None,
+        "fan_out": fan_out.stats() if fan_out else None,
+        "resilience": resilience.stats() if resilience else None,
+        "batches": batch_manager.stats() if batch_manager else None,
+        "models": model_registry.stats() if model_registry else None,
+        "attachments": attachment_store.stats() if attachment_store else None,
+        "transport": upstream_transport.stats() if upstream_transport else None,
+        "auth": auth_supervisor.stats() if auth_supervisor else None,
+        "health_probe": upstream_probe.stats() if upstream_probe else None,
+        "logging": logging_stats(),
+    }
+
+
+def _collect_service_metrics():
+    """Sample pool and admission state at scrape time."""
+    accounts = client_pool.stats() if client_pool else []
+    yield (
+        "gemini_wrapper_account_inflight",
+        "gauge",
+        "Requests in flight per Gemini account.",
+        [({"account": account["name"]}, account["inflight"]) for account in accounts],
+    )
+    yield (
+        "gemini_wrapper_account_ready",
+        "gauge",
+        "Whether a Gemini account is initialized and in rotation.",
+        [({"account": account["name"]}, int(account["ready"])) for account in accounts],
+    )
+    if upstream_transport and client_pool:
+        pools = [
+            (account.name, upstream_transport.pool_stats(account.client))
+            for account in client_pool.accounts
+        ]
+        pools = [(name, pool) for name, pool in pools if pool is not None]
+        yield (
+            "gemini_wrapper_upstream_pool_in_use",
+            "gauge",
+            "Upstream connection pool slots in use per Gemini account.",
+            [({"account": name}, pool["in_use"]) for name, pool in pools],
+        )
+        yield (
+            "gemini_wrapper_upstream_pool_size",
+            "gauge",
+            "Upstream connection pool size per Gemini account.",
+            [({"account": name}, pool["size"]) for name, pool in pools],
+        )
+    if resilience:
+        stats = resilience.stats()
+        yield (
+            "gemini_wrapper_upstream_retries_total",
+            "counter",
+            "Upstream attempts retried by error class.",
+            [({"error_class": error_class}, count) for error_class, count in stats["retries"].items()],
+        )
+        yield (
+            "gemini_wrapper_upstream_hedges_total",
+            "counter",
+            "Hedged upstream attempts started and won.",
+            [({"outcome": "started"}, stats["hedges"]), ({"outcome": "won"}, stats["hedges_won"])],
+        )
+        yield (
+            "gemini_wrapper_circuit_open",
+            "gauge",
+            "Whether the circuit of an account and model rejects calls.",
+            [
+                ({"account": circuit["account"], "model": circuit["model"]}, int(circuit["state"] != "closed"))
+                for circuit in stats["circuits"]
+            ],
+        )
+    log_stats = logging_stats()
+    yield (
+        "gemini_wrapper_log_records_dropped_total",
+        "counter",
+        "Log records dropped because the queue was full or sampled out.",
+        [({"reason": "queue_full"}, log_stats["dropped"]), ({"reason": "sampled"}, log_stats["suppressed"])],
+    )
+    if admission:
+        yield (
+            "gemini_wrapper_admission_queue_depth",
+            "gauge",
+            "Requests waiting for an upstream slot.",
+            [({}, admission.queued)],
+        )
+        yield (
+            "gemini_wrapper_admission_active",
+            "gauge",
+            "Upstream slots in use.",
+            [({}, admission.active)],
+        )
+
+
+# Metrics endpoint
+@app.get("/metrics")
+async def get_metrics():
+    """Expose metrics in Prometheus text format."""
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
 
 
 # Models endpoint
 @app.get("/v1/models", response_model=ModelsResponse)
-async def list_models():
-    """List available models."""
+async def list_models(http_request: Request):
+    """List the static, discovered and gem model ids, with ETag revalidation."""
     try:
-        # Define available Gemini models
-        available_models = [
-            "gemini-2.5-flash",
-            "gemini-2.5-pro",
-            "gemini-3.0-pro",
-            "unspecified",
-        ]
-
-        return response_converter.convert_models_list(available_models)
+        if not model_registry.complete:
+            await _ensure_client_pool()
+            await model_registry.refresh(client_pool)
+        elif settings.lazy_init and model_registry.is_stale():
+            # Lazy instances have no background refresh
+            await model_registry.refresh(client_pool, refetch=True)
 
+    except APIError:
+        raise
     except Exception as e:
         logger.error(f"Error listing models: {str(e)}")
         raise APIError(f"Failed to list models: {str(e)}")
 
+    headers = {
+        "ETag": model_registry.etag,
+        "Cache-Control": f"public, max-age={model_registry.max_age}",
+    }
+    if_none_match = http_request.headers.get("if-none-match", "")
+    if model_registry.etag in (tag.strip() for tag in if_none_match.split(",")) or if_none_match.strip() == "*":
+        return Response(status_code=304, headers=headers)
+    # Rendered once per refresh
+    return Response(model_registry.body, media_type="application/json", headers=headers)
+
+
+async def _wait_for_disconnect(http_request: Request) -> None:
+    """Return once the client has closed the connection."""
+    while True:
+        message = await http_request.receive()
+        if message["type"] == "http.disconnect":
+            return
+
+
+async def _iterate_until_disconnect(
+    upstream: AsyncIterator[Any],
+    http_request: Request,
+) -> AsyncIterator[Any]:
+    """
+    Relay upstream outputs until the stream ends or the client disconnects.
+
+    The upstream generator is closed in every case, so an abandoned
+    generation stops consuming the account's quota.
+    """
+    disconnect_watch = asyncio.create_task(_wait_for_disconnect(http_request))
+    next_output = None
+    try:
+        while True:
+            next_output = asyncio.ensure_future(upstream.__anext__())
+            await asyncio.wait(
+                {next_output, disconnect_watch},
+                return_when=asyncio.FIRST_COMPLETED,
+            )
+            if not next_output.done():
+                logger.info("Client disconnected, cancelling generation")
+                break
+            try:
+                yield next_output.result()
+            except StopAsyncIteration:
+                break
+    finally:
+        disconnect_watch.cancel()
+        if next_output is not None and not next_output.done():
+            next_output.cancel()
+            try:
+                await next_output
+            except BaseException:
+                pass
+        await upstream.aclose()
+
+
+async def _prepare_generation(
+    request: ChatCompletionRequest,
+    exclude: Collection[str] = (),
+) -> Tuple[GeminiAccount, Dict[str, Any], Any, Optional[List[bytes]]]:
+    """
+    Reserve an account and convert the request for it.
+
+    When the message history continues a known Gemini chat and the account
+    owning that chat is available, only the new turns are converted and the
+    chat session is resumed. Otherwise the full history is flattened into
+    the prompt. The caller must release the returned account.
+
+    Args:
+        request: Chat completion request
+        exclude: Names of accounts that must not be used
+
+    Returns:
+        Reserved account, Gemini parameters, chat session and digest chain
+    """
+    chain = None
+    session = None
+    if session_store:
+        model, gem = request_converter.route_model(request.model)
+        chain = session_store.digest_chain(request.messages, model, request.gem_id or gem)
+        session = session_store.lookup(request.messages, chain)
+
+    await _ensure_client_pool()
+    account = await client_pool.checkout(
+        session.account if session else None,
+        _route_exclude(request.model, exclude),
+    )
+    try:
+        if session and session.account != account.name:
+            # The chat lives on an account that is busy or out of rotation
+            session = None
+
+        started_at = time.perf_counter()
+        history_length = session.history_length if session else 0
+        gemini_params = request_converter.convert_request(request, history_length=history_length)
+        await _attach_files(request, gemini_params, history_length)
+        REQUEST_LATENCY.labels(_model_label(request.model), CHAT_ENDPOINT, "conversion").observe(
+            time.perf_counter() - started_at
+        )
+        gemini_params["gem"] = await client_pool.resolve_gem(account, gemini_params.get("gem"))
+
+        chat = None
+        if session_store:
+            chat = account.client.start_chat(metadata=session.metadata if session else None)
+
+    except BaseException:
+        await client_pool.release(account)
+        raise
+
+    return account, gemini_params, chat, chain
+
+
+async def _attach_files(
+    request: ChatCompletionRequest,
+    gemini_params: Dict[str, Any],
+    history_length: int = 0,
+) -> None:
+    """Decode the images and files of the sent turns and add them to the upload list."""
+    parts = request_converter.attachment_parts(request, history_length)
+    if parts:
+        gemini_params["files"] = [*gemini_params.get("files", []), *await attachment_store.materialize(parts)]
+
+
+def _model_label(model: str) -> str:
+    """Bound metric label cardinality to known model names."""
+    return model_registry.label(model)
+
+
+async def _check_model(model: str) -> None:
+    """
+    Reject unknown models before any upstream capacity is spent on them.
+
+    Raises:
+        ModelNotFoundError: If neither a static alias, a discovered model
+            nor a gem has this id
+    """
+    if model_registry.resolve(model) is not None:
+        return
+    if not model_registry.complete:
+        # Lazy instances have not discovered the accounts' models and gems yet
+        await _ensure_client_pool()
+        await model_registry.refresh(client_pool)
+        if model_registry.resolve(model) is not None:
+            return
+    raise ModelNotFoundError(model)
+
+
+def _route_exclude(model: str, exclude: Collection[str]) -> Collection[str]:
+    """Add the accounts that do not own the custom gem a model id addresses."""
+    route = model_registry.resolve(model)
+    if route is None or not route.accounts:
+        return exclude
+    return {*exclude, *(account.name for account in client_pool.accounts if account.name not in route.accounts)}
+
+
+def _observe_failure(model_label: str, error: APIError) -> None:
+    """Record a failed request."""
+    REQUESTS.labels(model_label, CHAT_ENDPOINT, str(error.status_code)).inc()
+    ERRORS.labels(model_label, CHAT_ENDPOINT, type(error).__name__).inc()
+
+
+def _is_cacheable(request: ChatCompletionRequest, http_request: Request) -> bool:
+    """Check whether a request may be answered from the response cache."""
+    if response_cache is None or request.stream:
+        return False
+    cache_control = http_request.headers.get("cache-control", "").lower()
+    return "no-cache" not in cache_control and "no-store" not in cache_control
+
+
+def _remember_session(
+    chain: Optional[List[bytes]],
+    account: GeminiAccount,
+    chat: Any,
+    reply: str,
+) -> None:
+    """Record the Gemini chat that now ends with the reply."""
+    if session_store and chain and chat is not None:
+        session_store.remember(chain, reply, account.name, chat.metadata)
+
+
+def _request_priority(http_request: Request) -> int:
+    """Get the admission priority class of a request."""
+    authorization = http_request.headers.get("authorization", "")
+    api_key = authorization[7:] if authorization.lower().startswith("bearer ") else authorization
+    name = settings.admission_priority_keys.get(api_key) if api_key else None
+    name = name or http_request.headers.get("x-priority", "normal")
+    return PRIORITY_CLASSES.get(name.lower(), PRIORITY_CLASSES["normal"])
+
+
+def _request_deadline(http_request: Request) -> float:
+    """Get the monotonic time by which a request must have finished."""
+    timeout = settings.admission_request_timeout or settings.gemini_timeout
+    try:
+        timeout = float(http_request.headers.get("x-request-timeout", timeout))
+    except ValueError:
+        pass
+    return time.monotonic() + timeout
+
+
+def _admit(priority: int, deadline: float):
+    """Hold an upstream slot when admission control is enabled."""
+    return admission.admit(priority, deadline) if admission else nullcontext()
+
+
+async def _generate(request: ChatCompletionRequest, priority: int, deadline: float) -> Tuple[Any, List[Any]]:
+    """
+    Run an upstream generation with retries, hedging and circuit breaking.
+
+    Returns:
+        Gemini response and the parts of the prompt the winning attempt sent
+    """
+    async with _admit(priority, deadline):
+        return await resilience.call(
+            _model_label(request.model),
+            lambda: _generate_attempt(request),
+            deadline,
+            # Two attempts resuming one Gemini chat would both post into it
+            hedge=not _may_resume_session(request),
+        )
+
+
+def _may_resume_session(request: ChatCompletionRequest) -> bool:
+    """Check whether a request could continue a stored Gemini chat."""
+    if not session_store:
+        return False
+    return any(message.role == Role.ASSISTANT for message in request.messages[:-1])
+
+
+async def _generate_attempt(request: ChatCompletionRequest) -> Tuple[Any, List[Any]]:
+    """Run one upstream generation attempt on a reserved account, returning the response and prompt parts."""
+    model_label = _model_label(request.model)
+    account, gemini_params, chat, chain = await _prepare_generation(
+        request,
+        resilience.open_circuits(model_label),
+    )
+
+    error = None
+    started_at = time.perf_counter()
+    try:
+        async with resilience.guard(account.name, model_label):
+            gemini_response = await account.client.generate_content(
+                gemini_params["prompt"],
+                model=gemini_params.get("model"),
+                gem=gemini_params.get("gem"),
+                files=gemini_params.get("files"),
+                chat=chat,
+            )
+    except BaseException as e:
+        error = e
+        raise
+    finally:
+        await client_pool.release(account, error)
+
+    # Non-streaming calls deliver everything at once
+    elapsed = time.perf_counter() - started_at
+    REQUEST_LATENCY.labels(model_label, CHAT_ENDPOINT, "upstream").observe(elapsed)
+    UPSTREAM_TTFB.labels(model_label, CHAT_ENDPOINT).observe(elapsed)
+
+    _remember_session(chain, account, chat, getattr(gemini_response, 'text', ''))
+    return gemini_response, gemini_params["prompt_parts"]
+
+
+async def _generate_branch(
+    request: ChatCompletionRequest,
+    gemini_params: Dict[str, Any],
+    priority: int,
+    deadline: float,
+) -> Any:
+    """Run one stateless generation of a fan-out on any available account."""
+    model_label = _model_label(request.model)
+    async with _admit(priority, deadline):
+        await _ensure_client_pool()
+        exclude = _route_exclude(request.model, resilience.open_circuits(model_label))
+        async with client_pool.acquire(exclude=exclude) as account:
+            gem = await client_pool.resolve_gem(account, gemini_params.get("gem"))
+            started_at = time.perf_counter()
+            async with resilience.guard(account.name, model_label):
+                gemini_response = await account.client.generate_content(
+                    gemini_params["prompt"],
+                    model=gemini_params.get("model"),
+                    gem=gem,
+                    files=gemini_params.get("files"),
+                )
+
+    elapsed = time.perf_counter() - started_at
+    REQUEST_LATENCY.labels(model_label, CHAT_ENDPOINT, "upstream").observe(elapsed)
+    UPSTREAM_TTFB.labels(model_label, CHAT_ENDPOINT).observe(elapsed)
+    return gemini_response
+
+
+async def _generate_choices(
+    request: ChatCompletionRequest,
+    priority: int,
+    deadline: float,
+) -> Tuple[List[str], List[Any]]:
+    """
+    Generate ``request.n`` choices from concurrent upstream calls.
+
+    The request is converted once and every branch sends the full
+    history, since parallel branches cannot share one Gemini chat.
+    Branches that fail or miss the deadline are dropped as long as at
+    least one choice was generated.
+
+    Returns:
+        Generated texts and the parts of the prompt every branch sent
+    """
+    started_at = time.perf_counter()
+    gemini_params = request_converter.convert_request(request)
+    await _attach_files(request, gemini_params)
+    REQUEST_LATENCY.labels(_model_label(request.model), CHAT_ENDPOINT, "conversion").observe(
+        time.perf_counter() - started_at
+    )
+
+    texts, errors = await fan_out.gather(
+        request.n,
+        lambda: _generate_branch(request, gemini_params, priority, deadline),
+        deadline,
+    )
+    if not texts:
+        raise errors[0] if errors else ServiceUnavailableError("No choices were generated")
+    if len(texts) < request.n:
+        logger.warning(
+            f"Returning {len(texts)}/{request.n} choices, {len(errors)} upstream calls failed"
+        )
+    return texts, gemini_params["prompt_parts"]
+
+
+async def _generate_stream(
+    request: ChatCompletionRequest,
+    priority: int,
+    deadline: float,
+) -> AsyncIterator[Any]:
+    """
+    Run one upstream streaming generation on a reserved account.
+
+    Failures before the first output are retried like non-streaming
+    calls; later failures end the stream, since the relayed outputs
+    cannot be taken back.
+
+    Yields:
+        Partial Gemini outputs, each with the parts of the prompt sent
+    """
+    model_label = _model_label(request.model)
+    async with _admit(priority, deadline):
+        for attempt in itertools.count(1):
+            account, gemini_params, chat, chain = await _prepare_generation(
+                request,
+                resilience.open_circuits(model_label),
+            )
+            upstream = account.client.generate_content_stream(
+                gemini_params["prompt"],
+                model=gemini_params.get("model"),
+                gem=gemini_params.get("gem"),
+                files=gemini_params.get("files"),
+                chat=chat,
+            )
+
+            # The account stays reserved until the stream is fully relayed
+            error = None
+            last_output = None
+            started_at = time.perf_counter()
+            try:
+                async with resilience.guard(account.name, model_label):
+                    async for gemini_output in upstream:
+                        if last_output is None:
+                            UPSTREAM_TTFB.labels(model_label, CHAT_ENDPOINT).observe(
+                                time.perf_counter() - started_at
+                            )
+                        last_output = gemini_output
+                        yield gemini_output, gemini_params["prompt_parts"]
+                REQUEST_LATENCY.labels(model_label, CHAT_ENDPOINT, "upstream").observe(
+                    time.perf_counter() - started_at
+                )
+                if last_output is not None:
+                    _remember_session(chain, account, chat, getattr(last_output, 'text', ''))
+                return
+            except Exception as e:
+                error = e
+                delay = resilience.retry_delay(e, attempt, deadline) if last_output is None else None
+                if delay is None:
+                    raise
+            except BaseException as e:
+                error = e
+                raise
+            finally:
+                await upstream.aclose()
+                await client_pool.release(account, error)
+            await asyncio.sleep(delay)
+
+
+async def _stream_chat_completion(
+    request: ChatCompletionRequest,
+    http_request: Request,
+    fingerprint: Optional[str],
+    started_at: float,
+) -> StreamingResponse:
+    """
+    Start a streaming generation and relay it as server-sent events.
+
+    The in-flight gauge taken by the endpoint is released once the stream ends.
+    """
+    priority = _request_priority(http_request)
+    deadline = _request_deadline(http_request)
+    if fingerprint:
+        outputs = single_flight.subscribe(
+            f"stream:{fingerprint}",
+            lambda: _generate_stream(request, priority, deadline),
+        )
+    else:
+        outputs = _generate_stream(request, priority, deadline)
+
+    # Wait for the first output so upstream failures still map to an HTTP status
+    try:
+        first_output = await outputs.__anext__()
+    except StopAsyncIteration:
+        first_output = None
+    except BaseException:
+        await outputs.aclose()
+        raise
+
+    model_label = _model_label(request.model)
+
+    async def gemini_outputs() -> AsyncIterator[Any]:
+        last_output, prompt_parts = first_output or (None, [])
+        try:
+            if first_output is None:
+                return
+            yield last_output
+            async for last_output, prompt_parts in _iterate_until_disconnect(outputs, http_request):
+                yield last_output
+        finally:
+            usage = response_converter.build_usage(
+                prompt_parts,
+                [getattr(last_output, 'text', '') if last_output is not None else ''],
+            )
+            TOKENS.labels(model_label, CHAT_ENDPOINT, "prompt").inc(usage.prompt_tokens)
+            TOKENS.labels(model_label, CHAT_ENDPOINT, "completion").inc(usage.completion_tokens)
+            INFLIGHT.labels(model_label, CHAT_ENDPOINT).dec()
+            REQUESTS.labels(model_label, CHAT_ENDPOINT, "200").inc()
+            REQUEST_LATENCY.labels(model_label, CHAT_ENDPOINT, "total").observe(
+                time.perf_counter() - started_at
+            )
+
+    return StreamingResponse(
+        response_converter.convert_chat_stream(gemini_outputs(), request.model),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+async def _chat_request(http_request: Request) -> ChatCompletionRequest:
+    """Parse a chat completion body, moving large attachments out of memory."""
+
+    async def spill(request: ChatCompletionRequest) -> None:
+        if attachment_store and settings.attachment_spill_bytes > 0:
+            await attachment_store.spill(
+                (part for message in request.messages for part in message.attachments()),
+                settings.attachment_spill_bytes,
+            )
+
+    # Large bodies keep their parse slot until their attachments are on disk
+    return await parse_body(
+        http_request,
+        ChatCompletionRequest,
+        settings.request_spool_bytes,
+        large_body_slots=large_body_slots,
+        finalize=spill,
+    )
+
 
 # Chat completions endpoint
-@app.post("/v1/chat/completions", response_model=ChatCompletionResponse)
-async def create_chat_completion(request: ChatCompletionRequest):
+@app.post(
+    "/v1/chat/completions",
+    response_model=ChatCompletionResponse,
+    # The body is parsed by hand, so its schema is documented explicitly
+    openapi_extra={
+        "requestBody": {
+            "content": {"application/json": {"schema": {"$ref": "#/components/schemas/ChatCompletionRequest"}}},
+            "required": True,
+        }
+    },
+)
+async def create_chat_completion(
+    http_request: Request,
+    request: ChatCompletionRequest = Depends(_chat_request),
+):
     """Create a chat completion."""
+    started_at = time.perf_counter()
+    model_label = _model_label(request.model)
+    inflight = INFLIGHT.labels(model_label, CHAT_ENDPOINT)
+    inflight.inc()
+    streaming = False
     try:
-        # Convert OpenAI request to Gemini format
-        gemini_params = request_converter.convert_request(request)
+        await _check_model(request.model)
+        cacheable = _is_cacheable(request, http_request)
+        fingerprint = None
+        if cacheable or single_flight:
+            fingerprint = request_converter.fingerprint(request)
+
+        if request.stream:
+            if request.n and request.n > 1:
+                raise InvalidRequestError("Streaming is not supported with n > 1")
+            logger.info(f"Streaming content with model: {request.model}")
+            streaming_response = await _stream_chat_completion(
+                request,
+                http_request,
+                fingerprint if single_flight else None,
+                started_at,
+            )
+            streaming = True
+            return streaming_response
 
-        # Generate content with Gemini
+        if cacheable:
+            cached = await response_cache.get(fingerprint)
+            if cached is not None:
+                logger.info("Chat completion served from cache")
+                return FastJSONResponse(
+                    response_converter.convert_cached_response(cached),
+                    headers={"X-Cache": "HIT"},
+                )
+
+        # Generate content with Gemini, sharing identical in-flight generations
         logger.info(f"Generating content with model: {request.model}")
 
-        gemini_response = await gemini_client.generate_content(
-            gemini_params["prompt"],
-            model=gemini_params.get("model"),
-            gem=gemini_params.get("gem"),
-            files=gemini_params.get("files"),
-        )
+        priority = _request_priority(http_request)
+        deadline = _request_deadline(http_request)
+        if request.n and request.n > 1:
+            generate = lambda: _generate_choices(request, priority, deadline)
+        else:
+            generate = lambda: _generate(request, priority, deadline)
+
+        if single_flight:
+            result, prompt_parts = await single_flight.do(fingerprint, generate)
+        else:
+            result, prompt_parts = await generate()
+
+        # Build the OpenAI payload once and encode it directly, skipping response model validation
+        serialize_started_at = time.perf_counter()
+        if request.n and request.n > 1:
+            payload = response_converter.build_choices_payload(
+                result,
+                request.model,
+                prompt_parts=prompt_parts,
+            )
+        else:
+            payload = response_converter.build_chat_payload(
+                result,
+                request.model,
+                prompt_parts=prompt_parts,
+            )
 
-        # Convert Gemini response to OpenAI format
-        response = response_converter.convert_chat_response(
-            gemini_response,
-            request.model,
+        # Partial fan-out results are served but never cached
+        headers = None
+        if cacheable and len(payload["choices"]) == (request.n or 1):
+            await response_cache.set(fingerprint, payload)
+            headers = {"X-Cache": "MISS"}
+
+        response = FastJSONResponse(payload, headers=headers)
+        REQUEST_LATENCY.labels(model_label, CHAT_ENDPOINT, "serialization").observe(
+            time.perf_counter() - serialize_started_at
         )
+        TOKENS.labels(model_label, CHAT_ENDPOINT, "prompt").inc(payload["usage"]["prompt_tokens"])
+        TOKENS.labels(model_label, CHAT_ENDPOINT, "completion").inc(payload["usage"]["completion_tokens"])
 
-        logger.info("Chat completion generated successfully")
+        REQUESTS.labels(model_label, CHAT_ENDPOINT, "200").inc()
+        REQUEST_LATENCY.labels(model_label, CHAT_ENDPOINT, "total").observe(
+            time.perf_counter() - started_at
+        )
+        logger.info(
+            "Chat completion generated successfully",
+            extra={
+                "model": request.model,
+                "duration_ms": round((time.perf_counter() - started_at) * 1000, 1),
+                "prompt_tokens": payload["usage"]["prompt_tokens"],
+                "completion_tokens": payload["usage"]["completion_tokens"],
+            },
+        )
         return response
 
+    except APIError as e:
+        _observe_failure(model_label, e)
+        raise
+
     except Exception as e:
         logger.error(f"Error generating chat completion: {str(e)}")
+        error = map_upstream_error(e, request.model, client_pool.retry_after() if client_pool else None)
+        _observe_failure(model_label, error)
+        raise error from e
 
-        # Check for specific error types
-        error_message = str(e).lower()
-        if "authentication" in error_message or "unauthorized" in error_message:
-            raise AuthenticationError("Authentication with Gemini failed")
-        elif "rate limit" in error_message or "quota" in error_message:
-            raise APIError("Rate limit exceeded", 429)
-        elif "model" in error_message:
-            raise APIError(f"Model '{request.model}' not available", 404)
-        else:
-            raise APIError(f"Failed to generate completion: {str(e)}")
+    finally:
+        if not streaming:
+            inflight.dec()
+
+
+async def _run_batch_request(body: Dict[str, Any]) -> Dict[str, Any]:
+    """Run one batch line through the chat completion pipeline at low priority."""
+    try:
+        request = ChatCompletionRequest(**body)
+    except ValidationError as e:
+        raise InvalidRequestError(f"Invalid request body: {e.errors()[0]['msg']}")
+    if request.stream:
+        raise InvalidRequestError("Streaming is not supported in batches")
+    await _check_model(request.model)
+
+    priority = PRIORITY_CLASSES["low"]
+    deadline = time.monotonic() + (settings.admission_request_timeout or settings.gemini_timeout)
+    try:
+        if request.n and request.n > 1:
+            texts, prompt_parts = await _generate_choices(request, priority, deadline)
+            return response_converter.build_choices_payload(
+                texts, request.model, prompt_parts=prompt_parts
+            )
+        gemini_response, prompt_parts = await _generate(request, priority, deadline)
+        return response_converter.build_chat_payload(
+            gemini_response, request.model, prompt_parts=prompt_parts
+        )
+    except APIError:
+        raise
+    except Exception as e:
+        raise map_upstream_error(e, request.model, client_pool.retry_after()) from e
+
+
+def _get_batch_manager() -> BatchManager:
+    """Get the batch manager, failing if batches are disabled."""
+    if batch_manager is None:
+        raise APIError("Batch processing is disabled", 404)
+    return batch_manager
+
+
+async def _read_upload(file: UploadFile) -> AsyncIterator[bytes]:
+    """Read an uploaded file in chunks."""
+    while True:
+        chunk = await file.read(64 * 1024)
+        if not chunk:
+            break
+        yield chunk
+
+
+# Batch endpoints
+@app.post("/v1/batches")
+async def create_batch(file: UploadFile = File(...)):
+    """
+    Create a batch from a JSONL file of chat completion requests.
+
+    Each line holds ``{"custom_id": ..., "body": {...}}``, where the body is
+    a regular chat completion request.
+    """
+    job = await _get_batch_manager().create(_read_upload(file))
+    return job.to_dict()
+
+
+@app.get("/v1/batches")
+async def list_batches():
+    """List batches, newest first."""
+    return {
+        "object": "list",
+        "data": [job.to_dict() for job in _get_batch_manager().list_batches()],
+    }
+
+
+@app.get("/v1/batches/{batch_id}")
+async def get_batch(batch_id: str):
+    """Get the status of a batch."""
+    return _get_batch_manager().get(batch_id).to_dict()
+
+
+@app.post("/v1/batches/{batch_id}/cancel")
+async def cancel_batch(batch_id: str):
+    """Cancel a batch; results written so far are kept."""
+    return _get_batch_manager().cancel(batch_id).to_dict()
+
+
+@app.get("/v1/batches/{batch_id}/output")
+async def get_batch_output(batch_id: str):
+    """Stream the results of a batch as JSONL, including partial results."""
+    manager = _get_batch_manager()
+    manager.get(batch_id)
+    return StreamingResponse(manager.iter_output(batch_id), media_type="application/jsonl")
 
 
 # Root endpoint
@@ -214,6 +1387,8 @@ async def root():
         "version": settings.api_version,
         "docs": "/docs",
         "health": "/health",
+        "liveness": "/health/live",
+        "readiness": "/health/ready",
     }
 
 
@@ -225,5 +1400,7 @@ if __name__ == "__main__":
         host=settings.host,
         port=settings.port,
         reload=settings.debug,
+        workers=settings.workers,
+        timeout_graceful_shutdown=settings.shutdown_drain_timeout,
         log_level=settings.log_level.lower(),
     )
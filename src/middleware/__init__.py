@@ -0,0 +1,21 @@
+"""
+ASGI middleware for the API server.
+"""
+
+from .rate_limit import (
+    RateLimitBackend,
+    MemoryRateLimitBackend,
+    SQLiteRateLimitBackend,
+    RateLimitMiddleware,
+)
+from .request_context import RequestContextMiddleware
+from .body_limit import BodyLimitMiddleware
+
+__all__ = [
+    "RateLimitBackend",
+    "MemoryRateLimitBackend",
+    "SQLiteRateLimitBackend",
+    "RateLimitMiddleware",
+    "RequestContextMiddleware",
+    "BodyLimitMiddleware",
+]
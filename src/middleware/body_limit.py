@@ -0,0 +1,102 @@
+"""
+Request body size limit middleware.
+"""
+
+from typing import Tuple
+
+from src.converters.response_converter import GeminitoOpenAIConverter
+from src.utils.exceptions import PayloadTooLargeError
+from src.utils.serialization import dumps
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class BodyLimitMiddleware:
+    """
+    ASGI middleware rejecting request bodies over a size limit with a 413.
+
+    A declared ``Content-Length`` over the limit is rejected before any of
+    the body is read. Chunked bodies are counted as they are received, and
+    reading fails as soon as the limit is crossed, so an oversized body is
+    never buffered in full.
+    """
+
+    def __init__(self, app, max_bytes: int, path_prefixes: Tuple[str, ...] = ("/v1/",)):
+        """
+        Initialize the middleware.
+
+        Args:
+            app: Wrapped ASGI application
+            max_bytes: Largest request body accepted
+            path_prefixes: Only paths with these prefixes are limited
+        """
+        self.app = app
+        self.max_bytes = max_bytes
+        self.path_prefixes = path_prefixes
+        self.converter = GeminitoOpenAIConverter()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not scope["path"].startswith(self.path_prefixes):
+            await self.app(scope, receive, send)
+            return
+
+        content_length = self._content_length(scope)
+        if content_length is not None and content_length > self.max_bytes:
+            logger.warning(f"Rejected a {content_length} byte body for {scope['path']}")
+            await self._reject(send)
+            return
+
+        received = 0
+        exceeded = False
+        rejected = False
+
+        async def receive_limited():
+            nonlocal received, exceeded
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_bytes:
+                    exceeded = True
+                    raise PayloadTooLargeError(self.max_bytes)
+            return message
+
+        async def send_limited(message):
+            nonlocal rejected
+            if rejected:
+                return
+            if exceeded and message["type"] == "http.response.start":
+                # Whatever the app made of the aborted read, the client gets a 413
+                rejected = True
+                logger.warning(f"Rejected a body over {self.max_bytes} bytes for {scope['path']}")
+                await self._reject(send)
+                return
+            await send(message)
+
+        await self.app(scope, receive_limited, send_limited)
+
+    def _content_length(self, scope):
+        """Declared body size, or None if the body is chunked or the header is malformed."""
+        for name, value in scope["headers"]:
+            if name == b"content-length":
+                try:
+                    return int(value)
+                except ValueError:
+                    return None
+        return None
+
+    async def _reject(self, send) -> None:
+        """Send a 413 in the OpenAI error format."""
+        error = PayloadTooLargeError(self.max_bytes)
+        body = dumps(
+            self.converter.convert_error_response(
+                error.message, error.error_type, error.status_code
+            )
+        )
+        headers = [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+            (b"connection", b"close"),
+        ]
+        await send({"type": "http.response.start", "status": error.status_code, "headers": headers})
+        await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,272 @@
+"""
+Token-bucket rate limiting middleware.
+"""
+
+import asyncio
+import hashlib
+import math
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Collection, List, Optional, Tuple
+
+from src.converters.response_converter import GeminitoOpenAIConverter
+from src.utils.exceptions import RateLimitError
+from src.utils.serialization import dumps
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class RateLimitBackend:
+    """Storage for token buckets; subclass to share limits between workers."""
+
+    async def consume(
+        self,
+        key: str,
+        capacity: float,
+        rate: float,
+        cost: float = 1.0,
+    ) -> Tuple[bool, float, float]:
+        """
+        Take tokens from a bucket, refilling it for the elapsed time first.
+
+        Args:
+            key: Bucket key
+            capacity: Maximum tokens, i.e. the allowed burst
+            rate: Tokens added per second, i.e. the sustained rate
+            cost: Tokens taken by this request
+
+        Returns:
+            Whether the request is allowed, tokens left, and seconds until
+            enough tokens are available again
+        """
+        raise NotImplementedError
+
+    def close(self) -> None:
+        """Release backend resources."""
+
+
+def _refill(tokens: float, updated: float, now: float, capacity: float, rate: float) -> float:
+    """Refill a bucket for the time elapsed since its last update."""
+    return min(capacity, tokens + (now - updated) * rate)
+
+
+def _take(tokens: float, rate: float, cost: float) -> Tuple[bool, float, float]:
+    """Decide a request against a refilled bucket."""
+    if tokens >= cost:
+        return True, tokens - cost, 0.0
+    return False, tokens, (cost - tokens) / rate
+
+
+class MemoryRateLimitBackend(RateLimitBackend):
+    """Per-process token buckets with O(1) bookkeeping and idle expiry."""
+
+    def __init__(self):
+        """Initialize the backend."""
+        # key -> [tokens, updated], ordered from least to most recently used
+        self._buckets: "OrderedDict[str, List[float]]" = OrderedDict()
+
+    async def consume(
+        self,
+        key: str,
+        capacity: float,
+        rate: float,
+        cost: float = 1.0,
+    ) -> Tuple[bool, float, float]:
+        """Take tokens from an in-memory bucket."""
+        now = time.monotonic()
+        self._expire(now, capacity / rate)
+
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = [capacity, now]
+        else:
+            self._buckets.move_to_end(key)
+            bucket[0] = _refill(bucket[0], bucket[1], now, capacity, rate)
+            bucket[1] = now
+
+        allowed, bucket[0], retry_after = _take(bucket[0], rate, cost)
+        return allowed, bucket[0], retry_after
+
+    def _expire(self, now: float, idle_ttl: float) -> None:
+        """Drop buckets idle long enough to have refilled completely."""
+        while self._buckets:
+            key, bucket = next(iter(self._buckets.items()))
+            if now - bucket[1] < idle_ttl:
+                break
+            del self._buckets[key]
+
+
+class SQLiteRateLimitBackend(RateLimitBackend):
+    """Token buckets in a SQLite file shared by every worker on the host."""
+
+    # Idle rows are purged every N requests
+    PURGE_INTERVAL = 1000
+
+    def __init__(self, path: str):
+        """
+        Initialize the backend.
+
+        Args:
+            path: SQLite database file path
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._requests = 0
+        self._connection = sqlite3.connect(
+            path, check_same_thread=False, isolation_level=None, timeout=5.0
+        )
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS buckets ("
+            "key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)"
+        )
+
+    async def consume(
+        self,
+        key: str,
+        capacity: float,
+        rate: float,
+        cost: float = 1.0,
+    ) -> Tuple[bool, float, float]:
+        """Take tokens from a shared bucket."""
+        return await asyncio.to_thread(self._consume, key, capacity, rate, cost)
+
+    def _consume(self, key: str, capacity: float, rate: float, cost: float) -> Tuple[bool, float, float]:
+        """Read-modify-write a bucket inside an exclusive transaction."""
+        with self._lock:
+            now = time.time()
+            self._connection.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._connection.execute(
+                    "SELECT tokens, updated FROM buckets WHERE key = ?", (key,)
+                ).fetchone()
+                tokens = _refill(row[0], row[1], now, capacity, rate) if row else capacity
+                allowed, tokens, retry_after = _take(tokens, rate, cost)
+                self._connection.execute(
+                    "INSERT OR REPLACE INTO buckets (key, tokens, updated) VALUES (?, ?, ?)",
+                    (key, tokens, now),
+                )
+
+                self._requests += 1
+                if self._requests % self.PURGE_INTERVAL == 0:
+                    self._connection.execute(
+                        "DELETE FROM buckets WHERE updated < ?", (now - capacity / rate,)
+                    )
+
+                self._connection.execute("COMMIT")
+            except BaseException:
+                self._connection.execute("ROLLBACK")
+                raise
+        return allowed, tokens, retry_after
+
+    def close(self) -> None:
+        """Close the database connection."""
+        with self._lock:
+            self._connection.close()
+
+
+class RateLimitMiddleware:
+    """
+    ASGI middleware enforcing a token bucket per client IP or known API key.
+
+    Headers sent by clients are not trusted on their own: an Authorization
+    header only gets its own bucket when it carries one of the configured
+    keys, so callers cannot dodge the limit by varying header values.
+    """
+
+    def __init__(
+        self,
+        app,
+        backend: RateLimitBackend,
+        requests: int,
+        window: float,
+        burst: Optional[int] = None,
+        path_prefixes: Tuple[str, ...] = ("/v1/",),
+        trust_forwarded: bool = False,
+        api_keys: Collection[str] = (),
+    ):
+        """
+        Initialize the middleware.
+
+        Args:
+            app: Wrapped ASGI application
+            backend: Token bucket storage
+            requests: Requests allowed per window at the sustained rate
+            window: Window length in seconds
+            burst: Bucket capacity; defaults to ``requests``
+            path_prefixes: Only paths with these prefixes are limited
+            trust_forwarded: Use X-Forwarded-For to identify clients behind a proxy
+            api_keys: Keys limited per key rather than per client IP
+        """
+        self.app = app
+        self.backend = backend
+        self.rate = requests / window
+        self.capacity = float(burst or requests)
+        self.path_prefixes = path_prefixes
+        self.trust_forwarded = trust_forwarded
+        # Only digests are kept, so raw credentials never reach the bucket store
+        self._key_digests = {_digest(key.encode("latin-1")) for key in api_keys if key}
+        self.converter = GeminitoOpenAIConverter()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not scope["path"].startswith(self.path_prefixes):
+            await self.app(scope, receive, send)
+            return
+
+        allowed, remaining, retry_after = await self.backend.consume(
+            self._client_key(scope), self.capacity, self.rate
+        )
+        reset_after = (self.capacity - remaining) / self.rate
+        headers = [
+            (b"x-ratelimit-limit-requests", str(int(self.capacity)).encode()),
+            (b"x-ratelimit-remaining-requests", str(int(remaining)).encode()),
+            (b"x-ratelimit-reset-requests", f"{reset_after:.3f}s".encode()),
+        ]
+
+        if not allowed:
+            error = RateLimitError()
+            body = dumps(
+                self.converter.convert_error_response(
+                    error.message, error.error_type, error.status_code
+                )
+            )
+            headers.append((b"retry-after", str(math.ceil(retry_after)).encode()))
+            headers.append((b"content-type", b"application/json"))
+            headers.append((b"content-length", str(len(body)).encode()))
+            await send({"type": "http.response.start", "status": error.status_code, "headers": headers})
+            await send({"type": "http.response.body", "body": body})
+            return
+
+        async def send_with_headers(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + headers
+            await send(message)
+
+        await self.app(scope, receive, send_with_headers)
+
+    def _client_key(self, scope) -> str:
+        """Identify the caller by configured API key, otherwise by client IP."""
+        request_headers = dict(scope.get("headers") or [])
+
+        authorization = request_headers.get(b"authorization", b"")
+        if authorization and self._key_digests:
+            token = authorization[7:] if authorization[:7].lower() == b"bearer " else authorization
+            digest = _digest(token.strip())
+            if digest in self._key_digests:
+                return "key:" + digest
+
+        if self.trust_forwarded:
+            forwarded = request_headers.get(b"x-forwarded-for")
+            if forwarded:
+                return "ip:" + forwarded.decode("latin-1").split(",")[0].strip()
+
+        client = scope.get("client")
+        return "ip:" + (client[0] if client else "unknown")
+
+
+def _digest(key: bytes) -> str:
+    """Bucket name of an API key."""
+    return hashlib.sha256(key).hexdigest()[:32]
@@ -0,0 +1,74 @@
+"""
+Request ID and access log middleware.
+"""
+
+import re
+import time
+import uuid
+
+from src.utils.logger import request_id_var
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Client-supplied IDs are echoed in logs and headers, so only safe ones are kept
+_REQUEST_ID_PATTERN = re.compile(r"^[A-Za-z0-9._:-]{1,128}$")
+
+
+class RequestContextMiddleware:
+    """ASGI middleware tagging each request with an ID and logging its outcome and duration."""
+
+    def __init__(self, app, header: str = "x-request-id"):
+        """
+        Initialize the middleware.
+
+        Args:
+            app: Wrapped ASGI application
+            header: Header carrying the request ID in both directions
+        """
+        self.app = app
+        self.header = header.lower().encode("latin-1")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = self._request_id(scope)
+        token = request_id_var.set(request_id)
+        started_at = time.perf_counter()
+        status = 500
+
+        async def send_with_id(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                message = {**message, "headers": [*message.get("headers", []), (self.header, request_id.encode())]}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            duration_ms = round((time.perf_counter() - started_at) * 1000, 1)
+            # Server errors are logged as warnings, which sampling never drops
+            logger.log(
+                logging.WARNING if status >= 500 else logging.INFO,
+                f"{scope['method']} {scope['path']} {status} {duration_ms}ms",
+                extra={
+                    "method": scope["method"],
+                    "path": scope["path"],
+                    "status": status,
+                    "duration_ms": duration_ms,
+                },
+            )
+            request_id_var.reset(token)
+
+    def _request_id(self, scope) -> str:
+        """Reuse a well-formed ID sent by the client, otherwise generate one."""
+        for name, value in scope["headers"]:
+            if name == self.header:
+                candidate = value.decode("latin-1")
+                if _REQUEST_ID_PATTERN.match(candidate):
+                    return candidate
+                break
+        return uuid.uuid4().hex
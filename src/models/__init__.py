@@ -5,15 +5,21 @@ Pydantic models for API requests and responses.
 from .gemini_models import (
     ChatCompletionRequest,
     ChatCompletionResponse,
+    ChatCompletionChunk,
     ChatMessage,
     Choice,
+    ChunkChoice,
+    DeltaMessage,
     Usage,
 )
 
 __all__ = [
     "ChatCompletionRequest",
     "ChatCompletionResponse",
+    "ChatCompletionChunk",
     "ChatMessage",
     "Choice",
+    "ChunkChoice",
+    "DeltaMessage",
     "Usage",
 ]
\ No newline at end of file
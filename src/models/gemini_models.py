@@ -2,10 +2,14 @@
 OpenAI-compatible Pydantic models for API requests and responses.
 """
 
-from typing import List, Optional, Union, Dict, Any
-from pydantic import BaseModel, Field
+import hashlib
+from typing import List, Optional, Union, Dict, Any, Literal
+from pydantic import BaseModel, Field, PrivateAttr
 from enum import Enum
 
+# Characters of an attachment hashed per step, so no full-size copy is made
+_HASH_CHUNK_CHARS = 1 << 20
+
 
 class Role(str, Enum):
     """Chat message roles."""
@@ -15,14 +19,100 @@ class Role(str, Enum):
     TOOL = "tool"
 
 
+class ImageURL(BaseModel):
+    """Image reference of an ``image_url`` content part."""
+    url: str
+    detail: Optional[str] = None
+
+
+class FileData(BaseModel):
+    """File of a ``file`` content part."""
+    file_data: Optional[str] = None
+    filename: Optional[str] = None
+    file_id: Optional[str] = None
+
+
+class ContentPart(BaseModel):
+    """Part of a multimodal message."""
+    type: Literal["text", "image_url", "file"]
+    text: Optional[str] = None
+    image_url: Optional[ImageURL] = None
+    file: Optional[FileData] = None
+
+    _key: Optional[str] = PrivateAttr(default=None)
+    _path: Optional[str] = PrivateAttr(default=None)
+
+    @property
+    def data(self) -> Optional[str]:
+        """Data URL or base64 payload of an attachment part."""
+        if self.type == "image_url" and self.image_url:
+            return self.image_url.url
+        if self.type == "file" and self.file:
+            return self.file.file_data
+        return None
+
+    def key(self) -> str:
+        """Content hash of the attachment, computed once per part."""
+        if self._key is None:
+            data = self.data or ""
+            hasher = hashlib.sha256()
+            for start in range(0, len(data), _HASH_CHUNK_CHARS):
+                hasher.update(data[start:start + _HASH_CHUNK_CHARS].encode("utf-8", "surrogatepass"))
+            self._key = hasher.hexdigest()
+        return self._key
+
+    @property
+    def path(self) -> Optional[str]:
+        """Decoded file the payload was spilled to, if any."""
+        return self._path
+
+    def spill(self, path: str) -> None:
+        """Drop the inline payload in favour of its decoded file, keeping the content hash."""
+        self.key()
+        self._path = path
+        if self.type == "image_url" and self.image_url:
+            self.image_url.url = ""
+        elif self.type == "file" and self.file:
+            self.file.file_data = None
+
+
 class ChatMessage(BaseModel):
     """Chat message model."""
     role: Role
-    content: Optional[str] = None
+    content: Optional[Union[str, List[ContentPart]]] = None
     name: Optional[str] = None
     tool_calls: Optional[List[Dict[str, Any]]] = None
     tool_call_id: Optional[str] = None
 
+    def text(self) -> str:
+        """Text of the message, with a placeholder where each attachment was."""
+        if not isinstance(self.content, list):
+            return self.content or ""
+        texts = []
+        for part in self.content:
+            if part.type == "text":
+                texts.append(part.text or "")
+            elif part.type == "image_url":
+                texts.append("[image]")
+            else:
+                texts.append(f"[file: {part.file.filename or 'attachment'}]" if part.file else "[file]")
+        return "\n".join(texts)
+
+    def attachments(self) -> List[ContentPart]:
+        """Image and file parts of the message."""
+        if not isinstance(self.content, list):
+            return []
+        return [part for part in self.content if part.type != "text"]
+
+    def identity(self) -> str:
+        """Text identifying the message, with attachments reduced to their content hash."""
+        if not isinstance(self.content, list):
+            return self.content or ""
+        return "\0".join(
+            part.text or "" if part.type == "text" else f"{part.type}:{part.key()}"
+            for part in self.content
+        )
+
 
 class Usage(BaseModel):
     """Token usage information."""
@@ -68,6 +158,29 @@ class ChatCompletionResponse(BaseModel):
     usage: Usage
 
 
+class DeltaMessage(BaseModel):
+    """Incremental message content in a streamed chunk."""
+    role: Optional[Role] = None
+    content: Optional[str] = None
+
+
+class ChunkChoice(BaseModel):
+    """Streamed chat completion choice."""
+    index: int
+    delta: DeltaMessage
+    finish_reason: Optional[str] = None
+    logprobs: Optional[Dict[str, Any]] = None
+
+
+class ChatCompletionChunk(BaseModel):
+    """Streamed chat completion chunk model."""
+    id: str
+    object: str = "chat.completion.chunk"
+    created: int
+    model: str
+    choices: List[ChunkChoice]
+
+
 class ModelInfo(BaseModel):
     """Model information."""
     id: str
@@ -0,0 +1,43 @@
+"""
+Stateful services shared by the API endpoints.
+"""
+
+from .admission import AdmissionController, PRIORITY_CLASSES
+from .attachment_store import AttachmentStore
+from .auth_supervisor import AuthSupervisor
+from .batch import BatchJob, BatchManager
+from .client_pool import GeminiAccount, GeminiClientPool
+from .cookie_store import SharedCookieStore
+from .fan_out import CandidateFanOut
+from .model_registry import ModelRegistry, ModelRoute
+from .resilience import CircuitBreaker, LatencyTracker, RetryPolicy, UpstreamResilience
+from .session_store import ConversationSession, ConversationSessionStore
+from .response_cache import ResponseCache
+from .single_flight import SingleFlight
+from .upstream_probe import UpstreamProbe
+from .upstream_transport import UpstreamTransport
+
+__all__ = [
+    "AdmissionController",
+    "PRIORITY_CLASSES",
+    "AttachmentStore",
+    "AuthSupervisor",
+    "BatchJob",
+    "BatchManager",
+    "GeminiAccount",
+    "GeminiClientPool",
+    "SharedCookieStore",
+    "CandidateFanOut",
+    "ModelRegistry",
+    "ModelRoute",
+    "CircuitBreaker",
+    "LatencyTracker",
+    "RetryPolicy",
+    "UpstreamResilience",
+    "ConversationSession",
+    "ConversationSessionStore",
+    "ResponseCache",
+    "SingleFlight",
+    "UpstreamProbe",
+    "UpstreamTransport",
+]
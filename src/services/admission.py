@@ -0,0 +1,177 @@
+"""
+Admission control for upstream Gemini calls.
+"""
+
+import asyncio
+import heapq
+import itertools
+import time
+from contextlib import asynccontextmanager
+from typing import List, Dict, Any, Optional, AsyncIterator
+
+from src.utils.exceptions import ServiceUnavailableError
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Priority classes, lower values are admitted first
+PRIORITY_CLASSES = {"high": 0, "normal": 1, "low": 2}
+
+
+class AdmissionController:
+    """Bounds concurrent upstream calls behind a priority queue with load shedding."""
+
+    # Weight of the newest sample in the moving averages
+    EWMA_ALPHA = 0.2
+
+    def __init__(self, max_concurrency: int = 32, max_queue: int = 256):
+        """
+        Initialize the controller.
+
+        Args:
+            max_concurrency: Maximum concurrent upstream calls
+            max_queue: Maximum requests waiting for a slot
+        """
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.active = 0
+        self.queued = 0
+        # Entries are [priority, sequence, future, deadline]
+        self._queue: List[List[Any]] = []
+        self._sequence = itertools.count()
+        self.service_time = 0.0
+        self.wait_time = 0.0
+        self.max_wait_time = 0.0
+        self.admitted = 0
+        self.shed_queue_full = 0
+        self.shed_deadline = 0
+
+    @asynccontextmanager
+    async def admit(
+        self,
+        priority: int = PRIORITY_CLASSES["normal"],
+        deadline: Optional[float] = None,
+    ) -> AsyncIterator[None]:
+        """
+        Hold an upstream slot for the duration of a block.
+
+        Args:
+            priority: Priority class from ``PRIORITY_CLASSES``
+            deadline: Monotonic time by which the call must have finished
+
+        Raises:
+            ServiceUnavailableError: If the queue is full or the request
+                can no longer finish before its deadline
+        """
+        enqueued_at = time.monotonic()
+        await self._acquire(priority, deadline, enqueued_at)
+
+        started_at = time.monotonic()
+        self._record_wait(started_at - enqueued_at)
+        try:
+            yield
+        finally:
+            self._record_service(time.monotonic() - started_at)
+            self._release()
+
+    async def _acquire(self, priority: int, deadline: Optional[float], now: float) -> None:
+        """Take a slot immediately or wait for one in the priority queue."""
+        if not self._is_feasible(deadline, now):
+            self.shed_deadline += 1
+            raise ServiceUnavailableError("Request cannot complete before its deadline")
+
+        if self.active < self.max_concurrency and not self.queued:
+            self.active += 1
+            return
+
+        if self.queued >= self.max_queue and not self._shed_lower_priority(priority):
+            self.shed_queue_full += 1
+            raise ServiceUnavailableError(
+                "Server is overloaded, please retry later",
+                retry_after=self.service_time or None,
+            )
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._queue, [priority, next(self._sequence), future, deadline])
+        self.queued += 1
+
+        # Give up once the expected service time no longer fits before the deadline
+        timeout = deadline - now - self.service_time if deadline is not None else None
+        try:
+            await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            self.queued -= 1
+            self.shed_deadline += 1
+            raise ServiceUnavailableError("Request cannot complete before its deadline")
+        except asyncio.CancelledError:
+            if future.cancelled():
+                self.queued -= 1
+            elif future.exception() is None:
+                # A slot was handed over while the caller was being cancelled
+                self._release()
+            raise
+
+    def _release(self) -> None:
+        """Free a slot and hand it to the next feasible waiter."""
+        self.active -= 1
+        now = time.monotonic()
+        while self._queue and self.active < self.max_concurrency:
+            _, _, future, deadline = heapq.heappop(self._queue)
+            if future.done():
+                continue
+            self.queued -= 1
+            if not self._is_feasible(deadline, now):
+                self.shed_deadline += 1
+                future.set_exception(
+                    ServiceUnavailableError("Request cannot complete before its deadline")
+                )
+                continue
+            self.active += 1
+            future.set_result(None)
+
+    def _shed_lower_priority(self, priority: int) -> bool:
+        """Reject the newest lowest-priority waiter to make room for a more urgent one."""
+        waiting = [entry for entry in self._queue if not entry[2].done()]
+        victim = max(waiting, key=lambda entry: (entry[0], entry[1]), default=None)
+        if victim is None or victim[0] <= priority:
+            return False
+
+        self.queued -= 1
+        self.shed_queue_full += 1
+        victim[2].set_exception(ServiceUnavailableError(
+            "Server is overloaded, please retry later",
+            retry_after=self.service_time or None,
+        ))
+        return True
+
+    def _is_feasible(self, deadline: Optional[float], now: float) -> bool:
+        """Check whether an average upstream call still fits before the deadline."""
+        return deadline is None or now + self.service_time < deadline
+
+    def _record_wait(self, seconds: float) -> None:
+        """Track queueing delay of admitted requests."""
+        self.admitted += 1
+        self.wait_time += self.EWMA_ALPHA * (seconds - self.wait_time)
+        self.max_wait_time = max(self.max_wait_time, seconds)
+
+    def _record_service(self, seconds: float) -> None:
+        """Track how long admitted requests hold their slot."""
+        if self.service_time:
+            self.service_time += self.EWMA_ALPHA * (seconds - self.service_time)
+        else:
+            self.service_time = seconds
+
+    def stats(self) -> Dict[str, Any]:
+        """Get admission statistics."""
+        return {
+            "active": self.active,
+            "max_concurrency": self.max_concurrency,
+            "queued": self.queued,
+            "max_queue": self.max_queue,
+            "admitted": self.admitted,
+            "shed_queue_full": self.shed_queue_full,
+            "shed_deadline": self.shed_deadline,
+            "avg_wait_seconds": round(self.wait_time, 4),
+            "max_wait_seconds": round(self.max_wait_time, 4),
+            "avg_service_seconds": round(self.service_time, 4),
+        }
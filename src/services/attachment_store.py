@@ -0,0 +1,290 @@
+"""
+Content-addressed store of attachments decoded from chat requests.
+"""
+
+import asyncio
+import binascii
+import mimetypes
+import os
+import re
+import shutil
+import tempfile
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from src.models.gemini_models import ContentPart
+from src.utils.exceptions import InvalidRequestError
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Base64 characters decoded per step; a multiple of 4 so chunks decode independently
+_DECODE_CHUNK_CHARS = 1 << 20
+
+# Payloads larger than this are hashed and decoded on a worker thread
+_INLINE_DECODE_CHARS = 256 * 1024
+
+_DATA_URL_PATTERN = re.compile(r"data:([\w.+-]+/[\w.+-]+)?((?:;[\w-]+=[^;,]*)*)(;base64)?,")
+_UNSAFE_FILENAME_CHARS = re.compile(r"[^\w.\- ]")
+
+
+class _StoredFile:
+    """Decoded attachment on disk."""
+
+    __slots__ = ("path", "size", "last_used")
+
+    def __init__(self, path: str, size: int):
+        self.path = path
+        self.size = size
+        self.last_used = time.monotonic()
+
+
+class AttachmentStore:
+    """
+    Decodes base64 attachments to temp files named by their content hash.
+
+    An image resent with every turn of a conversation is decoded and
+    written once; later requests reuse the file. Payloads are decoded in
+    chunks straight to disk, so no decoded copy is held in memory.
+    """
+
+    def __init__(
+        self,
+        directory: Optional[str] = None,
+        max_bytes: int = 256 * 1024 * 1024,
+        max_file_bytes: int = 20 * 1024 * 1024,
+        min_age: float = 300.0,
+    ):
+        """
+        Initialize the store.
+
+        Args:
+            directory: Directory for decoded files; defaults to a new temp directory
+            max_bytes: Total size of decoded files kept for reuse
+            max_file_bytes: Largest decoded attachment accepted
+            min_age: Seconds a file is kept after its last use even over
+                ``max_bytes``, so in-flight uploads never lose their file
+        """
+        self._owns_directory = directory is None
+        self.directory = directory or tempfile.mkdtemp(prefix="gemini-attachments-")
+        os.makedirs(self.directory, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.max_file_bytes = max_file_bytes
+        self.min_age = min_age
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.spilled = 0
+        # content hash -> stored file, from least to most recently used
+        self._files: "OrderedDict[str, _StoredFile]" = OrderedDict()
+        # Decodes in progress, shared by concurrent requests for the same content
+        self._pending: Dict[str, asyncio.Future] = {}
+
+    async def materialize(self, parts: Iterable[ContentPart]) -> List[str]:
+        """
+        Get a file path for every distinct attachment, in order of appearance.
+
+        Args:
+            parts: Image and file content parts
+
+        Returns:
+            Paths of the decoded files
+
+        Raises:
+            InvalidRequestError: If an attachment is not inline base64 data,
+                is malformed or is too large
+        """
+        paths = []
+        seen = set()
+        for part in parts:
+            key = await self._key(part)
+            if key in seen:
+                continue
+            seen.add(key)
+            paths.append(await self._get(key, part))
+        return paths
+
+    async def spill(self, parts: Iterable[ContentPart], min_chars: int) -> int:
+        """
+        Decode large inline attachments now and drop their payload strings.
+
+        A request may wait upstream for minutes; spilled parts hold a file
+        path instead of megabytes of base64 for that time.
+
+        Args:
+            parts: Image and file content parts
+            min_chars: Smallest encoded payload spilled
+
+        Returns:
+            Number of parts spilled
+
+        Raises:
+            InvalidRequestError: If a spilled attachment is malformed or too large
+        """
+        spilled = 0
+        for part in parts:
+            data = part.data
+            if part.path is None and data and len(data) >= min_chars and not data.startswith(("http://", "https://")):
+                part.spill(await self._get(await self._key(part), part))
+                spilled += 1
+        self.spilled += spilled
+        return spilled
+
+    async def _key(self, part: ContentPart) -> str:
+        """Content hash of a part; large payloads are hashed on a worker thread."""
+        data = part.data
+        if data and len(data) > _INLINE_DECODE_CHARS:
+            return await asyncio.to_thread(part.key)
+        return part.key()
+
+    async def _get(self, key: str, part: ContentPart) -> str:
+        """Get the file of one attachment, decoding it on first use."""
+        stored = self._files.get(key)
+        if stored is not None and os.path.exists(stored.path):
+            self._files.move_to_end(key)
+            stored.last_used = time.monotonic()
+            self.hits += 1
+            return stored.path
+
+        task = self._pending.get(key)
+        if task is None:
+            self.misses += 1
+            # Decoded in its own task so a cancelled request does not fail the others waiting
+            task = asyncio.ensure_future(self._decode(key, part))
+            self._pending[key] = task
+            task.add_done_callback(lambda done: self._finish(key, done))
+        else:
+            self.hits += 1
+        return await asyncio.shield(task)
+
+    async def _decode(self, key: str, part: ContentPart) -> str:
+        """Decode one attachment to disk and add it to the store."""
+        data, offset, mime_type = self._parse(part)
+        filename = self._filename(part, mime_type)
+        if len(data) - offset > _INLINE_DECODE_CHARS:
+            path, size = await asyncio.to_thread(self._write, key, filename, data, offset)
+        else:
+            path, size = self._write(key, filename, data, offset)
+
+        previous = self._files.pop(key, None)
+        if previous is not None:
+            # The file was deleted behind the store's back and decoded again
+            self.bytes -= previous.size
+        self._files[key] = _StoredFile(path, size)
+        self.bytes += size
+        self._evict()
+        return path
+
+    def _finish(self, key: str, task: asyncio.Future) -> None:
+        """Forget a finished decode; its failure was already raised to the waiters."""
+        self._pending.pop(key, None)
+        if not task.cancelled():
+            task.exception()
+
+    def _parse(self, part: ContentPart) -> Tuple[str, int, Optional[str]]:
+        """Locate the base64 payload of a part without copying it."""
+        if part.path is not None:
+            # Only possible if the file was deleted from the directory by hand
+            raise InvalidRequestError("Attachment file is no longer available; resend the request")
+        if part.type == "file" and part.file and part.file.file_id and not part.file.file_data:
+            raise InvalidRequestError("File IDs are not supported; send the file inline as base64 file_data")
+        data = part.data
+        if not data:
+            raise InvalidRequestError(f"Empty {part.type} content part")
+
+        if data.startswith("data:"):
+            match = _DATA_URL_PATTERN.match(data)
+            if match is None or not match.group(3):
+                raise InvalidRequestError("Attachments must be base64-encoded data URLs")
+            return data, match.end(), match.group(1)
+        if data.startswith(("http://", "https://")):
+            raise InvalidRequestError("Remote attachment URLs are not supported; send the content as a base64 data URL")
+        if part.type == "file":
+            # Plain base64 file data; the type comes from the filename
+            return data, 0, None
+        raise InvalidRequestError("Images must be base64-encoded data URLs")
+
+    def _filename(self, part: ContentPart, mime_type: Optional[str]) -> str:
+        """Name the uploaded file; Gemini infers its type from the extension."""
+        filename = part.file.filename if part.type == "file" and part.file else None
+        if filename:
+            filename = _UNSAFE_FILENAME_CHARS.sub("_", os.path.basename(filename)).strip().lstrip(".") or None
+        if filename:
+            return filename
+        extension = mimetypes.guess_extension(mime_type) if mime_type else None
+        stem = "image" if part.type == "image_url" else "file"
+        return stem + (extension or (".png" if part.type == "image_url" else ".bin"))
+
+    def _write(self, key: str, filename: str, data: str, offset: int) -> Tuple[str, int]:
+        """Decode a base64 payload to the content-addressed file, chunk by chunk."""
+        # Decoded size is about three quarters of the encoded length
+        if (len(data) - offset) * 3 // 4 > self.max_file_bytes:
+            raise InvalidRequestError(
+                f"Attachment is larger than {self.max_file_bytes // (1024 * 1024)} MB"
+            )
+
+        directory = os.path.join(self.directory, key[:32])
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, filename)
+        partial_path = path + ".part"
+        size = 0
+        try:
+            with open(partial_path, "wb") as output:
+                carry = ""
+                for start in range(offset, len(data), _DECODE_CHUNK_CHARS):
+                    chunk = carry + data[start:start + _DECODE_CHUNK_CHARS]
+                    if " " in chunk or "\n" in chunk or "\r" in chunk or "\t" in chunk:
+                        chunk = "".join(chunk.split())
+                    usable = len(chunk) - len(chunk) % 4
+                    carry = chunk[usable:]
+                    decoded = binascii.a2b_base64(chunk[:usable], strict_mode=True)
+                    output.write(decoded)
+                    size += len(decoded)
+                if carry:
+                    raise binascii.Error("truncated payload")
+            os.replace(partial_path, path)
+        except (binascii.Error, ValueError) as e:
+            _remove(partial_path)
+            raise InvalidRequestError(f"Invalid base64 attachment: {str(e)}")
+        except BaseException:
+            _remove(partial_path)
+            raise
+        return path, size
+
+    def _evict(self) -> None:
+        """Delete the least recently used files beyond ``max_bytes``."""
+        now = time.monotonic()
+        while self.bytes > self.max_bytes and self._files:
+            key, stored = next(iter(self._files.items()))
+            if now - stored.last_used < self.min_age:
+                break
+            del self._files[key]
+            self.bytes -= stored.size
+            shutil.rmtree(os.path.dirname(stored.path), ignore_errors=True)
+
+    def close(self) -> None:
+        """Delete the decoded files."""
+        self._files.clear()
+        self.bytes = 0
+        if self._owns_directory:
+            shutil.rmtree(self.directory, ignore_errors=True)
+
+    def stats(self) -> Dict[str, Any]:
+        """Get store statistics."""
+        return {
+            "files": len(self._files),
+            "bytes": self.bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "spilled": self.spilled,
+        }
+
+
+def _remove(path: str) -> None:
+    """Delete a file if it exists."""
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
@@ -0,0 +1,182 @@
+"""
+Background authentication of the Gemini accounts.
+"""
+
+import asyncio
+import random
+import time
+from contextlib import nullcontext
+from typing import Any, Dict, List, Optional
+
+from .client_pool import GeminiAccount, GeminiClientPool
+from .cookie_store import SharedCookieStore
+from .resilience import RetryPolicy
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class AuthSupervisor:
+    """
+    Keeps every account of a client pool authenticated, off the request path.
+
+    Accounts that failed to initialize, or whose session a request found
+    expired, are re-initialized with jittered exponential backoff. Ready
+    accounts get a fresh session every ``refresh_interval`` seconds,
+    before their cookies and access token go stale. New clients are
+    swapped in only once initialized, so requests never wait for one.
+    With a shared cookie store, workers take turns re-authenticating and
+    publish the cookies they rotated to each other.
+    """
+
+    def __init__(
+        self,
+        pool: GeminiClientPool,
+        retry_base_delay: float = 5.0,
+        retry_max_delay: float = 300.0,
+        refresh_interval: float = 3600.0,
+        close_delay: float = 300.0,
+        cookie_store: Optional[SharedCookieStore] = None,
+    ):
+        """
+        Initialize the supervisor.
+
+        Args:
+            pool: Client pool whose accounts are supervised
+            retry_base_delay: Backoff cap before the first retry, in seconds
+            retry_max_delay: Upper bound of the backoff, in seconds
+            refresh_interval: Seconds between proactive re-authentications of
+                a ready account; 0 disables them
+            close_delay: Seconds a replaced client stays open for the
+                requests still using it
+            cookie_store: Cookie store shared with other workers, if any
+        """
+        self.pool = pool
+        self.backoff = RetryPolicy(base_delay=retry_base_delay, max_delay=retry_max_delay)
+        self.refresh_interval = refresh_interval
+        self.close_delay = close_delay
+        self.cookie_store = cookie_store
+        self.recoveries = 0
+        self.refreshes = 0
+        self.failures = 0
+        self._attempts: Dict[str, asyncio.Task] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        """Schedule every account and start supervising in the background."""
+        if self._task is not None:
+            return
+        for account in self.pool.accounts:
+            self._schedule(account)
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop supervising; attempts in progress are abandoned."""
+        tasks = [task for task in (self._task, *self._attempts.values()) if task is not None]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._task = None
+        self._attempts.clear()
+
+    def _schedule(self, account: GeminiAccount) -> None:
+        """Set when an account is next (re)authenticated."""
+        now = time.monotonic()
+        if not account.ready:
+            account.next_auth_at = now + self.backoff.backoff(max(account.auth_failures, 1))
+        elif self.refresh_interval > 0:
+            # Spread refreshes so accounts do not re-authenticate in lockstep
+            account.next_auth_at = now + self.refresh_interval * random.uniform(0.9, 1.0)
+        else:
+            account.next_auth_at = float("inf")
+
+    async def _run(self) -> None:
+        """Start due attempts and sleep until the next one or an auth change."""
+        while True:
+            self.pool.auth_changed.clear()
+            now = time.monotonic()
+            for account in self.pool.accounts:
+                if account.name not in self._attempts and account.next_auth_at <= now:
+                    self._attempts[account.name] = asyncio.create_task(self._authenticate(account))
+
+            pending = [
+                account.next_auth_at for account in self.pool.accounts
+                if account.name not in self._attempts
+            ]
+            timeout = max(0.0, min(pending) - now) if pending else None
+            if timeout == float("inf"):
+                timeout = None
+            try:
+                await asyncio.wait_for(self.pool.auth_changed.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _authenticate(self, account: GeminiAccount) -> None:
+        """Initialize a new client for an account and swap it in."""
+        was_ready = account.ready
+        try:
+            async with self.cookie_store.hold() if self.cookie_store else nullcontext():
+                if self.cookie_store:
+                    # Start from the cookie another worker rotated most recently
+                    await self.pool.sync_cookies(self.cookie_store)
+                await self.pool.reconnect(account, self.close_delay)
+                if self.cookie_store:
+                    await self.pool.sync_cookies(self.cookie_store)
+        except Exception as e:
+            account.auth_failures += 1
+            account.last_error = str(e)
+            if not account.ready:
+                account.auth_state = "failed"
+            self.failures += 1
+            logger.warning(
+                f"[{account.name}] Gemini authentication attempt {account.auth_failures} failed: {str(e)}"
+            )
+        else:
+            if was_ready:
+                self.refreshes += 1
+                logger.info(f"[{account.name}] Gemini session refreshed")
+            else:
+                self.recoveries += 1
+                logger.info(f"[{account.name}] Gemini account authenticated and back in rotation")
+        finally:
+            self._schedule(account)
+            self._attempts.pop(account.name, None)
+            self.pool.auth_changed.set()
+
+    def health(self) -> Dict[str, Any]:
+        """
+        Authentication state of every account.
+
+        Returns:
+            Ready account count and per-account state, age of the session and
+            seconds until the next attempt
+        """
+        now = time.monotonic()
+        wall_now = time.time()
+        accounts: List[Dict[str, Any]] = []
+        for account in self.pool.accounts:
+            next_attempt = account.next_auth_at - now
+            accounts.append({
+                "name": account.name,
+                "state": "authenticating" if account.name in self._attempts else account.auth_state,
+                "authenticated_ago": (
+                    round(wall_now - account.authenticated_at) if account.authenticated_at else None
+                ),
+                "next_attempt_in": round(max(next_attempt, 0.0), 1) if next_attempt != float("inf") else None,
+                "failures": account.auth_failures,
+                "last_error": account.last_error if not account.ready else None,
+            })
+        return {
+            "ready": sum(1 for account in self.pool.accounts if account.ready),
+            "total": len(self.pool.accounts),
+            "accounts": accounts,
+        }
+
+    def stats(self) -> Dict[str, int]:
+        """Get supervisor counters."""
+        return {
+            "recoveries": self.recoveries,
+            "refreshes": self.refreshes,
+            "failures": self.failures,
+            "in_progress": len(self._attempts),
+        }
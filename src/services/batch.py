@@ -0,0 +1,536 @@
+"""
+Batch processing of chat completion requests uploaded as JSONL files.
+"""
+
+import asyncio
+import json
+import os
+import random
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional, Set, Tuple, Callable, Awaitable, AsyncIterator
+
+from src.converters.response_converter import GeminitoOpenAIConverter
+from src.utils.exceptions import APIError, InvalidRequestError
+from src.utils.serialization import dumps
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Statuses after which a batch never changes again
+FINAL_STATUSES = ("completed", "failed", "cancelled")
+
+# Statuses worth retrying when an error does not say whether it is retryable
+RETRYABLE_STATUS_CODES = (429, 500, 502, 503, 504)
+
+SUPPORTED_ENDPOINTS = ("/v1/chat/completions",)
+
+
+class BatchJob:
+    """A batch and its on-disk state."""
+
+    def __init__(
+        self,
+        batch_id: str,
+        directory: str,
+        endpoint: str = "/v1/chat/completions",
+        status: str = "in_progress",
+        created_at: Optional[int] = None,
+        completed_at: Optional[int] = None,
+        total: int = 0,
+    ):
+        """
+        Initialize the batch.
+
+        Args:
+            batch_id: Batch ID
+            directory: Directory holding the batch files
+            endpoint: Endpoint every request of the batch targets
+            status: Batch status
+            created_at: Creation time as a Unix timestamp
+            completed_at: Time the batch reached a final status
+            total: Number of requests in the batch
+        """
+        self.id = batch_id
+        self.directory = directory
+        self.endpoint = endpoint
+        self.status = status
+        self.created_at = created_at or int(time.time())
+        self.completed_at = completed_at
+        self.total = total
+        self.completed = 0
+        self.failed = 0
+        # Requests queued or running, and whether every request was queued
+        self.inflight = 0
+        self.fed = False
+        self.error: Optional[str] = None
+        self._output: Any = None
+        # Results are written from worker threads
+        self._output_lock = threading.Lock()
+
+    @property
+    def input_path(self) -> str:
+        return os.path.join(self.directory, "input.jsonl")
+
+    @property
+    def output_path(self) -> str:
+        return os.path.join(self.directory, "output.jsonl")
+
+    @property
+    def meta_path(self) -> str:
+        return os.path.join(self.directory, "batch.json")
+
+    def save(self) -> None:
+        """Persist the batch metadata atomically."""
+        meta = {
+            "id": self.id,
+            "endpoint": self.endpoint,
+            "status": self.status,
+            "created_at": self.created_at,
+            "completed_at": self.completed_at,
+            "total": self.total,
+            "error": self.error,
+        }
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, prefix=".batch-")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        os.replace(temp_path, self.meta_path)
+
+    @classmethod
+    def load(cls, directory: str) -> "BatchJob":
+        """Load a batch from its directory."""
+        with open(os.path.join(directory, "batch.json"), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        job = cls(
+            meta["id"],
+            directory,
+            endpoint=meta["endpoint"],
+            status=meta["status"],
+            created_at=meta["created_at"],
+            completed_at=meta.get("completed_at"),
+            total=meta["total"],
+        )
+        job.error = meta.get("error")
+        return job
+
+    def write_result(self, record: Dict[str, Any]) -> None:
+        """Append a result line; the output file doubles as the checkpoint."""
+        line = dumps(record).decode("utf-8") + "\n"
+        with self._output_lock:
+            if self._output is None:
+                self._output = open(self.output_path, "a", encoding="utf-8")
+            self._output.write(line)
+            self._output.flush()
+
+    def close(self) -> None:
+        """Close the output file."""
+        with self._output_lock:
+            if self._output is not None:
+                self._output.close()
+                self._output = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Get the OpenAI-style batch object."""
+        return {
+            "id": self.id,
+            "object": "batch",
+            "endpoint": self.endpoint,
+            "status": self.status,
+            "created_at": self.created_at,
+            "completed_at": self.completed_at,
+            "request_counts": {
+                "total": self.total,
+                "completed": self.completed,
+                "failed": self.failed,
+            },
+            "output_url": f"/v1/batches/{self.id}/output",
+            "errors": self.error,
+        }
+
+
+class BatchManager:
+    """Runs uploaded batches through a bounded worker pool with retries and resume."""
+
+    # Bytes read per chunk when streaming results back
+    READ_CHUNK_SIZE = 64 * 1024
+
+    def __init__(
+        self,
+        directory: str,
+        runner: Callable[[Dict[str, Any]], Awaitable[Dict[str, Any]]],
+        concurrency: int = 4,
+        max_retries: int = 3,
+        retry_backoff: float = 2.0,
+        max_requests: int = 50000,
+    ):
+        """
+        Initialize the manager.
+
+        Args:
+            directory: Directory holding one subdirectory per batch
+            runner: Callable running one request body and returning the
+                response body; raises ``APIError`` on failure
+            concurrency: Number of requests processed at once
+            max_retries: Retries of a request failing with a retryable status
+            retry_backoff: Initial retry delay in seconds, doubled per attempt
+            max_requests: Maximum requests in one batch
+        """
+        self.directory = directory
+        self.runner = runner
+        self.concurrency = concurrency
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.max_requests = max_requests
+        self.converter = GeminitoOpenAIConverter()
+        self.jobs: "OrderedDict[str, BatchJob]" = OrderedDict()
+        # Bounded, so input files are read only as fast as workers drain them
+        self._queue: "asyncio.Queue[Tuple[BatchJob, Dict[str, Any]]]" = asyncio.Queue(concurrency * 2)
+        self._tasks: List["asyncio.Task[None]"] = []
+        # Feeds are dropped once their batch is queued, so the set stays bounded
+        self._feeds: Set["asyncio.Task[None]"] = set()
+
+    async def start(self) -> None:
+        """Load existing batches, resume unfinished ones and start the workers."""
+        os.makedirs(self.directory, exist_ok=True)
+        jobs = []
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if not os.path.isfile(os.path.join(path, "batch.json")):
+                continue
+            try:
+                jobs.append(BatchJob.load(path))
+            except (OSError, ValueError, KeyError) as e:
+                logger.warning(f"Skipping unreadable batch in {path}: {str(e)}")
+
+        for job in sorted(jobs, key=lambda job: job.created_at):
+            self.jobs[job.id] = job
+            try:
+                await asyncio.to_thread(self._load_checkpoint, job)
+            except (OSError, ValueError, KeyError) as e:
+                # A corrupt output file fails its batch instead of the server start
+                logger.error(f"Batch {job.id} has an unreadable output file: {str(e)}")
+                if job.status not in FINAL_STATUSES:
+                    job.error = f"Unreadable output file: {str(e)}"
+                    self._finish(job, "failed")
+                continue
+            if job.status == "cancelling":
+                self._finish(job, "cancelled")
+            elif job.status == "in_progress":
+                logger.info(f"Resuming batch {job.id}: {job.completed + job.failed}/{job.total} done")
+                self._start_feed(job)
+
+        self._tasks.extend(asyncio.create_task(self._work()) for _ in range(self.concurrency))
+
+    async def close(self) -> None:
+        """Stop the workers; unfinished batches resume on the next start."""
+        tasks = [*self._tasks, *self._feeds]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._tasks.clear()
+        self._feeds.clear()
+        for job in self.jobs.values():
+            job.close()
+
+    async def create(self, chunks: AsyncIterator[bytes]) -> BatchJob:
+        """
+        Create a batch from an uploaded JSONL file.
+
+        Every line must be an object with a unique ``custom_id`` and a
+        ``body`` holding the request; ``url`` defaults to the chat
+        completions endpoint.
+
+        Args:
+            chunks: Raw bytes of the uploaded file
+
+        Returns:
+            Created batch
+
+        Raises:
+            InvalidRequestError: If a line is malformed or the file is empty
+                or too large
+        """
+        job = BatchJob(f"batch_{uuid.uuid4().hex}", "")
+        job.directory = os.path.join(self.directory, job.id)
+        os.makedirs(job.directory)
+
+        try:
+            custom_ids: Set[str] = set()
+            with open(job.input_path, "wb") as f:
+                pending = b""
+                async for chunk in chunks:
+                    lines = (pending + chunk).split(b"\n")
+                    pending = lines.pop()
+                    for line in lines:
+                        self._write_input_line(job, f, line, custom_ids)
+                self._write_input_line(job, f, pending, custom_ids)
+
+            if not job.total:
+                raise InvalidRequestError("Batch file contains no requests")
+
+        except BaseException:
+            shutil.rmtree(job.directory, ignore_errors=True)
+            raise
+
+        job.save()
+        self.jobs[job.id] = job
+        self._start_feed(job)
+        logger.info(f"Created batch {job.id} with {job.total} requests")
+        return job
+
+    def _write_input_line(self, job: BatchJob, f: Any, line: bytes, custom_ids: Set[str]) -> None:
+        """Validate one input line and append it to the batch input file."""
+        line = line.strip()
+        if not line:
+            return
+
+        line_number = job.total + 1
+        if line_number > self.max_requests:
+            raise InvalidRequestError(f"Batch exceeds the limit of {self.max_requests} requests")
+        try:
+            item = json.loads(line)
+        except ValueError:
+            raise InvalidRequestError(f"Line {line_number} is not valid JSON")
+        if not isinstance(item, dict) or not isinstance(item.get("body"), dict):
+            raise InvalidRequestError(f"Line {line_number} must be an object with a 'body' object")
+
+        custom_id = item.get("custom_id")
+        if not isinstance(custom_id, str) or not custom_id:
+            raise InvalidRequestError(f"Line {line_number} is missing 'custom_id'")
+        if custom_id in custom_ids:
+            raise InvalidRequestError(f"Line {line_number} repeats custom_id '{custom_id}'")
+
+        url = item.get("url", job.endpoint)
+        if url not in SUPPORTED_ENDPOINTS:
+            raise InvalidRequestError(f"Line {line_number} targets unsupported endpoint '{url}'")
+
+        custom_ids.add(custom_id)
+        job.total = line_number
+        f.write(line + b"\n")
+
+    def get(self, batch_id: str) -> BatchJob:
+        """
+        Get a batch.
+
+        Args:
+            batch_id: Batch ID
+
+        Returns:
+            Batch
+
+        Raises:
+            APIError: If the batch does not exist
+        """
+        job = self.jobs.get(batch_id)
+        if job is None:
+            raise APIError(f"Batch '{batch_id}' not found", 404)
+        return job
+
+    def list_batches(self) -> List[BatchJob]:
+        """Get every batch, newest first."""
+        return list(reversed(self.jobs.values()))
+
+    def cancel(self, batch_id: str) -> BatchJob:
+        """
+        Cancel a batch; requests already running still finish.
+
+        Args:
+            batch_id: Batch ID
+
+        Returns:
+            Cancelled batch
+        """
+        job = self.get(batch_id)
+        if job.status in FINAL_STATUSES:
+            return job
+
+        job.status = "cancelling"
+        job.save()
+        self._maybe_finish(job)
+        return job
+
+    async def iter_output(self, batch_id: str) -> AsyncIterator[bytes]:
+        """
+        Stream the results written so far as JSONL.
+
+        Args:
+            batch_id: Batch ID
+
+        Yields:
+            Chunks of the output file
+        """
+        job = self.get(batch_id)
+        if not os.path.exists(job.output_path):
+            return
+        with open(job.output_path, "rb") as f:
+            while True:
+                chunk = await asyncio.to_thread(f.read, self.READ_CHUNK_SIZE)
+                if not chunk:
+                    break
+                yield chunk
+
+    def _load_checkpoint(self, job: BatchJob) -> Set[str]:
+        """
+        Count finished requests from the output file.
+
+        A trailing partial line left by a crash is truncated away.
+
+        Returns:
+            custom_id of every finished request
+        """
+        done: Set[str] = set()
+        job.completed = job.failed = 0
+        if not os.path.exists(job.output_path):
+            return done
+
+        with open(job.output_path, "r+b") as f:
+            valid_length = 0
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                record = json.loads(line)
+                done.add(record["custom_id"])
+                if record.get("error"):
+                    job.failed += 1
+                else:
+                    job.completed += 1
+                valid_length += len(line)
+            f.truncate(valid_length)
+        return done
+
+    def _start_feed(self, job: BatchJob) -> None:
+        """Queue the requests of a batch in the background."""
+        task = asyncio.create_task(self._feed(job))
+        self._feeds.add(task)
+        task.add_done_callback(self._feeds.discard)
+
+    async def _feed(self, job: BatchJob) -> None:
+        """Queue every unfinished request of a batch."""
+        try:
+            done = await asyncio.to_thread(self._load_checkpoint, job)
+            with open(job.input_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    if job.status != "in_progress":
+                        break
+                    item = json.loads(line)
+                    if item["custom_id"] in done:
+                        continue
+                    job.inflight += 1
+                    await self._queue.put((job, item))
+
+        except asyncio.CancelledError:
+            raise
+
+        except Exception as e:
+            logger.error(f"Batch {job.id} failed: {str(e)}")
+            job.error = str(e)
+            job.status = "failed"
+
+        job.fed = True
+        self._maybe_finish(job)
+
+    async def _work(self) -> None:
+        """Process queued requests until cancelled."""
+        while True:
+            job, item = await self._queue.get()
+            try:
+                # Requests of cancelled batches are dropped without a result
+                if job.status == "in_progress":
+                    record = await self._process(job, item)
+                    # Disk writes stay off the event loop serving chat requests
+                    await asyncio.to_thread(job.write_result, record)
+                    if record["error"]:
+                        job.failed += 1
+                    else:
+                        job.completed += 1
+
+            except Exception as e:
+                # The result is lost, so the request runs again if the batch is resumed
+                logger.error(f"Batch {job.id} could not record a result: {str(e)}")
+                job.failed += 1
+
+            finally:
+                job.inflight -= 1
+                self._queue.task_done()
+                self._maybe_finish(job)
+
+    async def _process(self, job: BatchJob, item: Dict[str, Any]) -> Dict[str, Any]:
+        """Run one request, retrying retryable failures with exponential backoff."""
+        for attempt in range(self.max_retries + 1):
+            try:
+                body = await self.runner(item["body"])
+                return self._result(item, 200, body)
+
+            except Exception as e:
+                status_code = getattr(e, "status_code", 500)
+                message = getattr(e, "message", None) or str(e)
+                error_type = getattr(e, "error_type", "api_error")
+                retryable = getattr(e, "retryable", status_code in RETRYABLE_STATUS_CODES)
+                if not retryable or attempt == self.max_retries:
+                    return self._result(item, status_code, error=message, error_type=error_type)
+
+                delay = getattr(e, "retry_after", None) or (
+                    self.retry_backoff * 2 ** attempt * random.uniform(0.5, 1.0)
+                )
+                logger.warning(
+                    f"Batch {job.id} request {item['custom_id']} failed ({status_code}), "
+                    f"retrying in {delay:.1f}s"
+                )
+                await asyncio.sleep(delay)
+
+    def _result(
+        self,
+        item: Dict[str, Any],
+        status_code: int,
+        body: Optional[Dict[str, Any]] = None,
+        error: Optional[str] = None,
+        error_type: str = "api_error",
+    ) -> Dict[str, Any]:
+        """Build an OpenAI-style batch output line."""
+        if error is not None:
+            body = self.converter.convert_error_response(error, error_type, status_code)
+        return {
+            "id": f"batch_req_{uuid.uuid4().hex}",
+            "custom_id": item["custom_id"],
+            "response": {
+                "status_code": status_code,
+                "body": body,
+            },
+            "error": {"code": status_code, "message": error} if error is not None else None,
+        }
+
+    def _maybe_finish(self, job: BatchJob) -> None:
+        """Move a batch to its final status once nothing is queued or running."""
+        if not job.fed or job.inflight:
+            return
+        if job.status == "in_progress":
+            self._finish(job, "completed")
+        elif job.status == "cancelling":
+            self._finish(job, "cancelled")
+        elif job.status == "failed" and job.completed_at is None:
+            self._finish(job, "failed")
+
+    def _finish(self, job: BatchJob, status: str) -> None:
+        """Record a final batch status."""
+        job.status = status
+        job.completed_at = int(time.time())
+        job.close()
+        job.save()
+        logger.info(
+            f"Batch {job.id} {status}: {job.completed} completed, {job.failed} failed"
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        """Get batch statistics."""
+        statuses: Dict[str, int] = {}
+        for job in self.jobs.values():
+            statuses[job.status] = statuses.get(job.status, 0) + 1
+        return {
+            "batches": statuses,
+            "queued": self._queue.qsize(),
+            "concurrency": self.concurrency,
+        }
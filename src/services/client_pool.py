@@ -0,0 +1,553 @@
+"""
+Pool of Gemini accounts with load-aware dispatch.
+"""
+
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from typing import List, Dict, Any, Optional, Callable, AsyncIterator, Collection
+
+from src.utils.exceptions import AuthenticationError, RateLimitError, ServiceUnavailableError
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def _quota_errors() -> tuple:
+    """Upstream errors that mean the account has exhausted its quota."""
+    # Imported on first use so importing the pool does not load gemini_webapi
+    from gemini_webapi.exceptions import UsageLimitExceededError, TemporarilyBlockedError
+
+    return (UsageLimitExceededError, TemporarilyBlockedError)
+
+
+def _auth_errors() -> tuple:
+    """Upstream errors that mean the account's session is no longer authenticated."""
+    from gemini_webapi.exceptions import AuthError
+
+    return (AuthError, AuthenticationError)
+
+
+def _cookie_value(client: Any, name: str) -> Optional[str]:
+    """Read a cookie from a client's live cookie jar."""
+    cookies = getattr(client, "cookies", None)
+    jar = getattr(cookies, "jar", None)
+    if jar is not None:
+        return next((cookie.value for cookie in jar if cookie.name == name), None)
+    return cookies.get(name) if isinstance(cookies, dict) else None
+
+
+class GeminiAccount:
+    """A single Gemini account and its dispatch state."""
+
+    def __init__(
+        self,
+        name: str,
+        secure_1psid: Optional[str],
+        secure_1psidts: Optional[str] = None,
+        max_inflight: int = 4,
+    ):
+        """
+        Initialize the account.
+
+        Args:
+            name: Display name used in logs and stats
+            secure_1psid: __Secure-1PSID cookie value
+            secure_1psidts: __Secure-1PSIDTS cookie value
+            max_inflight: Maximum concurrent requests sent through this account
+        """
+        self.name = name
+        self.secure_1psid = secure_1psid
+        self.secure_1psidts = secure_1psidts
+        self.max_inflight = max_inflight
+        self.client: Any = None
+        self.ready = False
+        self.inflight = 0
+        self.cooldown_until = 0.0
+        self.quota_strikes = 0
+        self.total_requests = 0
+        self.total_failures = 0
+        self.quota_errors = 0
+        self.last_error: Optional[str] = None
+        self.gems_loaded = False
+        self.gems_lock = asyncio.Lock()
+        # Authentication lifecycle: pending, ready, failed or expired
+        self.auth_state = "pending"
+        self.authenticated_at: Optional[float] = None
+        self.auth_failures = 0
+        # Monotonic time of the next background (re)authentication
+        self.next_auth_at = 0.0
+
+    def is_available(self, now: float) -> bool:
+        """Check whether the account can take another request right now."""
+        return (
+            self.ready
+            and self.cooldown_until <= now
+            and self.inflight < self.max_inflight
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        """Get dispatch statistics for this account."""
+        return {
+            "name": self.name,
+            "ready": self.ready,
+            "auth_state": self.auth_state,
+            "inflight": self.inflight,
+            "max_inflight": self.max_inflight,
+            "cooling_down_for": max(0.0, round(self.cooldown_until - time.monotonic(), 1)),
+            "total_requests": self.total_requests,
+            "total_failures": self.total_failures,
+            "quota_errors": self.quota_errors,
+            "last_error": self.last_error,
+        }
+
+
+class GeminiClientPool:
+    """Routes requests to the least-loaded healthy Gemini account."""
+
+    def __init__(
+        self,
+        accounts: List[Dict[str, str]],
+        client_factory: Callable[..., Any],
+        max_inflight: int = 4,
+        cooldown: float = 30.0,
+        max_cooldown: float = 900.0,
+    ):
+        """
+        Initialize the pool.
+
+        Args:
+            accounts: Cookie credentials, one dictionary per account
+            client_factory: Callable building a client from cookie credentials
+            max_inflight: Maximum concurrent requests per account
+            cooldown: Initial backoff after a quota error, in seconds
+            max_cooldown: Upper bound of the exponential backoff, in seconds
+        """
+        self.client_factory = client_factory
+        self.cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.accounts = [
+            GeminiAccount(
+                name=account.get("name") or f"account-{index}",
+                secure_1psid=account.get("secure_1psid"),
+                secure_1psidts=account.get("secure_1psidts"),
+                max_inflight=max_inflight,
+            )
+            for index, account in enumerate(accounts)
+        ]
+        self._accounts_by_name = {account.name: account for account in self.accounts}
+        self._condition = asyncio.Condition()
+        self.draining = False
+        self.init_kwargs: Dict[str, Any] = {}
+        # Set whenever an account loses or regains authentication
+        self.auth_changed = asyncio.Event()
+        # Replaced clients waiting for their last requests before closing
+        self._retiring: set = set()
+
+    async def init(self, fetch_gems: bool = True, **init_kwargs) -> None:
+        """
+        Initialize every account concurrently.
+
+        Accounts that fail to initialize stay out of rotation; the pool
+        itself never raises so the server can start in limited mode.
+
+        Args:
+            fetch_gems: Whether to fetch each account's gems after init
+            init_kwargs: Keyword arguments passed to ``GeminiClient.init``
+        """
+        self.init_kwargs = init_kwargs
+        await asyncio.gather(
+            *(self._init_account(account, fetch_gems, init_kwargs) for account in self.accounts)
+        )
+        ready = sum(1 for account in self.accounts if account.ready)
+        logger.info(f"Gemini client pool ready: {ready}/{len(self.accounts)} accounts")
+
+    async def _init_account(
+        self,
+        account: GeminiAccount,
+        fetch_gems: bool,
+        init_kwargs: Dict[str, Any],
+    ) -> None:
+        """Initialize a single account, recording any failure."""
+        try:
+            account.client = await self.connect(account)
+            self._authenticated(account)
+
+            if fetch_gems:
+                await self.fetch_gems(account)
+
+        except Exception as e:
+            account.last_error = str(e)
+            if not account.ready:
+                account.auth_state = "failed"
+                account.auth_failures += 1
+            logger.warning(f"[{account.name}] Failed to initialize Gemini client: {str(e)}")
+
+    async def connect(self, account: GeminiAccount) -> Any:
+        """
+        Build and initialize a new client from an account's latest cookies.
+
+        Args:
+            account: Account the client is for
+
+        Returns:
+            Initialized client; the account itself is not changed
+
+        Raises:
+            Exception: If the client fails to initialize
+        """
+        current = _cookie_value(account.client, "__Secure-1PSIDTS") if account.client else None
+        if current:
+            # Start from the cookie the running client rotated most recently
+            account.secure_1psidts = current
+        client = self.client_factory(
+            secure_1psid=account.secure_1psid,
+            secure_1psidts=account.secure_1psidts,
+        )
+        try:
+            await client.init(**self.init_kwargs)
+        except BaseException:
+            await client.close()
+            raise
+        return client
+
+    async def reconnect(self, account: GeminiAccount, close_delay: float = 0.0) -> None:
+        """
+        Initialize a new client for an account and swap it in.
+
+        The old client keeps serving until the new one is ready. Requests
+        that already hold it finish on it, and it is closed ``close_delay``
+        seconds after the swap.
+
+        Args:
+            account: Account to re-authenticate
+            close_delay: Seconds the replaced client stays open
+
+        Raises:
+            Exception: If the new client fails to initialize; the account
+                keeps its old client and state
+        """
+        client = await self.connect(account)
+        gems_loaded = account.gems_loaded
+        if gems_loaded:
+            try:
+                await client.fetch_gems()
+            except Exception as e:
+                gems_loaded = False
+                logger.warning(f"[{account.name}] Failed to fetch gems for the new client: {str(e)}")
+
+        # A single assignment, so every request sees either the old or the new client
+        previous, account.client = account.client, client
+        account.gems_loaded = gems_loaded
+        self._authenticated(account)
+        if previous is not None:
+            task = asyncio.create_task(self._close_later(previous, close_delay))
+            self._retiring.add(task)
+            task.add_done_callback(self._retiring.discard)
+
+        async with self._condition:
+            self._condition.notify_all()
+
+    async def _close_later(self, client: Any, delay: float) -> None:
+        """Close a replaced client once its requests have had time to finish."""
+        try:
+            await asyncio.sleep(delay)
+        finally:
+            try:
+                await client.close()
+            except Exception as e:
+                logger.warning(f"Failed to close a replaced Gemini client: {str(e)}")
+
+    def _authenticated(self, account: GeminiAccount) -> None:
+        """Put a freshly authenticated account into rotation."""
+        account.ready = True
+        account.auth_state = "ready"
+        account.authenticated_at = time.time()
+        account.auth_failures = 0
+        self.auth_changed.set()
+
+    async def fetch_gems(self, account: GeminiAccount, force: bool = False) -> None:
+        """
+        Fetch an account's gems, once unless forced.
+
+        Args:
+            account: Initialized account
+            force: Fetch again even if the gems are loaded
+        """
+        async with account.gems_lock:
+            if account.gems_loaded and not force:
+                return
+            await account.client.fetch_gems()
+            account.gems_loaded = True
+            logger.info(f"[{account.name}] Fetched {len(account.client.gems)} gems")
+
+    async def resolve_gem(self, account: GeminiAccount, gem: Optional[str]) -> Optional[str]:
+        """
+        Resolve a gem id or name to the id understood by an account.
+
+        Gem ids are passed through as they are, so the account's gems are
+        only fetched, once, when a request uses a gem.
+
+        Args:
+            account: Reserved account the gem will be used on
+            gem: Gem id or name from the request
+
+        Returns:
+            Gem id, or the given value if no gem of that name exists
+        """
+        if not gem:
+            return gem
+        try:
+            await self.fetch_gems(account)
+        except Exception as e:
+            logger.warning(f"[{account.name}] Failed to fetch gems: {str(e)}")
+            return gem
+
+        gems = account.client.gems
+        if gems.get(id=gem) is None:
+            match = next(iter(gems.filter(name=gem).values()), None)
+            if match is not None:
+                return match.id
+        return gem
+
+    async def sync_cookies(self, store: Any) -> None:
+        """
+        Exchange refreshed __Secure-1PSIDTS cookies with other workers.
+
+        A cookie this worker rotated is published to the store; otherwise a
+        newer cookie published by another worker is adopted. Accounts that
+        are not initialized yet simply start from the shared cookie.
+
+        Args:
+            store: ``SharedCookieStore`` shared by the workers
+        """
+        for account in self.accounts:
+            current = _cookie_value(account.client, "__Secure-1PSIDTS") if account.ready else None
+            if current and current != account.secure_1psidts:
+                account.secure_1psidts = current
+                await asyncio.to_thread(store.save, account.secure_1psid, current)
+                logger.info(f"[{account.name}] Published refreshed cookie to other workers")
+                continue
+
+            shared = await asyncio.to_thread(store.load, account.secure_1psid)
+            if not shared or shared == account.secure_1psidts:
+                continue
+            account.secure_1psidts = shared
+            if account.ready:
+                account.client.cookies = {"__Secure-1PSIDTS": shared}
+                logger.info(f"[{account.name}] Adopted cookie refreshed by another worker")
+
+    async def drain(self, timeout: float) -> None:
+        """
+        Stop handing out accounts and wait for in-flight requests to finish.
+
+        Args:
+            timeout: Maximum seconds to wait
+        """
+        self.draining = True
+        async with self._condition:
+            self._condition.notify_all()
+
+        async def wait_idle() -> None:
+            async with self._condition:
+                await self._condition.wait_for(
+                    lambda: not any(account.inflight for account in self.accounts)
+                )
+
+        try:
+            await asyncio.wait_for(wait_idle(), timeout)
+        except asyncio.TimeoutError:
+            inflight = sum(account.inflight for account in self.accounts)
+            logger.warning(f"Drain timed out with {inflight} requests still in flight")
+
+    async def close(self) -> None:
+        """Close every initialized client."""
+        # Replaced clients close at once instead of after their delay
+        for task in list(self._retiring):
+            task.cancel()
+        await asyncio.gather(*self._retiring, return_exceptions=True)
+        for account in self.accounts:
+            if account.client:
+                await account.client.close()
+            account.ready = False
+
+    @property
+    def primary(self) -> Optional[GeminiAccount]:
+        """First ready account, used for account-independent lookups."""
+        return next((account for account in self.accounts if account.ready), None)
+
+    async def checkout(
+        self,
+        preferred: Optional[str] = None,
+        exclude: Collection[str] = (),
+    ) -> GeminiAccount:
+        """
+        Reserve an in-flight slot on the least-loaded available account.
+
+        Waits while every healthy account is at its in-flight cap.
+
+        Args:
+            preferred: Name of an account to use if it is available
+            exclude: Names of accounts that must not be used, such as
+                accounts whose circuit is open
+
+        Returns:
+            Reserved account; release it with ``release``
+
+        Raises:
+            AuthenticationError: If no account is initialized
+            RateLimitError: If every initialized account is cooling down
+            ServiceUnavailableError: If the pool is draining for shutdown or
+                every initialized account is excluded
+        """
+        async with self._condition:
+            while True:
+                if self.draining:
+                    raise ServiceUnavailableError("Server is shutting down")
+
+                now = time.monotonic()
+                ready = [account for account in self.accounts if account.ready]
+                if not ready:
+                    raise AuthenticationError("No Gemini account is available")
+                if exclude:
+                    ready = [account for account in ready if account.name not in exclude]
+                    if not ready:
+                        raise ServiceUnavailableError("Gemini is failing on every account, try again later")
+
+                cooling = [account for account in ready if account.cooldown_until > now]
+                if len(cooling) == len(ready):
+                    raise RateLimitError(
+                        "All Gemini accounts are rate limited",
+                        retry_after=min(account.cooldown_until for account in cooling) - now,
+                    )
+
+                account = self._accounts_by_name.get(preferred) if preferred else None
+                if account is None or not account.is_available(now):
+                    candidates = [account for account in ready if account.is_available(now)]
+                    account = min(candidates, key=lambda a: a.inflight, default=None)
+
+                if account is not None:
+                    account.inflight += 1
+                    account.total_requests += 1
+                    return account
+
+                # Every healthy account is saturated; wake up on release or cooldown expiry
+                next_cooldown = min(
+                    (account.cooldown_until for account in cooling),
+                    default=None,
+                )
+                timeout = next_cooldown - now if next_cooldown else None
+                try:
+                    await asyncio.wait_for(self._condition.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+
+    async def release(self, account: GeminiAccount, error: Optional[BaseException] = None) -> None:
+        """
+        Return an in-flight slot and record the request outcome.
+
+        Args:
+            account: Account returned by ``checkout``
+            error: Exception raised by the request, if it failed
+        """
+        # Bookkeeping stays outside the lock so a cancelled caller cannot leak its slot
+        account.inflight -= 1
+        if error is None:
+            account.quota_strikes = 0
+        elif isinstance(error, Exception):
+            account.total_failures += 1
+            account.last_error = str(error)
+            if isinstance(error, _quota_errors()):
+                self._start_cooldown(account)
+            elif isinstance(error, _auth_errors()):
+                self._expire(account)
+
+        async with self._condition:
+            self._condition.notify_all()
+
+    def _expire(self, account: GeminiAccount) -> None:
+        """Take an account whose session was rejected out of rotation."""
+        if not account.ready:
+            return
+        # Out of rotation until the auth supervisor has a new session; requests never re-authenticate
+        account.ready = False
+        account.auth_state = "expired"
+        account.next_auth_at = 0.0
+        self.auth_changed.set()
+        logger.warning(f"[{account.name}] Gemini session is no longer authenticated")
+
+    async def ping(self, account: GeminiAccount) -> None:
+        """
+        Make the cheapest authenticated call Gemini offers with an account.
+
+        The call is the account status read gemini_webapi makes during init,
+        sent without the library closing the client when it fails. Clients
+        without it fetch their gems instead. The account's in-flight slots
+        are not used.
+
+        Args:
+            account: Ready account
+
+        Raises:
+            Exception: If Gemini rejects or fails the call
+        """
+        client = account.client
+        try:
+            if hasattr(client, "_batch_execute"):
+                from gemini_webapi.constants import GRPC
+                from gemini_webapi.types import RPCData
+
+                await client._batch_execute(
+                    [RPCData(rpcid=GRPC.GET_USER_STATUS, payload="[]")],
+                    close_on_error=False,
+                )
+            else:
+                await client.fetch_gems()
+        except _auth_errors():
+            self._expire(account)
+            raise
+
+    @asynccontextmanager
+    async def acquire(
+        self,
+        preferred: Optional[str] = None,
+        exclude: Collection[str] = (),
+    ) -> AsyncIterator[GeminiAccount]:
+        """
+        Reserve an account for the duration of a block.
+
+        Args:
+            preferred: Name of an account to use if it is available
+            exclude: Names of accounts that must not be used
+
+        Yields:
+            Reserved account
+        """
+        account = await self.checkout(preferred, exclude)
+        try:
+            yield account
+        except BaseException as e:
+            await self.release(account, e)
+            raise
+        else:
+            await self.release(account)
+
+    def _start_cooldown(self, account: GeminiAccount) -> None:
+        """Take an account out of rotation with exponential backoff."""
+        account.quota_errors += 1
+        account.quota_strikes += 1
+        delay = min(self.cooldown * 2 ** (account.quota_strikes - 1), self.max_cooldown)
+        account.cooldown_until = time.monotonic() + delay
+        logger.warning(f"[{account.name}] Quota exhausted, cooling down for {delay:.0f}s")
+
+    def retry_after(self) -> Optional[float]:
+        """Seconds until a cooling account is back in rotation, if every ready account is cooling."""
+        now = time.monotonic()
+        ready = [account for account in self.accounts if account.ready]
+        if not ready or any(account.cooldown_until <= now for account in ready):
+            return None
+        return min(account.cooldown_until for account in ready) - now
+
+    def stats(self) -> List[Dict[str, Any]]:
+        """Get dispatch statistics for every account."""
+        return [account.stats() for account in self.accounts]
@@ -0,0 +1,141 @@
+"""
+Cookie state shared between worker processes.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager, nullcontext
+from contextvars import ContextVar
+from typing import Dict, Any, Optional, AsyncIterator, Iterator
+
+import logging
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - non-POSIX platforms
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Store whose lock the current task holds, so saves made under ``hold`` do not wait on it
+_holder: ContextVar[Optional["SharedCookieStore"]] = ContextVar("cookie_store_holder", default=None)
+
+
+class SharedCookieStore:
+    """
+    Keeps refreshed __Secure-1PSIDTS values in a local file guarded by an
+    advisory lock, so every worker on the host uses the latest cookie.
+    """
+
+    def __init__(self, path: str):
+        """
+        Initialize the store.
+
+        Args:
+            path: JSON file holding the shared cookies; ``<path>.lock`` is
+                used as the lock file
+        """
+        self.path = path
+        self.lock_path = f"{path}.lock"
+        # flock is per open file, so threads of one process still need their own lock
+        self._thread_lock = threading.Lock()
+        if fcntl is None:
+            logger.warning("fcntl is unavailable, shared cookie store only locks within this process")
+
+    @staticmethod
+    def _key(secure_1psid: str) -> str:
+        """Identify an account without writing its credential to disk."""
+        return hashlib.sha256(secure_1psid.encode()).hexdigest()[:32]
+
+    @contextmanager
+    def _locked(self) -> Iterator[None]:
+        """Hold the cross-process lock."""
+        with self._thread_lock:
+            with open(self.lock_path, "a") as lock_file:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    if fcntl is not None:
+                        fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    @asynccontextmanager
+    async def hold(self) -> AsyncIterator[None]:
+        """
+        Hold the cross-process lock for the duration of a block.
+
+        Used to serialize client initialization, so workers starting
+        together do not all rotate the same cookie.
+        """
+        lock = self._locked()
+        await asyncio.to_thread(lock.__enter__)
+        token = _holder.set(self)
+        try:
+            yield
+        finally:
+            _holder.reset(token)
+            lock.__exit__(None, None, None)
+
+    def _read(self) -> Dict[str, Any]:
+        """Read the cookie file; a missing or corrupt file is treated as empty."""
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable shared cookie file {self.path}: {str(e)}")
+            return {}
+
+    def _write(self, data: Dict[str, Any]) -> None:
+        """Replace the cookie file atomically."""
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, temp_path = tempfile.mkstemp(dir=directory, prefix=".cookies-")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(data, f)
+            os.chmod(temp_path, 0o600)
+            os.replace(temp_path, self.path)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+
+    def load(self, secure_1psid: Optional[str]) -> Optional[str]:
+        """
+        Get the latest shared __Secure-1PSIDTS of an account.
+
+        Args:
+            secure_1psid: __Secure-1PSID cookie identifying the account
+
+        Returns:
+            Shared __Secure-1PSIDTS value, or None if none was stored
+        """
+        if not secure_1psid:
+            return None
+        entry = self._read().get(self._key(secure_1psid))
+        return entry["secure_1psidts"] if entry else None
+
+    def save(self, secure_1psid: Optional[str], secure_1psidts: Optional[str]) -> None:
+        """
+        Publish a refreshed __Secure-1PSIDTS to the other workers.
+
+        Args:
+            secure_1psid: __Secure-1PSID cookie identifying the account
+            secure_1psidts: Refreshed __Secure-1PSIDTS cookie value
+        """
+        if not secure_1psid or not secure_1psidts:
+            return
+        # Worker threads inherit the context of the task that holds the lock
+        with nullcontext() if _holder.get() is self else self._locked():
+            data = self._read()
+            data[self._key(secure_1psid)] = {
+                "secure_1psidts": secure_1psidts,
+                "updated": time.time(),
+            }
+            self._write(data)
@@ -0,0 +1,127 @@
+"""
+Fan-out of upstream generations for requests asking for several choices.
+"""
+
+import asyncio
+import math
+import time
+from typing import List, Dict, Any, Optional, Tuple, Callable, Awaitable
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def candidate_texts(gemini_output: Any) -> List[str]:
+    """
+    Get every candidate text of a Gemini response.
+
+    Args:
+        gemini_output: Gemini model output
+
+    Returns:
+        Candidate texts, falling back to the response text
+    """
+    texts = [
+        candidate.text
+        for candidate in getattr(gemini_output, 'candidates', None) or []
+        if getattr(candidate, 'text', None)
+    ]
+    return texts or [getattr(gemini_output, 'text', '') or '']
+
+
+class CandidateFanOut:
+    """Collects n choices from as few concurrent upstream calls as possible."""
+
+    # Weight of the newest sample in the candidates-per-call average
+    EWMA_ALPHA = 0.2
+    # Follow-up rounds for choices still missing after the first round
+    MAX_ROUNDS = 2
+
+    def __init__(self):
+        """Initialize the fan-out."""
+        # Gemini may return several drafts per call; start by assuming one
+        self.candidates_per_call = 1.0
+        self.upstream_calls = 0
+        self.failed_calls = 0
+        self.partial_results = 0
+
+    async def gather(
+        self,
+        n: int,
+        call: Callable[[], Awaitable[Any]],
+        deadline: Optional[float] = None,
+    ) -> Tuple[List[str], List[BaseException]]:
+        """
+        Run concurrent upstream calls until n candidates are collected.
+
+        The first round issues just enough calls for the expected number
+        of candidates per call; a second round issues one call per choice
+        still missing.
+        Calls still running at the deadline are cancelled.
+
+        Args:
+            n: Number of choices wanted
+            call: Factory starting one upstream generation
+            deadline: Monotonic time by which results are needed
+
+        Returns:
+            Up to n candidate texts and the errors of failed calls
+        """
+        texts: List[str] = []
+        errors: List[BaseException] = []
+
+        for round_number in range(self.MAX_ROUNDS):
+            missing = n - len(texts)
+            timeout = deadline - time.monotonic() if deadline is not None else None
+            if missing <= 0 or (timeout is not None and timeout <= 0):
+                break
+
+            # Top-up rounds do not rely on the estimate, so they cover every missing choice
+            per_call = max(1.0, self.candidates_per_call) if round_number == 0 else 1.0
+            calls = math.ceil(missing / per_call)
+            tasks = [asyncio.ensure_future(call()) for _ in range(calls)]
+            self.upstream_calls += calls
+            try:
+                done, pending = await asyncio.wait(tasks, timeout=timeout)
+            except BaseException:
+                for task in tasks:
+                    task.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
+                raise
+
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+            if pending:
+                errors.extend(asyncio.TimeoutError() for _ in pending)
+
+            for task in done:
+                if task.cancelled():
+                    errors.append(asyncio.CancelledError())
+                    continue
+                if task.exception() is not None:
+                    errors.append(task.exception())
+                    continue
+                candidates = candidate_texts(task.result())
+                self.candidates_per_call += self.EWMA_ALPHA * (
+                    len(candidates) - self.candidates_per_call
+                )
+                texts.extend(candidates)
+
+            if pending:
+                break
+
+        self.failed_calls += len(errors)
+        if len(texts) < n:
+            self.partial_results += 1
+        return texts[:n], errors
+
+    def stats(self) -> Dict[str, Any]:
+        """Get fan-out statistics."""
+        return {
+            "candidates_per_call": round(self.candidates_per_call, 2),
+            "upstream_calls": self.upstream_calls,
+            "failed_calls": self.failed_calls,
+            "partial_results": self.partial_results,
+        }
@@ -0,0 +1,231 @@
+"""
+Catalog of the models and gems served by the API.
+"""
+
+import asyncio
+import hashlib
+import time
+from typing import Any, Dict, FrozenSet, Iterable, Optional, Tuple
+
+from src.utils.serialization import dumps
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Gems are exposed as model ids with this prefix followed by the gem id
+GEM_MODEL_PREFIX = "gem-"
+
+
+class ModelRoute:
+    """Upstream model and gem a public model id is served by."""
+
+    __slots__ = ("id", "model", "gem", "owned_by", "created", "accounts")
+
+    def __init__(
+        self,
+        id: str,
+        model: str,
+        gem: Optional[str] = None,
+        owned_by: str = "google",
+        created: int = 0,
+        accounts: FrozenSet[str] = frozenset(),
+    ):
+        self.id = id
+        self.model = model
+        self.gem = gem
+        self.owned_by = owned_by
+        self.created = created
+        # Accounts a custom gem lives on; empty when every account can serve it
+        self.accounts = accounts
+
+
+class ModelRegistry:
+    """
+    Models and gems discovered from the Gemini accounts, plus static aliases.
+
+    Lookups are single dictionary reads, so unknown models are rejected
+    before any upstream capacity is spent on them. The ``/v1/models``
+    body and its ETag are rendered once per refresh.
+    """
+
+    def __init__(
+        self,
+        aliases: Dict[str, str],
+        gem_model: str = "unspecified",
+        refresh_interval: float = 600.0,
+        max_age: int = 60,
+    ):
+        """
+        Initialize the registry.
+
+        Args:
+            aliases: Static model ids mapped to the Gemini model serving them
+            gem_model: Gemini model used for requests to a gem model id
+            refresh_interval: Seconds between background refreshes
+            max_age: Seconds clients may cache the model list
+        """
+        self.aliases = dict(aliases)
+        self.gem_model = gem_model
+        self.refresh_interval = refresh_interval
+        self.max_age = max_age
+        # Whether models and gems of every ready account have been discovered
+        self.complete = False
+        self.refreshed_at: Optional[float] = None
+        self.body = b""
+        self.etag = ""
+        self._routes: Dict[str, ModelRoute] = {}
+        self._first_seen: Dict[str, int] = {}
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self._publish({}, {})
+
+    def resolve(self, model: str) -> Optional[ModelRoute]:
+        """Get the route of a model id, or None if it is unknown."""
+        return self._routes.get(model)
+
+    def route(self, model: str) -> Tuple[str, Optional[str]]:
+        """
+        Map a model id to the Gemini model and gem serving it.
+
+        Args:
+            model: Model id from the request
+
+        Returns:
+            Gemini model name and gem id; unknown ids are passed through
+        """
+        route = self._routes.get(model)
+        if route is None:
+            return model, None
+        return route.model, route.gem
+
+    def label(self, model: str) -> str:
+        """Metric label of a model id, bounding cardinality to known models."""
+        route = self._routes.get(model)
+        if route is None:
+            return "other"
+        return "gem" if route.gem else model
+
+    def is_stale(self) -> bool:
+        """Whether the catalog is older than the refresh interval."""
+        return self.refreshed_at is None or time.monotonic() - self.refreshed_at >= self.refresh_interval
+
+    async def refresh(self, pool: Any, gems: bool = True, refetch: bool = False) -> None:
+        """
+        Rediscover the models and gems of every ready account.
+
+        Args:
+            pool: ``GeminiClientPool`` whose accounts are queried
+            gems: Fetch gems of accounts that have not loaded them yet;
+                otherwise only gems already loaded are listed
+            refetch: Fetch gems again even if they are loaded, and refresh
+                even if the catalog is complete
+        """
+        async with self._lock:
+            if self.complete and not refetch:
+                # Another caller refreshed while this one waited
+                return
+
+            models: Dict[str, None] = {}
+            found_gems: Dict[str, Tuple[Any, set]] = {}
+            ready = [account for account in pool.accounts if account.ready]
+            for account in ready:
+                for model in _available_models(account.client):
+                    models[model] = None
+
+                if gems or account.gems_loaded:
+                    try:
+                        await pool.fetch_gems(account, force=refetch)
+                    except Exception as e:
+                        logger.warning(f"[{account.name}] Failed to fetch gems: {str(e)}")
+                        continue
+                    for gem in account.client.gems.values():
+                        found_gems.setdefault(gem.id, (gem, set()))[1].add(account.name)
+
+            self._publish(models, {
+                gem_id: (gem, frozenset(owners) if len(owners) < len(ready) else frozenset())
+                for gem_id, (gem, owners) in found_gems.items()
+            })
+            self.complete = self.complete or gems
+            self.refreshed_at = time.monotonic()
+            logger.info(f"Model catalog refreshed: {len(models)} discovered models, {len(found_gems)} gems")
+
+    def _publish(self, models: Iterable[str], gems: Dict[str, Tuple[Any, FrozenSet[str]]]) -> None:
+        """Rebuild the routes and the rendered model list, then swap them in."""
+        now = int(time.time())
+        routes: Dict[str, ModelRoute] = {}
+        for alias, model in self.aliases.items():
+            routes[alias] = ModelRoute(alias, model)
+        for model in models:
+            routes.setdefault(model, ModelRoute(model, model))
+        for gem_id, (gem, accounts) in gems.items():
+            model_id = GEM_MODEL_PREFIX + gem_id
+            owned_by = "google" if getattr(gem, "predefined", False) else "user"
+            routes[model_id] = ModelRoute(model_id, self.gem_model, gem_id, owned_by, accounts=accounts)
+
+        # Creation times are when a model was first seen, so they stay stable across refreshes
+        for route in routes.values():
+            route.created = self._first_seen.setdefault(route.id, now)
+
+        data = [
+            {"id": route.id, "object": "model", "created": route.created, "owned_by": route.owned_by}
+            for route in routes.values()
+        ]
+        self.body = dumps({"object": "list", "data": data})
+        # Keyed on the catalog, not on creation times that differ between workers
+        identity = dumps([[route.id, route.owned_by] for route in routes.values()])
+        self.etag = f'"{hashlib.sha256(identity).hexdigest()[:32]}"'
+        self._routes = routes
+
+    def start(self, pool: Any) -> None:
+        """Start refreshing the catalog in the background."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._refresh_loop(pool))
+
+    async def stop(self) -> None:
+        """Stop the background refresh."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _refresh_loop(self, pool: Any) -> None:
+        """Refresh the catalog every ``refresh_interval`` seconds."""
+        while True:
+            await asyncio.sleep(self.refresh_interval)
+            try:
+                await self.refresh(pool, refetch=True)
+            except Exception as e:
+                logger.warning(f"Failed to refresh the model catalog: {str(e)}")
+
+    def stats(self) -> Dict[str, Any]:
+        """Get catalog statistics."""
+        gems = sum(1 for route in self._routes.values() if route.gem)
+        return {
+            "models": len(self._routes) - gems,
+            "gems": gems,
+            "complete": self.complete,
+            "refreshed_ago": (
+                round(time.monotonic() - self.refreshed_at, 1) if self.refreshed_at is not None else None
+            ),
+            "etag": self.etag,
+        }
+
+
+def _available_models(client: Any) -> Iterable[str]:
+    """Names of the models a client may use, if the client library reports them."""
+    list_models = getattr(client, "list_models", None)
+    if list_models is None:
+        return ()
+    try:
+        available = list_models() or ()
+    except Exception as e:
+        logger.warning(f"Failed to list models: {str(e)}")
+        return ()
+    return [
+        str(getattr(model, "model_name", None) or model)
+        for model in available
+        if getattr(model, "is_available", True)
+    ]
@@ -0,0 +1,437 @@
+"""
+Retries, hedged requests and circuit breaking for upstream Gemini calls.
+"""
+
+import asyncio
+import random
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import List, Dict, Any, Optional, Callable, Awaitable, AsyncIterator, Tuple, Set, TypeVar
+
+from src.utils.exceptions import APIError, RateLimitError, UpstreamTimeoutError, map_upstream_error
+import logging
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Error classes with their own retry policy; anything else is not retried
+ERROR_CLASSES = ("timeout", "quota", "transient")
+
+
+def classify_error(error: BaseException) -> str:
+    """
+    Sort an upstream failure into a retry class.
+
+    Args:
+        error: Exception raised by an upstream attempt
+
+    Returns:
+        ``timeout``, ``quota``, ``transient`` or ``fatal``
+    """
+    # Our own errors already describe a final outcome, such as load shedding or an open circuit
+    if isinstance(error, APIError) or not isinstance(error, Exception):
+        return "fatal"
+
+    mapped = map_upstream_error(error)
+    if isinstance(mapped, UpstreamTimeoutError):
+        return "timeout"
+    if isinstance(mapped, RateLimitError):
+        return "quota"
+    # Only network failures and Gemini server errors are worth another attempt;
+    # unknown exceptions map to a non-retryable 500 and are fatal
+    if mapped.retryable and mapped.status_code in (502, 503):
+        return "transient"
+    return "fatal"
+
+
+class RetryPolicy:
+    """Retry budget and jittered exponential backoff for one error class."""
+
+    def __init__(self, max_attempts: int = 1, base_delay: float = 0.5, max_delay: float = 8.0):
+        """
+        Initialize the policy.
+
+        Args:
+            max_attempts: Attempts including the first one
+            base_delay: Backoff cap before the first retry, in seconds
+            max_delay: Upper bound of the backoff, in seconds
+        """
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def backoff(self, attempt: int) -> float:
+        """Full-jitter delay before retrying after the given attempt."""
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+
+
+class LatencyTracker:
+    """Sliding window of successful upstream latencies per model."""
+
+    def __init__(self, window: int = 200, min_samples: int = 20):
+        """
+        Initialize the tracker.
+
+        Args:
+            window: Latest samples kept per model
+            min_samples: Samples needed before a percentile is reported
+        """
+        self.window = window
+        self.min_samples = min_samples
+        self._samples: Dict[str, deque] = {}
+        # Sorted samples are rebuilt lazily after new observations
+        self._sorted: Dict[str, List[float]] = {}
+
+    def observe(self, key: str, seconds: float) -> None:
+        """Record one latency sample."""
+        samples = self._samples.get(key)
+        if samples is None:
+            samples = self._samples[key] = deque(maxlen=self.window)
+        samples.append(seconds)
+        self._sorted.pop(key, None)
+
+    def percentile(self, key: str, pct: float) -> Optional[float]:
+        """Get a latency percentile, or None while there are too few samples."""
+        samples = self._samples.get(key)
+        if samples is None or len(samples) < self.min_samples:
+            return None
+        ordered = self._sorted.get(key)
+        if ordered is None:
+            ordered = self._sorted[key] = sorted(samples)
+        rank = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered))) - 1))
+        return ordered[rank]
+
+
+class CircuitBreaker:
+    """Fails fast for one account and model while upstream keeps failing."""
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self,
+        failure_ratio: float = 0.5,
+        min_calls: int = 10,
+        window: int = 20,
+        open_seconds: float = 30.0,
+    ):
+        """
+        Initialize the breaker.
+
+        Args:
+            failure_ratio: Failure share of the window that opens the circuit
+            min_calls: Outcomes needed in the window before it can open
+            window: Latest call outcomes considered
+            open_seconds: Time the circuit stays open before a probe call
+        """
+        self.failure_ratio = failure_ratio
+        self.min_calls = min_calls
+        self.open_seconds = open_seconds
+        self.state = self.CLOSED
+        self.opened_at = 0.0
+        self.probing = False
+        self.times_opened = 0
+        self._outcomes: deque = deque(maxlen=window)
+        self._failures = 0
+
+    def allows(self, now: float) -> bool:
+        """Check whether a call may be sent, without reserving it."""
+        if self.state == self.CLOSED:
+            return True
+        if self.state == self.OPEN:
+            return now - self.opened_at >= self.open_seconds
+        return not self.probing
+
+    def before_call(self, now: float) -> None:
+        """Note a call being sent; after the open period it becomes the probe."""
+        if self.state == self.OPEN and now - self.opened_at >= self.open_seconds:
+            self.state = self.HALF_OPEN
+        if self.state == self.HALF_OPEN:
+            self.probing = True
+
+    def record(self, success: bool, now: float) -> None:
+        """Record the outcome of a call."""
+        if self.state == self.HALF_OPEN:
+            self.probing = False
+            if success:
+                self._reset()
+            else:
+                self._open(now)
+            return
+
+        if len(self._outcomes) == self._outcomes.maxlen:
+            self._failures -= not self._outcomes[0]
+        self._outcomes.append(success)
+        self._failures += not success
+        if (
+            self.state == self.CLOSED
+            and len(self._outcomes) >= self.min_calls
+            and self._failures / len(self._outcomes) >= self.failure_ratio
+        ):
+            self._open(now)
+
+    def _open(self, now: float) -> None:
+        self.state = self.OPEN
+        self.opened_at = now
+        self.times_opened += 1
+
+    def _reset(self) -> None:
+        self.state = self.CLOSED
+        self._outcomes.clear()
+        self._failures = 0
+
+
+class UpstreamResilience:
+    """Applies retry policies, hedging and circuit breakers to upstream calls."""
+
+    def __init__(
+        self,
+        retry_policies: Optional[Dict[str, RetryPolicy]] = None,
+        attempt_timeout: Optional[float] = None,
+        hedge_percentile: Optional[float] = None,
+        hedge_min_delay: float = 1.0,
+        latency_tracker: Optional[LatencyTracker] = None,
+        circuit_breaker_factory: Optional[Callable[[], CircuitBreaker]] = None,
+    ):
+        """
+        Initialize the resilience layer.
+
+        Args:
+            retry_policies: Policy per error class from ``ERROR_CLASSES``
+            attempt_timeout: Maximum seconds of a single attempt
+            hedge_percentile: Latency percentile after which a second attempt
+                is started; None disables hedging
+            hedge_min_delay: Never hedge an attempt younger than this, in seconds
+            latency_tracker: Source of the hedging percentile
+            circuit_breaker_factory: Builds the breaker of an account and
+                model; None disables circuit breaking
+        """
+        self.retry_policies = retry_policies or {}
+        self.attempt_timeout = attempt_timeout
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_delay = hedge_min_delay
+        self.latency = latency_tracker or LatencyTracker()
+        self.circuit_breaker_factory = circuit_breaker_factory
+        self._breakers: Dict[Tuple[str, str], CircuitBreaker] = {}
+        self.retries = {error_class: 0 for error_class in ERROR_CLASSES}
+        self.hedges = 0
+        self.hedges_won = 0
+
+    def _breaker(self, account: str, model: str) -> Optional[CircuitBreaker]:
+        if self.circuit_breaker_factory is None:
+            return None
+        breaker = self._breakers.get((account, model))
+        if breaker is None:
+            breaker = self._breakers[(account, model)] = self.circuit_breaker_factory()
+        return breaker
+
+    def open_circuits(self, model: str) -> Set[str]:
+        """
+        Get the accounts that must not be used for a model right now.
+
+        Args:
+            model: Model the call is for
+
+        Returns:
+            Names of accounts whose circuit rejects calls
+        """
+        now = time.monotonic()
+        return {
+            account
+            for (account, breaker_model), breaker in self._breakers.items()
+            if breaker_model == model and not breaker.allows(now)
+        }
+
+    def blocked_accounts(self) -> Set[str]:
+        """
+        Get the accounts whose circuit rejects calls for every model they served.
+
+        Returns:
+            Names of accounts that cannot take any call right now
+        """
+        now = time.monotonic()
+        allowed: Dict[str, bool] = {}
+        for (account, _), breaker in self._breakers.items():
+            allowed[account] = allowed.get(account, False) or breaker.allows(now)
+        return {account for account, allows in allowed.items() if not allows}
+
+    @asynccontextmanager
+    async def guard(self, account: str, model: str) -> AsyncIterator[None]:
+        """
+        Record the outcome of one upstream call in its circuit breaker.
+
+        Cancelled calls and errors that say nothing about upstream health,
+        such as invalid requests, are not recorded.
+
+        Args:
+            account: Name of the account the call is sent through
+            model: Model the call is for
+        """
+        breaker = self._breaker(account, model)
+        if breaker is None:
+            yield
+            return
+
+        breaker.before_call(time.monotonic())
+        try:
+            yield
+        except Exception as e:
+            error_class = classify_error(e)
+            if error_class in ("timeout", "transient"):
+                was_open = breaker.state == CircuitBreaker.OPEN
+                breaker.record(False, time.monotonic())
+                if not was_open and breaker.state == CircuitBreaker.OPEN:
+                    logger.warning(f"[{account}] Circuit opened for {model} after repeated upstream failures")
+            else:
+                breaker.probing = False
+            raise
+        except BaseException:
+            breaker.probing = False
+            raise
+        else:
+            was_closed = breaker.state == CircuitBreaker.CLOSED
+            breaker.record(True, time.monotonic())
+            if not was_closed and breaker.state == CircuitBreaker.CLOSED:
+                logger.info(f"[{account}] Circuit closed for {model}")
+
+    def retry_delay(
+        self,
+        error: BaseException,
+        attempt: int,
+        deadline: Optional[float] = None,
+    ) -> Optional[float]:
+        """
+        Decide whether a failed attempt is retried.
+
+        Args:
+            error: Exception raised by the attempt
+            attempt: Number of attempts made so far
+            deadline: Monotonic time by which the call must have finished
+
+        Returns:
+            Seconds to wait before the retry, or None to give up
+        """
+        error_class = classify_error(error)
+        policy = self.retry_policies.get(error_class)
+        if policy is None or attempt >= policy.max_attempts:
+            return None
+        delay = policy.backoff(attempt)
+        if deadline is not None and time.monotonic() + delay >= deadline:
+            return None
+        self.retries[error_class] += 1
+        logger.warning(
+            f"Upstream attempt {attempt} failed ({error_class}: {str(error) or type(error).__name__}), "
+            f"retrying in {delay:.2f}s"
+        )
+        return delay
+
+    async def call(
+        self,
+        model: str,
+        attempt: Callable[[], Awaitable[T]],
+        deadline: Optional[float] = None,
+        hedge: bool = True,
+    ) -> T:
+        """
+        Run an upstream call with retries and hedging.
+
+        Args:
+            model: Model the call is for, keying latency percentiles
+            attempt: Factory starting one attempt; it picks its account and
+                guards the upstream call itself
+            deadline: Monotonic time by which the call must have finished
+            hedge: Whether a slow attempt may be raced by a second one;
+                disable it for attempts that must not run twice at once
+
+        Returns:
+            Result of the first successful attempt
+        """
+        attempts = 0
+        while True:
+            attempts += 1
+            try:
+                return await self._hedged(model, attempt, deadline, hedge)
+            except Exception as e:
+                delay = self.retry_delay(e, attempts, deadline)
+                if delay is None:
+                    raise
+            await asyncio.sleep(delay)
+
+    def _timeout(self, deadline: Optional[float]) -> Optional[float]:
+        """Time budget of one attempt."""
+        remaining = deadline - time.monotonic() if deadline is not None else None
+        if self.attempt_timeout is None:
+            return remaining
+        if remaining is None:
+            return self.attempt_timeout
+        return min(self.attempt_timeout, remaining)
+
+    async def _timed(self, model: str, attempt: Callable[[], Awaitable[T]], deadline: Optional[float]) -> T:
+        """Run one attempt within its time budget and record its latency."""
+        started_at = time.monotonic()
+        result = await asyncio.wait_for(attempt(), self._timeout(deadline))
+        self.latency.observe(model, time.monotonic() - started_at)
+        return result
+
+    def hedge_delay(self, model: str) -> Optional[float]:
+        """Age at which an attempt for a model is hedged, or None."""
+        if self.hedge_percentile is None:
+            return None
+        threshold = self.latency.percentile(model, self.hedge_percentile)
+        return max(threshold, self.hedge_min_delay) if threshold is not None else None
+
+    async def _hedged(
+        self,
+        model: str,
+        attempt: Callable[[], Awaitable[T]],
+        deadline: Optional[float],
+        hedge: bool = True,
+    ) -> T:
+        """Run an attempt, racing a second one if the first is slow."""
+        delay = self.hedge_delay(model) if hedge else None
+        if delay is None:
+            return await self._timed(model, attempt, deadline)
+
+        first = asyncio.ensure_future(self._timed(model, attempt, deadline))
+        tasks = {first}
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            if not done:
+                self.hedges += 1
+                tasks.add(asyncio.ensure_future(self._timed(model, attempt, deadline)))
+
+            # Take the first success; fail only once every attempt has failed
+            error = None
+            while tasks:
+                done, tasks = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is not first:
+                            self.hedges_won += 1
+                        return task.result()
+                    error = error or task.exception()
+            raise error
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    def stats(self) -> Dict[str, Any]:
+        """Get retry, hedging and circuit statistics."""
+        return {
+            "retries": dict(self.retries),
+            "hedges": self.hedges,
+            "hedges_won": self.hedges_won,
+            "circuits": [
+                {
+                    "account": account,
+                    "model": model,
+                    "state": breaker.state,
+                    "times_opened": breaker.times_opened,
+                }
+                for (account, model), breaker in self._breakers.items()
+            ],
+        }
@@ -0,0 +1,190 @@
+"""
+Response cache for identical chat completion requests.
+"""
+
+import asyncio
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Tuple
+
+from src.utils.serialization import dumps, loads
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class DiskCacheTier:
+    """SQLite-backed cache tier that survives restarts."""
+
+    # Expired rows are purged and the row cap enforced every N writes
+    PURGE_INTERVAL = 100
+
+    def __init__(self, path: str, max_entries: int = 100000):
+        """
+        Initialize the disk tier.
+
+        Args:
+            path: SQLite database file path
+            max_entries: Maximum number of rows kept on disk
+        """
+        self.path = path
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._writes = 0
+        self._connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, value BLOB NOT NULL, expires_at REAL NOT NULL)"
+        )
+
+    def get(self, key: str) -> Optional[Tuple[bytes, float]]:
+        """Read a live entry, returning its payload and expiry time."""
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT value, expires_at FROM responses WHERE key = ? AND expires_at > ?",
+                (key, time.time()),
+            ).fetchone()
+        return (bytes(row[0]), row[1]) if row else None
+
+    def set(self, key: str, value: bytes, expires_at: float) -> None:
+        """Write an entry, purging expired and excess rows periodically."""
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO responses (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, value, expires_at),
+            )
+            self._writes += 1
+            if self._writes % self.PURGE_INTERVAL == 0:
+                self._purge()
+
+    def _purge(self) -> None:
+        """Drop expired rows, then the soonest-expiring rows above the cap."""
+        self._connection.execute("DELETE FROM responses WHERE expires_at <= ?", (time.time(),))
+        self._connection.execute(
+            "DELETE FROM responses WHERE key IN ("
+            "SELECT key FROM responses ORDER BY expires_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,),
+        )
+
+    def close(self) -> None:
+        """Close the database connection."""
+        with self._lock:
+            self._connection.close()
+
+
+class ResponseCache:
+    """Two-tier cache of chat completion payloads keyed by request fingerprint."""
+
+    def __init__(
+        self,
+        max_entries: int = 1024,
+        max_bytes: int = 64 * 1024 * 1024,
+        ttl: float = 3600.0,
+        disk_path: Optional[str] = None,
+        disk_max_entries: int = 100000,
+    ):
+        """
+        Initialize the cache.
+
+        Args:
+            max_entries: Maximum number of entries kept in memory
+            max_bytes: Maximum total payload size kept in memory
+            ttl: Seconds an entry stays valid
+            disk_path: Optional SQLite file for the persistent tier
+            disk_max_entries: Maximum number of entries kept on disk
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.disk = DiskCacheTier(disk_path, disk_max_entries) if disk_path else None
+        self._entries: "OrderedDict[str, Tuple[bytes, float]]" = OrderedDict()
+        self._size = 0
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """
+        Look up a cached payload.
+
+        Args:
+            key: Request fingerprint
+
+        Returns:
+            Cached payload, or None on a miss
+        """
+        entry = self._entries.get(key)
+        if entry is not None:
+            if entry[1] > time.time():
+                self._entries.move_to_end(key)
+                self.memory_hits += 1
+                return loads(entry[0])
+            self._evict(key)
+
+        if self.disk:
+            try:
+                entry = await asyncio.to_thread(self.disk.get, key)
+            except sqlite3.Error as e:
+                logger.warning(f"Disk cache read failed: {str(e)}")
+                entry = None
+            if entry is not None:
+                self._store(key, *entry)
+                self.disk_hits += 1
+                return loads(entry[0])
+
+        self.misses += 1
+        return None
+
+    async def set(self, key: str, payload: Dict[str, Any]) -> None:
+        """
+        Cache a payload in every tier.
+
+        Args:
+            key: Request fingerprint
+            payload: JSON-compatible response payload
+        """
+        value = dumps(payload)
+        expires_at = time.time() + self.ttl
+        self._store(key, value, expires_at)
+
+        if self.disk:
+            try:
+                await asyncio.to_thread(self.disk.set, key, value, expires_at)
+            except sqlite3.Error as e:
+                logger.warning(f"Disk cache write failed: {str(e)}")
+
+    def _store(self, key: str, value: bytes, expires_at: float) -> None:
+        """Insert into the memory tier, evicting least recently used entries."""
+        if len(value) > self.max_bytes:
+            return
+        if key in self._entries:
+            self._evict(key)
+        self._entries[key] = (value, expires_at)
+        self._size += len(value)
+        while len(self._entries) > self.max_entries or self._size > self.max_bytes:
+            oldest_key, (oldest_value, _) = self._entries.popitem(last=False)
+            self._size -= len(oldest_value)
+
+    def _evict(self, key: str) -> None:
+        """Remove an entry from the memory tier."""
+        value, _ = self._entries.pop(key)
+        self._size -= len(value)
+
+    def close(self) -> None:
+        """Release the disk tier."""
+        if self.disk:
+            self.disk.close()
+
+    def stats(self) -> Dict[str, Any]:
+        """Get cache statistics."""
+        return {
+            "entries": len(self._entries),
+            "bytes": self._size,
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+        }
@@ -0,0 +1,160 @@
+"""
+Conversation session store mapping message histories to live Gemini chats.
+"""
+
+import hashlib
+import time
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional
+
+from src.models.gemini_models import ChatMessage, Role
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class ConversationSession:
+    """A live Gemini chat that continues a known message history."""
+
+    __slots__ = ("account", "metadata", "history_length", "expires_at")
+
+    def __init__(self, account: str, metadata: List[Any], history_length: int, expires_at: float):
+        """
+        Initialize the session.
+
+        Args:
+            account: Name of the account that owns the Gemini chat
+            metadata: Gemini chat metadata (cid, rid, rcid, ...)
+            history_length: Number of request messages already in the chat
+            expires_at: Monotonic time after which the session is dropped
+        """
+        self.account = account
+        self.metadata = metadata
+        self.history_length = history_length
+        self.expires_at = expires_at
+
+
+class ConversationSessionStore:
+    """LRU store of Gemini chats keyed by a hash of the message history."""
+
+    def __init__(self, max_entries: int = 10000, ttl: float = 3600.0):
+        """
+        Initialize the store.
+
+        Args:
+            max_entries: Maximum number of sessions kept
+            ttl: Seconds a session stays usable after its last turn
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._sessions: "OrderedDict[bytes, ConversationSession]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def digest_chain(
+        self,
+        messages: List[ChatMessage],
+        model: str,
+        gem: Optional[str] = None,
+    ) -> List[bytes]:
+        """
+        Hash every prefix of a message history.
+
+        Each digest covers the model, gem and all messages up to that
+        position, so the chain is computed in a single pass.
+
+        Args:
+            messages: Request messages
+            model: Gemini model name
+            gem: Optional gem ID
+
+        Returns:
+            One digest per message
+        """
+        digest = hashlib.blake2b(f"{model}\0{gem or ''}".encode(), digest_size=16).digest()
+        chain = []
+        for message in messages:
+            digest = self._extend(digest, message.role, message.identity())
+            chain.append(digest)
+        return chain
+
+    def lookup(self, messages: List[ChatMessage], chain: List[bytes]) -> Optional[ConversationSession]:
+        """
+        Find the session continuing everything up to the last assistant turn.
+
+        Args:
+            messages: Request messages
+            chain: Digest chain of the messages
+
+        Returns:
+            Matching session, or None if the history is unknown
+        """
+        history_length = 0
+        for index in range(len(messages) - 1, -1, -1):
+            if messages[index].role == Role.ASSISTANT:
+                history_length = index + 1
+                break
+
+        if not history_length or history_length == len(messages):
+            return None
+
+        key = chain[history_length - 1]
+        session = self._sessions.get(key)
+        if session is None or session.expires_at <= time.monotonic():
+            self._sessions.pop(key, None)
+            self.misses += 1
+            return None
+
+        self._sessions.move_to_end(key)
+        self.hits += 1
+        return session
+
+    def remember(
+        self,
+        chain: List[bytes],
+        reply: str,
+        account: str,
+        metadata: List[Any],
+    ) -> None:
+        """
+        Record the chat that now ends with the assistant reply.
+
+        Args:
+            chain: Digest chain of the request messages
+            reply: Assistant reply returned to the client
+            account: Name of the account that owns the chat
+            metadata: Gemini chat metadata after the reply
+        """
+        if not chain or not metadata or not metadata[0]:
+            return
+
+        key = self._extend(chain[-1], Role.ASSISTANT, reply)
+        self._sessions[key] = ConversationSession(
+            account=account,
+            metadata=list(metadata),
+            history_length=len(chain) + 1,
+            expires_at=time.monotonic() + self.ttl,
+        )
+        self._sessions.move_to_end(key)
+        while len(self._sessions) > self.max_entries:
+            self._sessions.popitem(last=False)
+
+    def _extend(self, digest: bytes, role: str, content: Optional[str]) -> bytes:
+        """Extend a prefix digest with one message."""
+        role = role.value if isinstance(role, Role) else role
+        # Clients often trim whitespace when echoing assistant replies back
+        text = (content or "").strip()
+        hasher = hashlib.blake2b(digest, digest_size=16)
+        hasher.update(role.encode())
+        hasher.update(b"\0")
+        hasher.update(text.encode("utf-8", "surrogatepass"))
+        return hasher.digest()
+
+    def stats(self) -> Dict[str, Any]:
+        """Get session store statistics."""
+        return {
+            "sessions": len(self._sessions),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
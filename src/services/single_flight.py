@@ -0,0 +1,155 @@
+"""
+Single-flight coalescing of concurrent identical upstream calls.
+"""
+
+import asyncio
+from typing import Dict, Any, List, Optional, Callable, Awaitable, AsyncIterator
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class _CallFlight:
+    """An in-flight upstream call shared by every waiter."""
+
+    __slots__ = ("task", "waiters")
+
+    def __init__(self, task: "asyncio.Future[Any]"):
+        self.task = task
+        self.waiters = 0
+
+
+class _StreamFlight:
+    """An in-flight upstream stream replayed to every subscriber."""
+
+    __slots__ = ("items", "finished", "error", "subscribers", "changed", "task")
+
+    def __init__(self):
+        self.items: List[Any] = []
+        self.finished = False
+        self.error: Optional[BaseException] = None
+        self.subscribers = 0
+        self.changed = asyncio.Event()
+        self.task: Optional["asyncio.Task[None]"] = None
+
+    def notify(self) -> None:
+        """Wake up every subscriber waiting for new items."""
+        self.changed.set()
+        self.changed = asyncio.Event()
+
+
+class SingleFlight:
+    """Shares one upstream call between concurrent requests with the same key."""
+
+    def __init__(self):
+        """Initialize the coalescer."""
+        self._calls: Dict[str, _CallFlight] = {}
+        self._streams: Dict[str, _StreamFlight] = {}
+        self.upstream_calls = 0
+        self.coalesced = 0
+
+    async def do(self, key: str, call: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Run a call, or join the identical call already in flight.
+
+        The shared call runs in its own task, so a waiter that goes away
+        does not cancel it for the others; it is only cancelled once no
+        waiter is left.
+
+        Args:
+            key: Canonical request key
+            call: Factory starting the upstream call
+
+        Returns:
+            Result of the shared call
+        """
+        flight = self._calls.get(key)
+        if flight is None:
+            flight = _CallFlight(asyncio.ensure_future(call()))
+            self._calls[key] = flight
+            flight.task.add_done_callback(lambda _: self._forget(self._calls, key, flight))
+            self.upstream_calls += 1
+        else:
+            self.coalesced += 1
+
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.task)
+        finally:
+            flight.waiters -= 1
+            if not flight.waiters and not flight.task.done():
+                self._forget(self._calls, key, flight)
+                flight.task.cancel()
+
+    async def subscribe(
+        self,
+        key: str,
+        stream: Callable[[], AsyncIterator[Any]],
+    ) -> AsyncIterator[Any]:
+        """
+        Iterate a stream, or join the identical stream already in flight.
+
+        Subscribers that join late first replay the items received so far.
+        The upstream stream is closed once every subscriber has left.
+
+        Args:
+            key: Canonical request key
+            stream: Factory opening the upstream stream
+
+        Yields:
+            Items of the shared stream
+        """
+        flight = self._streams.get(key)
+        if flight is None:
+            flight = _StreamFlight()
+            self._streams[key] = flight
+            flight.task = asyncio.create_task(self._pump(key, flight, stream()))
+            self.upstream_calls += 1
+        else:
+            self.coalesced += 1
+
+        flight.subscribers += 1
+        try:
+            position = 0
+            while True:
+                changed = flight.changed
+                while position < len(flight.items):
+                    yield flight.items[position]
+                    position += 1
+                if flight.finished:
+                    if flight.error is not None:
+                        raise flight.error
+                    return
+                await changed.wait()
+        finally:
+            flight.subscribers -= 1
+            if not flight.subscribers and not flight.finished:
+                self._forget(self._streams, key, flight)
+                flight.task.cancel()
+
+    async def _pump(self, key: str, flight: _StreamFlight, source: AsyncIterator[Any]) -> None:
+        """Read the upstream stream into the flight buffer."""
+        try:
+            async for item in source:
+                flight.items.append(item)
+                flight.notify()
+        except Exception as e:
+            flight.error = e
+        finally:
+            await source.aclose()
+            flight.finished = True
+            self._forget(self._streams, key, flight)
+            flight.notify()
+
+    def _forget(self, flights: Dict[str, Any], key: str, flight: Any) -> None:
+        """Stop new requests from joining a flight."""
+        if flights.get(key) is flight:
+            del flights[key]
+
+    def stats(self) -> Dict[str, Any]:
+        """Get coalescing statistics."""
+        return {
+            "upstream_calls": self.upstream_calls,
+            "coalesced": self.coalesced,
+            "in_flight": len(self._calls) + len(self._streams),
+        }
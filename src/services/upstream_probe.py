@@ -0,0 +1,104 @@
+"""
+Cached liveness check of the Gemini upstream.
+"""
+
+import asyncio
+import time
+from typing import Any, Dict, Optional
+
+from .client_pool import GeminiClientPool
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class UpstreamProbe:
+    """
+    Checks that Gemini answers an authenticated call, at most once per interval.
+
+    Probes between checks get the cached result. Once a first result
+    exists, a stale one is returned at once while the next check runs in
+    the background, so frequent health probes neither reach Gemini nor
+    wait for it.
+    """
+
+    def __init__(self, pool: GeminiClientPool, interval: float = 30.0, timeout: float = 10.0):
+        """
+        Initialize the probe.
+
+        Args:
+            pool: Client pool whose first ready account is checked
+            interval: Seconds a result is reused before the next check
+            timeout: Seconds a check may take before it counts as failed
+        """
+        self.pool = pool
+        self.interval = interval
+        self.timeout = timeout
+        self.checks = 0
+        self.failures = 0
+        self._result: Optional[Dict[str, Any]] = None
+        self._checked_at = 0.0
+        self._task: Optional[asyncio.Task] = None
+
+    async def check(self) -> Dict[str, Any]:
+        """
+        Get the latest check result, starting a new check if it is stale.
+
+        Only the first call waits for a check to finish.
+
+        Returns:
+            Whether Gemini answered, the account and latency of the check,
+            its error and its age in seconds
+        """
+        if self._task is None and (
+            self._result is None or time.monotonic() - self._checked_at >= self.interval
+        ):
+            self._task = asyncio.create_task(self._run())
+        if self._result is None:
+            # Shielded so a disconnecting prober does not abort the shared check
+            await asyncio.shield(self._task)
+        return {**self._result, "checked_ago": round(time.monotonic() - self._checked_at, 1)}
+
+    async def _run(self) -> None:
+        """Ping Gemini with the first ready account and store the outcome."""
+        account = self.pool.primary
+        started_at = time.perf_counter()
+        error = None
+        try:
+            if account is None:
+                error = "No authenticated Gemini account"
+            else:
+                await asyncio.wait_for(self.pool.ping(account), self.timeout)
+        except asyncio.TimeoutError:
+            error = f"Gemini did not answer within {self.timeout}s"
+        except Exception as e:
+            error = str(e) or type(e).__name__
+        finally:
+            self._task = None
+
+        self.checks += 1
+        if error is not None:
+            self.failures += 1
+            logger.warning(f"Upstream health check failed: {error}")
+        self._result = {
+            "ok": error is None,
+            "account": account.name if account else None,
+            "latency_ms": round((time.perf_counter() - started_at) * 1000, 1) if account else None,
+            "error": error,
+        }
+        self._checked_at = time.monotonic()
+
+    async def close(self) -> None:
+        """Cancel a check in progress."""
+        task = self._task
+        if task is not None:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+    def stats(self) -> Dict[str, Any]:
+        """Get probe counters."""
+        return {
+            "interval": self.interval,
+            "checks": self.checks,
+            "failures": self.failures,
+        }
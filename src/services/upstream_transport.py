@@ -0,0 +1,178 @@
+"""
+Connection pool and timeout tuning of the Gemini HTTP transport.
+"""
+
+import time
+import weakref
+from typing import Any, Dict, Optional
+
+from src.utils.metrics import UPSTREAM_CONNECTIONS, UPSTREAM_POOL_WAIT
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class UpstreamTransport:
+    """
+    Applies pool, keep-alive, HTTP/2 and timeout settings to Gemini clients.
+
+    gemini_webapi builds its curl_cffi session inside ``GeminiClient.init``
+    without exposing its options, and builds a new one whenever a client
+    re-initializes. Client classes wrapped by ``wrap`` therefore tune each
+    new session right after init. Tuned sessions also report how long
+    requests wait for a free handle and whether they reused a connection.
+    """
+
+    def __init__(
+        self,
+        max_connections: int = 10,
+        keepalive_expiry: float = 120.0,
+        http2: bool = True,
+        connect_timeout: float = 10.0,
+        total_timeout: float = 300.0,
+    ):
+        """
+        Initialize the transport settings.
+
+        Args:
+            max_connections: Concurrent requests, and connections kept, per client
+            keepalive_expiry: Seconds an idle connection is kept for reuse
+            http2: Multiplex requests over HTTP/2 connections; otherwise use HTTP/1.1
+            connect_timeout: Seconds allowed to establish a connection
+            total_timeout: Seconds allowed for a whole request
+        """
+        self.max_connections = max(1, max_connections)
+        self.keepalive_expiry = keepalive_expiry
+        self.http2 = http2
+        self.connect_timeout = connect_timeout
+        self.total_timeout = total_timeout
+        self.requests = 0
+        self.new_connections = 0
+        self.pool_waits = 0
+        self._tuned: "weakref.WeakSet[Any]" = weakref.WeakSet()
+
+    def wrap(self, client_class: type) -> type:
+        """
+        Subclass a Gemini client class so every init tunes its new session.
+
+        Args:
+            client_class: ``GeminiClient`` or a compatible class
+
+        Returns:
+            Subclass with the same name
+        """
+        transport = self
+
+        class TunedClient(client_class):
+            async def init(self, *args, **kwargs):
+                await super().init(*args, **kwargs)
+                session = getattr(self, "client", None)
+                if session is not None:
+                    transport.tune(session)
+
+        TunedClient.__name__ = TunedClient.__qualname__ = client_class.__name__
+        return TunedClient
+
+    def tune(self, session: Any) -> None:
+        """
+        Apply the settings to a live curl_cffi session, once per session.
+
+        Must run right after the session's init returns, while every curl
+        handle is back in the pool.
+
+        Args:
+            session: ``curl_cffi.requests.AsyncSession`` of a Gemini client
+        """
+        if session in self._tuned:
+            return
+        from curl_cffi.const import CurlHttpVersion, CurlMOpt, CurlOpt
+
+        # Split timeouts; the read part is whatever the connect part leaves of the total
+        session.timeout = (self.connect_timeout, max(self.total_timeout - self.connect_timeout, 1.0))
+        session.http_version = CurlHttpVersion.V2TLS if self.http2 else CurlHttpVersion.V1_1
+        session.curl_options = {
+            **session.curl_options,
+            CurlOpt.MAXAGE_CONN: int(self.keepalive_expiry),
+            CurlOpt.TCP_KEEPALIVE: 1,
+            # Wait for an HTTP/2 connection being set up instead of opening another one
+            CurlOpt.PIPEWAIT: int(self.http2),
+        }
+        session.acurl.setopt(CurlMOpt.MAX_HOST_CONNECTIONS, self.max_connections)
+        session.acurl.setopt(CurlMOpt.MAXCONNECTS, self.max_connections)
+
+        if session.max_clients != self.max_connections:
+            while not session.pool.empty():
+                curl = session.pool.get_nowait()
+                if curl is not None:
+                    curl.close()
+            session.max_clients = self.max_connections
+            session.init_pool()
+
+        self._instrument(session)
+        self._tuned.add(session)
+        logger.debug(
+            f"Tuned Gemini transport: {self.max_connections} connections, "
+            f"{'HTTP/2' if self.http2 else 'HTTP/1.1'}, keep-alive {self.keepalive_expiry}s"
+        )
+
+    def _instrument(self, session: Any) -> None:
+        """Count pool waits and new connections of a session's requests."""
+        from curl_cffi.const import CurlInfo
+
+        pop_curl = session.pop_curl
+        release_curl = session.release_curl
+
+        async def timed_pop_curl():
+            if not session.pool.empty():
+                return await pop_curl()
+            # Every handle is busy; the request queues until one is released
+            self.pool_waits += 1
+            started_at = time.perf_counter()
+            curl = await pop_curl()
+            UPSTREAM_POOL_WAIT.labels().observe(time.perf_counter() - started_at)
+            return curl
+
+        def counted_release_curl(curl):
+            try:
+                connects = curl.getinfo(CurlInfo.NUM_CONNECTS)
+            except Exception:
+                connects = 0
+            self.requests += 1
+            if connects:
+                self.new_connections += 1
+                UPSTREAM_CONNECTIONS.labels("new").inc()
+            else:
+                UPSTREAM_CONNECTIONS.labels("reused").inc()
+            release_curl(curl)
+
+        session.pop_curl = timed_pop_curl
+        session.release_curl = counted_release_curl
+
+    def pool_stats(self, client: Any) -> Optional[Dict[str, int]]:
+        """
+        Handle pool utilization of a client's current session.
+
+        Args:
+            client: Gemini client
+
+        Returns:
+            Handles in use and pool size, or None if the client has no session
+        """
+        session = getattr(client, "client", None)
+        pool = getattr(session, "pool", None)
+        if pool is None:
+            return None
+        return {"in_use": session.max_clients - pool.qsize(), "size": session.max_clients}
+
+    def stats(self) -> Dict[str, Any]:
+        """Get transport settings and counters."""
+        return {
+            "max_connections": self.max_connections,
+            "http2": self.http2,
+            "keepalive_expiry": self.keepalive_expiry,
+            "connect_timeout": self.connect_timeout,
+            "total_timeout": self.total_timeout,
+            "requests": self.requests,
+            "new_connections": self.new_connections,
+            "pool_waits": self.pool_waits,
+        }
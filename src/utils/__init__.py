@@ -3,6 +3,6 @@ Utility functions and helpers.
 """
 
 from .logger import setup_logger
-from .exceptions import APIError, AuthenticationError
+from .exceptions import APIError, AuthenticationError, map_upstream_error
 
-__all__ = ["setup_logger", "APIError", "AuthenticationError"]
\ No newline at end of file
+__all__ = ["setup_logger", "APIError", "AuthenticationError", "map_upstream_error"]
\ No newline at end of file
@@ -2,19 +2,47 @@
 Custom exceptions for the FastAPI wrapper.
 """
 
+import asyncio
+from typing import Callable, Optional, Tuple
+
 
 class APIError(Exception):
     """Base API error."""
 
-    def __init__(self, message: str, status_code: int = 500):
+    # Error type reported in OpenAI-style error bodies
+    error_type = "api_error"
+
+    def __init__(
+        self,
+        message: str,
+        status_code: int = 500,
+        retryable: Optional[bool] = None,
+        retry_after: Optional[float] = None,
+    ):
+        """
+        Initialize the error.
+
+        Args:
+            message: Error message returned to the client
+            status_code: HTTP status code
+            retryable: Whether repeating the request may succeed; defaults to
+                True for 429 and 5xx responses other than 501
+            retry_after: Seconds the client should wait before retrying
+        """
         self.message = message
         self.status_code = status_code
+        if retryable is None:
+            retryable = status_code == 429 or (status_code >= 500 and status_code != 501)
+        self.retryable = retryable
+        self.retry_after = retry_after
         super().__init__(self.message)
 
 
 class AuthenticationError(APIError):
     """Authentication related error."""
 
+    error_type = "authentication_error"
+
     def __init__(self, message: str = "Authentication failed"):
         super().__init__(message, status_code=401)
 
@@ -22,13 +50,17 @@ class AuthenticationError(APIError):
 class RateLimitError(APIError):
     """Rate limit exceeded error."""
 
-    def __init__(self, message: str = "Rate limit exceeded"):
-        super().__init__(message, status_code=429)
+    error_type = "rate_limit_error"
+
+    def __init__(self, message: str = "Rate limit exceeded", retry_after: Optional[float] = None):
+        super().__init__(message, status_code=429, retry_after=retry_after)
 
 
 class ModelNotFoundError(APIError):
     """Model not found error."""
 
+    error_type = "invalid_request_error"
+
     def __init__(self, model: str):
         message = f"Model '{model}' not found"
         super().__init__(message, status_code=404)
@@ -37,5 +69,111 @@ class ModelNotFoundError(APIError):
 class InvalidRequestError(APIError):
     """Invalid request error."""
 
+    error_type = "invalid_request_error"
+
     def __init__(self, message: str = "Invalid request"):
-        super().__init__(message, status_code=400)
\ No newline at end of file
+        super().__init__(message, status_code=400)
+
+
+class PayloadTooLargeError(APIError):
+    """Request body over the size limit."""
+
+    error_type = "invalid_request_error"
+
+    def __init__(self, max_bytes: int):
+        message = f"Request body is larger than the limit of {max_bytes} bytes"
+        super().__init__(message, status_code=413)
+
+
+class ServiceUnavailableError(APIError):
+    """Server overloaded or request shed error."""
+
+    error_type = "service_unavailable_error"
+
+    def __init__(self, message: str = "Service temporarily unavailable", retry_after: Optional[float] = None):
+        super().__init__(message, status_code=503, retry_after=retry_after)
+
+
+class UpstreamTimeoutError(APIError):
+    """Gemini did not answer in time."""
+
+    error_type = "timeout_error"
+
+    def __init__(self, message: str = "Gemini did not respond in time"):
+        super().__init__(message, status_code=504)
+
+
+def _upstream_error_table() -> Tuple[Tuple[type, Callable[..., APIError]], ...]:
+    """
+    Map ``gemini_webapi`` exception types to API errors, most specific first.
+
+    Each factory takes the exception, the requested model and a retry-after
+    hint for quota errors.
+    """
+    # Imported on first use so importing the exceptions does not load gemini_webapi
+    from curl_cffi import CurlError
+    from curl_cffi.requests.exceptions import Timeout as CurlTimeout
+    from gemini_webapi import exceptions as gemini
+
+    return (
+        (gemini.AuthError, lambda e, model, retry_after: AuthenticationError(
+            "Authentication with Gemini failed"
+        )),
+        (gemini.UsageLimitExceededError, lambda e, model, retry_after: RateLimitError(
+            "Gemini usage limit exceeded", retry_after=retry_after
+        )),
+        (gemini.TemporarilyBlockedError, lambda e, model, retry_after: RateLimitError(
+            "Gemini temporarily blocked requests from this server", retry_after=retry_after
+        )),
+        (gemini.ModelInvalidError, lambda e, model, retry_after: ModelNotFoundError(model)),
+        (gemini.TimeoutError, lambda e, model, retry_after: UpstreamTimeoutError()),
+        # Unhandled Gemini server errors are usually transient
+        (gemini.GeminiError, lambda e, model, retry_after: APIError(
+            f"Gemini returned an error: {str(e)}", 502
+        )),
+        # Response parsing failures repeat until the client library is fixed
+        (gemini.APIError, lambda e, model, retry_after: APIError(
+            f"Failed to parse the Gemini response: {str(e)}", 502, retryable=False
+        )),
+        # Transport failures; asyncio.TimeoutError is an OSError, so timeouts come first
+        (CurlTimeout, lambda e, model, retry_after: UpstreamTimeoutError()),
+        (asyncio.TimeoutError, lambda e, model, retry_after: UpstreamTimeoutError()),
+        (CurlError, lambda e, model, retry_after: APIError(
+            f"Network error while calling Gemini: {str(e)}", 502
+        )),
+        (OSError, lambda e, model, retry_after: APIError(
+            f"Network error while calling Gemini: {str(e)}", 502
+        )),
+    )
+
+
+_UPSTREAM_ERRORS: Optional[Tuple[Tuple[type, Callable[..., APIError]], ...]] = None
+
+
+def map_upstream_error(
+    error: BaseException,
+    model: Optional[str] = None,
+    retry_after: Optional[float] = None,
+) -> APIError:
+    """
+    Convert an exception raised while calling Gemini to an API error.
+
+    Args:
+        error: Exception raised by the upstream call
+        model: Requested model, reported by model errors
+        retry_after: Seconds until an account is expected to have quota again
+
+    Returns:
+        Matching API error; unknown exceptions, such as bugs in the
+        wrapper, become a 500 that is not retried
+    """
+    global _UPSTREAM_ERRORS
+    if isinstance(error, APIError):
+        return error
+    if _UPSTREAM_ERRORS is None:
+        _UPSTREAM_ERRORS = _upstream_error_table()
+
+    for error_class, factory in _UPSTREAM_ERRORS:
+        if isinstance(error, error_class):
+            return factory(error, model, retry_after)
+    return APIError(f"Failed to generate completion: {str(error)}", 500, retryable=False)
@@ -1,46 +1,222 @@
 """
 Logging configuration.
+
+Records are handed to a bounded queue on the calling thread and written
+by a background listener, so a slow stdout never blocks the event loop.
+When the queue is full, records are dropped instead of waiting.
 """
 
+import atexit
+import copy
 import logging
+import queue
 import sys
-from typing import Optional
+import threading
+import time
+from contextvars import ContextVar
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Dict, List, Optional, Tuple
+
+from .serialization import dumps
+
+# ID of the request being handled, attached to every record logged for it
+request_id_var: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+
+# Standard LogRecord attributes; anything else was passed through ``extra``
+_RECORD_ATTRIBUTES = frozenset(vars(logging.makeLogRecord({}))) | {"message", "asctime", "request_id"}
+
+_handler: Optional["NonBlockingQueueHandler"] = None
+_listener: Optional["_QueueListener"] = None
+_sampler: Optional["LogSampler"] = None
+
+
+class JSONFormatter(logging.Formatter):
+    """Formats records as one JSON object per line."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        payload: Dict[str, Any] = {
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created)) + f".{int(record.msecs):03d}Z",
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        request_id = getattr(record, "request_id", None)
+        if request_id:
+            payload["request_id"] = request_id
+
+        # Timing and other fields passed through ``extra``
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRIBUTES:
+                payload[key] = value
+
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            payload["exception"] = record.exc_text
+        return dumps(payload, default=str).decode("utf-8")
+
+
+class LogSampler(logging.Filter):
+    """
+    Rate-limits repetitive records per call site.
+
+    At most ``burst`` records below WARNING pass per source line and
+    window; the number suppressed is reported on the next record that
+    passes from the same line.
+    """
+
+    def __init__(self, burst: int = 20, window: float = 1.0):
+        """
+        Initialize the sampler.
+
+        Args:
+            burst: Records let through per call site and window
+            window: Window length in seconds
+        """
+        super().__init__()
+        self.burst = burst
+        self.window = window
+        self.suppressed = 0
+        # (path, line) -> [window start, records passed, records suppressed]
+        self._sites: Dict[Tuple[str, int], List[float]] = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+
+        key = (record.pathname, record.lineno)
+        with self._lock:
+            site = self._sites.get(key)
+            if site is None or record.created - site[0] >= self.window:
+                if site is not None and site[2]:
+                    record.suppressed = int(site[2])
+                self._sites[key] = [record.created, 1, 0]
+                return True
+            if site[1] < self.burst:
+                site[1] += 1
+                return True
+            site[2] += 1
+            self.suppressed += 1
+            return False
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """Queue handler that drops records instead of blocking when the queue is full."""
+
+    def __init__(self, log_queue: queue.Queue):
+        """
+        Initialize the handler.
+
+        Args:
+            log_queue: Bounded queue drained by the background listener
+        """
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        """Capture the request ID and resolve the message; formatting happens on the writer."""
+        record = copy.copy(record)
+        record.request_id = request_id_var.get()
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            # Tracebacks reference frames that may change before the writer runs
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class _QueueListener(QueueListener):
+    """Queue listener whose stop waits for room in a full queue."""
+
+    def enqueue_sentinel(self) -> None:
+        # Stopping flushes the queue, so the sentinel must not be dropped
+        self.queue.put(self._sentinel)
 
 
 def setup_logger(
     name: Optional[str] = None,
     level: str = "INFO",
     format_string: Optional[str] = None,
+    json_format: bool = False,
+    queue_size: int = 10000,
+    sample_burst: int = 0,
+    sample_window: float = 1.0,
 ) -> logging.Logger:
     """
     Set up logger with consistent formatting.
 
+    Records of the logger and its children are queued and written to
+    stdout by a background thread. Calling it again replaces the pipeline.
+
     Args:
         name: Logger name
         level: Logging level
-        format_string: Custom format string
+        format_string: Custom format string for plain text output
+        json_format: Write one JSON object per record instead of text
+        queue_size: Records buffered before new ones are dropped
+        sample_burst: Records below WARNING let through per call site and
+            window; 0 disables sampling
+        sample_window: Sampling window in seconds
 
     Returns:
         Configured logger
     """
+    global _handler, _listener, _sampler
+
     if format_string is None:
         format_string = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
 
     logger = logging.getLogger(name or __name__)
     logger.setLevel(getattr(logging, level.upper()))
 
-    # Clear existing handlers
+    # Clear existing handlers, flushing the previous pipeline
     logger.handlers.clear()
+    stop_logging()
+
+    # The writer runs on its own thread, off the event loop
+    stream_handler = logging.StreamHandler(sys.stdout)
+    stream_handler.setFormatter(JSONFormatter() if json_format else logging.Formatter(format_string))
+
+    _handler = NonBlockingQueueHandler(queue.Queue(max(1, queue_size)))
+    _handler.setLevel(getattr(logging, level.upper()))
+    _sampler = None
+    if sample_burst > 0:
+        _sampler = LogSampler(sample_burst, sample_window)
+        _handler.addFilter(_sampler)
+
+    _listener = _QueueListener(_handler.queue, stream_handler)
+    _listener.start()
+    logger.addHandler(_handler)
+
+    return logger
+
+
+def stop_logging() -> None:
+    """Write the queued records and stop the background writer."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
 
-    # Create console handler
-    handler = logging.StreamHandler(sys.stdout)
-    handler.setLevel(getattr(logging, level.upper()))
 
-    # Create formatter
-    formatter = logging.Formatter(format_string)
-    handler.setFormatter(formatter)
+def logging_stats() -> Dict[str, int]:
+    """Queue depth and records dropped by the logging pipeline."""
+    if _handler is None:
+        return {"queued": 0, "dropped": 0, "suppressed": 0}
+    return {
+        "queued": _handler.queue.qsize(),
+        "dropped": _handler.dropped,
+        "suppressed": _sampler.suppressed if _sampler else 0,
+    }
 
-    # Add handler to logger
-    logger.addHandler(handler)
 
-    return logger
\ No newline at end of file
+# Flush records still queued when the interpreter exits, e.g. serverless instances
+atexit.register(stop_logging)
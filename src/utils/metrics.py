@@ -0,0 +1,237 @@
+"""
+Lightweight Prometheus-style metrics.
+"""
+
+import bisect
+import threading
+from typing import List, Dict, Any, Tuple, Callable, Iterable
+
+# Latency buckets in seconds, covering fast conversions up to long generations
+DEFAULT_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+    1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0,
+)
+
+# A collector returns (name, type, help, [(labels, value), ...]) tuples at scrape time
+Collector = Callable[[], Iterable[Tuple[str, str, str, List[Tuple[Dict[str, str], float]]]]]
+
+
+def _escape(value: Any) -> str:
+    """Escape a label value for the exposition format."""
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _format_labels(labelnames: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    """Render a label set in exposition format."""
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(labelnames, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    """Render a sample value in exposition format."""
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class _Metric:
+    """Base class of a labelled metric family."""
+
+    type_name = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], Any] = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values: str) -> Any:
+        """Get the child metric for a label set; children are cached."""
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(values, self._new_child())
+        return child
+
+    def _new_child(self) -> Any:
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        """Render the family in exposition format."""
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.type_name}",
+        ]
+        for values, child in list(self._children.items()):
+            lines.extend(self._render_child(values, child))
+        return lines
+
+    def _render_child(self, values: Tuple[str, ...], child: Any) -> List[str]:
+        return [f"{self.name}{_format_labels(self.labelnames, values)} {_format_value(child.value)}"]
+
+
+class _Value:
+    """Single numeric sample."""
+
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.value += amount
+
+    def dec(self, amount: float = 1.0) -> None:
+        self.value -= amount
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+
+class Counter(_Metric):
+    """Monotonically increasing counter."""
+
+    type_name = "counter"
+
+    def _new_child(self) -> _Value:
+        return _Value()
+
+
+class Gauge(_Metric):
+    """Value that can go up and down."""
+
+    type_name = "gauge"
+
+    def _new_child(self) -> _Value:
+        return _Value()
+
+
+class _HistogramValue:
+    """Bucketed observations of one label set."""
+
+    __slots__ = ("upper_bounds", "counts", "sum")
+
+    def __init__(self, upper_bounds: Tuple[float, ...]):
+        self.upper_bounds = upper_bounds
+        self.counts = [0] * (len(upper_bounds) + 1)
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.upper_bounds, value)] += 1
+        self.sum += value
+
+
+class Histogram(_Metric):
+    """Distribution of observations in cumulative buckets."""
+
+    type_name = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Tuple[str, ...] = (),
+        buckets: Tuple[float, ...] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self) -> _HistogramValue:
+        return _HistogramValue(self.buckets)
+
+    def _render_child(self, values: Tuple[str, ...], child: _HistogramValue) -> List[str]:
+        lines = []
+        cumulative = 0
+        for upper_bound, count in zip(self.buckets + (float("inf"),), child.counts):
+            cumulative += count
+            labels = _format_labels(self.labelnames, values, f'le="{_format_value(upper_bound)}"')
+            lines.append(f"{self.name}_bucket{labels} {cumulative}")
+        labels = _format_labels(self.labelnames, values)
+        lines.append(f"{self.name}_sum{labels} {_format_value(child.sum)}")
+        lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    """Holds metric families and scrape-time collectors."""
+
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+        self._collectors: List[Collector] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        """Register a metric family."""
+        self._metrics.append(metric)
+        return metric
+
+    def add_collector(self, collector: Collector) -> None:
+        """Register a callback sampling external state at scrape time."""
+        self._collectors.append(collector)
+
+    def clear_collectors(self) -> None:
+        """Remove every scrape-time collector."""
+        self._collectors.clear()
+
+    def render(self) -> str:
+        """Render every metric in Prometheus text exposition format."""
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+
+        for collector in self._collectors:
+            for name, type_name, documentation, samples in collector():
+                lines.append(f"# HELP {name} {documentation}")
+                lines.append(f"# TYPE {name} {type_name}")
+                for labels, value in samples:
+                    labelnames = tuple(labels)
+                    values = tuple(labels[label] for label in labelnames)
+                    lines.append(f"{name}{_format_labels(labelnames, values)} {_format_value(value)}")
+
+        return "\n".join(lines) + "\n"
+
+
+# Default registry and the wrapper's metric families
+REGISTRY = MetricsRegistry()
+
+REQUESTS = REGISTRY.register(Counter(
+    "gemini_wrapper_requests_total",
+    "Completed API requests.",
+    ("model", "endpoint", "status"),
+))
+REQUEST_LATENCY = REGISTRY.register(Histogram(
+    "gemini_wrapper_request_duration_seconds",
+    "Request latency split by processing stage.",
+    ("model", "endpoint", "stage"),
+))
+UPSTREAM_TTFB = REGISTRY.register(Histogram(
+    "gemini_wrapper_upstream_ttfb_seconds",
+    "Time until the first upstream output arrived.",
+    ("model", "endpoint"),
+))
+TOKENS = REGISTRY.register(Counter(
+    "gemini_wrapper_tokens_total",
+    "Prompt and completion tokens reported in responses.",
+    ("model", "endpoint", "direction"),
+))
+ERRORS = REGISTRY.register(Counter(
+    "gemini_wrapper_errors_total",
+    "Failed requests by error type.",
+    ("model", "endpoint", "type"),
+))
+INFLIGHT = REGISTRY.register(Gauge(
+    "gemini_wrapper_inflight_requests",
+    "Requests currently being processed.",
+    ("model", "endpoint"),
+))
+UPSTREAM_POOL_WAIT = REGISTRY.register(Histogram(
+    "gemini_wrapper_upstream_pool_wait_seconds",
+    "Time upstream requests waited for a free connection of their account.",
+))
+UPSTREAM_CONNECTIONS = REGISTRY.register(Counter(
+    "gemini_wrapper_upstream_connections_total",
+    "Upstream requests by whether they opened a new connection or reused one.",
+    ("outcome",),
+))
@@ -0,0 +1,194 @@
+"""
+Token counting for usage reporting.
+"""
+
+import hashlib
+import re
+from collections import OrderedDict
+from typing import Iterable, Optional, Sequence, Union
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Han ideographs, kana, Hangul syllables and half-width katakana
+_CJK_CHARS = "\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\uac00-\ud7af\uff66-\uff9f"
+
+# Part of a prompt: a string, or the fragments the part is joined from
+PromptPart = Union[str, Sequence[str]]
+
+# Texts longer than this are memoized under a digest rather than the text itself
+_CACHE_KEY_CHARS = 256
+
+# Every match is one token, so counting runs entirely inside the regex engine:
+# a CJK character, up to six Latin letters, up to three digits, a run of
+# whitespace, or up to two other letters or symbols. Single spaces are
+# folded into the following token.
+_TOKEN_PATTERN = re.compile(
+    rf"[{_CJK_CHARS}]"
+    r"|[A-Za-z]{1,6}"
+    r"|[0-9]{1,3}"
+    r"|\s{2,}"
+    r"|[^\W\d_]{1,2}"
+    r"|[^\w\s]{1,2}"
+    r"|_{1,2}"
+)
+
+
+class TokenCounter:
+    """Base class of token counters; subclasses implement ``count``."""
+
+    name = "base"
+
+    def __init__(self, cache_size: int = 4096):
+        """
+        Initialize the counter.
+
+        Args:
+            cache_size: Number of distinct texts whose counts are memoized
+        """
+        self.cache_size = max(0, cache_size)
+        # Text or digest -> count, from least to most recently used
+        self._cache: "OrderedDict[Union[str, bytes], int]" = OrderedDict()
+
+    def count(self, text: str) -> int:
+        """
+        Count the tokens of a text.
+
+        Args:
+            text: Text to count
+
+        Returns:
+            Token count
+        """
+        raise NotImplementedError
+
+    def count_cached(self, text: str) -> int:
+        """
+        Count the tokens of a text, memoizing the count.
+
+        Conversations resend earlier turns, so per-message counts repeat a
+        lot. Long texts are remembered by a digest, so the cache never keeps
+        whole prompts alive.
+
+        Args:
+            text: Text to count
+
+        Returns:
+            Token count
+        """
+        if len(text) <= _CACHE_KEY_CHARS:
+            key: Union[str, bytes] = text
+        else:
+            key = hashlib.blake2b(text.encode("utf-8", "surrogatepass"), digest_size=16).digest()
+        count = self._cache.get(key)
+        if count is not None:
+            self._cache.move_to_end(key)
+            return count
+
+        count = self.count(text)
+        if self.cache_size:
+            self._cache[key] = count
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return count
+
+    def count_prompt(self, parts: Iterable[PromptPart], separator: str = "\n\n") -> int:
+        """
+        Count the tokens of a prompt joined from separately memoized parts.
+
+        Parts given as fragments are counted fragment by fragment, so they
+        are never joined again just to be counted.
+
+        Args:
+            parts: Prompt parts, typically one per message
+            separator: String the parts are joined with
+
+        Returns:
+            Token count of the joined prompt
+        """
+        total = 0
+        count = 0
+        for part in parts:
+            if isinstance(part, str):
+                total += self.count_cached(part)
+            else:
+                total += sum(self.count_cached(fragment) for fragment in part)
+            count += 1
+        if count > 1:
+            total += (count - 1) * self.count_cached(separator)
+        return total
+
+
+class HeuristicTokenCounter(TokenCounter):
+    """
+    Fast offline estimate tuned for mixed CJK, prose and code.
+
+    CJK characters count as one token each, Latin words as one token per
+    six letters, digits in groups of three, and punctuation in pairs.
+    """
+
+    name = "heuristic"
+
+    def count(self, text: str) -> int:
+        """Estimate the tokens of a text."""
+        if not text:
+            return 0
+
+        return max(1, _TOKEN_PATTERN.subn("", text)[1])
+
+
+class TiktokenCounter(TokenCounter):
+    """Exact BPE counts using tiktoken."""
+
+    name = "tiktoken"
+
+    def __init__(self, encoding: str = "o200k_base", cache_size: int = 4096):
+        """
+        Initialize the counter.
+
+        Args:
+            encoding: tiktoken encoding name
+            cache_size: Number of distinct texts whose counts are memoized
+
+        Raises:
+            ImportError: If tiktoken is not installed
+        """
+        import tiktoken
+
+        self.encoding = tiktoken.get_encoding(encoding)
+        super().__init__(cache_size)
+
+    def count(self, text: str) -> int:
+        """Count the BPE tokens of a text."""
+        if not text:
+            return 0
+        return len(self.encoding.encode(text, disallowed_special=()))
+
+
+def create_token_counter(
+    backend: str = "heuristic",
+    encoding: Optional[str] = None,
+    cache_size: int = 4096,
+) -> TokenCounter:
+    """
+    Create the configured token counter.
+
+    Falls back to the heuristic counter if tiktoken is unavailable.
+
+    Args:
+        backend: "heuristic" or "tiktoken"
+        encoding: tiktoken encoding name
+        cache_size: Number of distinct texts whose counts are memoized
+
+    Returns:
+        Token counter
+    """
+    if backend == "tiktoken":
+        try:
+            return TiktokenCounter(encoding or "o200k_base", cache_size)
+        except Exception as e:
+            logger.warning(f"tiktoken is unavailable, using heuristic token counts: {str(e)}")
+    elif backend != "heuristic":
+        logger.warning(f"Unknown tokenizer backend '{backend}', using heuristic token counts")
+    return HeuristicTokenCounter(cache_size)
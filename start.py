@@ -30,6 +30,8 @@ if __name__ == "__main__":
     print(f"📍 Server will be available at: http://{settings.host}:{settings.port}")
     print(f"📚 API Documentation: http://{settings.host}:{settings.port}/docs")
     print(f"🔍 Health Check: http://{settings.host}:{settings.port}/health")
+    if settings.workers > 1 and not settings.debug:
+        print(f"⚙️  Workers: {settings.workers}")
     print()
 
     uvicorn.run(
@@ -37,6 +39,8 @@ if __name__ == "__main__":
         host=settings.host,
         port=settings.port,
         reload=settings.debug,
+        workers=settings.workers,
+        timeout_graceful_shutdown=settings.shutdown_drain_timeout,
         log_level=settings.log_level.lower(),
         app_dir=str(src_dir),
     )
\ No newline at end of file
@@ -0,0 +1,25 @@
+"""
+Shared fixtures for the unit tests.
+
+Upstream calls are served by the fake Gemini client from the benchmarks,
+so the tests need neither cookies nor network access.
+"""
+
+import os
+import sys
+
+import pytest
+
+# Make the src package and the benchmark helpers importable
+ROOT = os.path.join(os.path.dirname(__file__), '..')
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+
+import fake_gemini
+
+
+@pytest.fixture
+def gemini():
+    """Fake Gemini client answering after a short simulated latency."""
+    fake_gemini.configure(latency=0.05, chunks=4, chunk_interval=0.02, seed=0)
+    return fake_gemini.FakeGeminiClient()
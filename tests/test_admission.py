@@ -0,0 +1,129 @@
+"""
+Tests for admission control, load shedding and priority queueing.
+"""
+
+import asyncio
+import time
+
+import pytest
+
+from src.services.admission import PRIORITY_CLASSES, AdmissionController
+from src.utils.exceptions import ServiceUnavailableError
+
+HIGH = PRIORITY_CLASSES["high"]
+NORMAL = PRIORITY_CLASSES["normal"]
+LOW = PRIORITY_CLASSES["low"]
+
+
+async def generate(controller, gemini, name, order, priority=NORMAL, deadline=None):
+    """Run one fake upstream call inside an admitted slot."""
+    async with controller.admit(priority, deadline):
+        order.append(name)
+        return await gemini.generate_content(name)
+
+
+def test_full_queue_sheds_with_503(gemini):
+    async def main():
+        controller = AdmissionController(max_concurrency=1, max_queue=1)
+        order = []
+        running = asyncio.create_task(generate(controller, gemini, "running", order))
+        await asyncio.sleep(0)
+        queued = asyncio.create_task(generate(controller, gemini, "queued", order))
+        await asyncio.sleep(0)
+
+        with pytest.raises(ServiceUnavailableError) as shed:
+            await generate(controller, gemini, "shed", order)
+        await asyncio.gather(running, queued)
+        return controller, order, shed.value
+
+    controller, order, error = asyncio.run(main())
+    assert error.status_code == 503
+    assert order == ["running", "queued"]
+    assert controller.shed_queue_full == 1
+    assert controller.stats()["active"] == 0
+
+
+def test_expired_deadline_is_shed_before_queueing(gemini):
+    async def main():
+        controller = AdmissionController(max_concurrency=1, max_queue=1)
+        with pytest.raises(ServiceUnavailableError) as shed:
+            await generate(controller, gemini, "late", [], deadline=time.monotonic())
+        return controller, shed.value
+
+    controller, error = asyncio.run(main())
+    assert error.status_code == 503
+    assert controller.shed_deadline == 1
+    assert controller.stats()["active"] == 0
+
+
+def test_queued_request_is_shed_when_its_deadline_passes(gemini):
+    async def main():
+        controller = AdmissionController(max_concurrency=1, max_queue=4)
+        order = []
+        running = asyncio.create_task(generate(controller, gemini, "running", order))
+        await asyncio.sleep(0)
+
+        with pytest.raises(ServiceUnavailableError) as shed:
+            await generate(controller, gemini, "late", order, deadline=time.monotonic() + 0.01)
+        await running
+        return controller, order, shed.value
+
+    controller, order, error = asyncio.run(main())
+    assert error.status_code == 503
+    assert order == ["running"]
+    assert controller.shed_deadline == 1
+    assert controller.stats()["queued"] == 0
+
+
+def test_urgent_request_sheds_lower_priority_waiter(gemini):
+    async def main():
+        controller = AdmissionController(max_concurrency=1, max_queue=1)
+        order = []
+        running = asyncio.create_task(generate(controller, gemini, "running", order))
+        await asyncio.sleep(0)
+        low = asyncio.create_task(generate(controller, gemini, "low", order, LOW))
+        await asyncio.sleep(0)
+        high = asyncio.create_task(generate(controller, gemini, "high", order, HIGH))
+
+        results = await asyncio.gather(running, low, high, return_exceptions=True)
+        return controller, order, results
+
+    controller, order, results = asyncio.run(main())
+    assert isinstance(results[1], ServiceUnavailableError)
+    assert results[1].status_code == 503
+    assert order == ["running", "high"]
+    assert controller.shed_queue_full == 1
+
+
+def test_lower_priority_waiter_is_not_shed_for_equal_priority(gemini):
+    async def main():
+        controller = AdmissionController(max_concurrency=1, max_queue=1)
+        order = []
+        running = asyncio.create_task(generate(controller, gemini, "running", order))
+        await asyncio.sleep(0)
+        queued = asyncio.create_task(generate(controller, gemini, "queued", order, LOW))
+        await asyncio.sleep(0)
+        with pytest.raises(ServiceUnavailableError):
+            await generate(controller, gemini, "shed", order, LOW)
+        await asyncio.gather(running, queued)
+        return order
+
+    assert asyncio.run(main()) == ["running", "queued"]
+
+
+def test_waiters_are_admitted_by_priority(gemini):
+    async def main():
+        controller = AdmissionController(max_concurrency=1, max_queue=8)
+        order = []
+        running = asyncio.create_task(generate(controller, gemini, "running", order))
+        await asyncio.sleep(0)
+        waiters = []
+        for name, priority in (("low", LOW), ("normal", NORMAL), ("high", HIGH)):
+            waiters.append(asyncio.create_task(generate(controller, gemini, name, order, priority)))
+            await asyncio.sleep(0)
+        await asyncio.gather(running, *waiters)
+        return controller, order
+
+    controller, order = asyncio.run(main())
+    assert order == ["running", "high", "normal", "low"]
+    assert controller.admitted == 4
@@ -0,0 +1,124 @@
+"""
+Tests for the token-bucket rate limiting middleware and its backends.
+"""
+
+import asyncio
+
+import httpx
+import pytest
+from fastapi import FastAPI
+from pydantic import ValidationError
+
+from config.settings import Settings
+from src.middleware import MemoryRateLimitBackend, RateLimitMiddleware, SQLiteRateLimitBackend
+
+
+def build_app(gemini, backend, **kwargs):
+    """Chat endpoint answered by the fake client, behind the rate limiter."""
+    app = FastAPI()
+
+    @app.post("/v1/chat/completions")
+    async def chat():
+        response = await gemini.generate_content("hi")
+        return {"text": response.text}
+
+    @app.get("/health")
+    async def health():
+        return {"status": "ok"}
+
+    return RateLimitMiddleware(app, backend=backend, **kwargs)
+
+
+async def post_many(app, count, headers=None):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        return [
+            await client.post("/v1/chat/completions", headers=headers)
+            for _ in range(count)
+        ]
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def backend(request, tmp_path):
+    """Every test runs against both bucket backends."""
+    if request.param == "memory":
+        backend = MemoryRateLimitBackend()
+    else:
+        backend = SQLiteRateLimitBackend(str(tmp_path / "rate_limit.db"))
+    yield backend
+    backend.close()
+
+
+def test_exhausted_bucket_returns_429_with_retry_after(gemini, backend):
+    app = build_app(gemini, backend, requests=2, window=60)
+    responses = asyncio.run(post_many(app, 3))
+
+    assert [response.status_code for response in responses] == [200, 200, 429]
+    assert responses[0].headers["x-ratelimit-limit-requests"] == "2"
+    assert responses[1].headers["x-ratelimit-remaining-requests"] == "0"
+
+    limited = responses[2]
+    # One token refills every 30 seconds
+    assert 1 <= int(limited.headers["retry-after"]) <= 30
+    assert limited.json()["error"]["type"] == "rate_limit_error"
+
+
+def test_burst_sets_bucket_capacity(gemini, backend):
+    app = build_app(gemini, backend, requests=1, window=60, burst=3)
+    responses = asyncio.run(post_many(app, 4))
+
+    assert [response.status_code for response in responses] == [200, 200, 200, 429]
+
+
+def test_paths_outside_prefixes_are_not_limited(gemini, backend):
+    app = build_app(gemini, backend, requests=1, window=60)
+
+    async def main():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return [await client.get("/health") for _ in range(3)]
+
+    responses = asyncio.run(main())
+    assert [response.status_code for response in responses] == [200, 200, 200]
+    assert "x-ratelimit-limit-requests" not in responses[0].headers
+
+
+def test_only_configured_api_keys_get_their_own_bucket(gemini, backend):
+    app = build_app(gemini, backend, requests=1, window=60, api_keys=["sk-known"])
+
+    async def main():
+        known = await post_many(app, 2, {"Authorization": "Bearer sk-known"})
+        # Unknown keys share the bucket of the client IP
+        unknown = await post_many(app, 1, {"Authorization": "Bearer sk-random-1"})
+        unknown += await post_many(app, 1, {"Authorization": "Bearer sk-random-2"})
+        return known, unknown
+
+    known, unknown = asyncio.run(main())
+    assert [response.status_code for response in known] == [200, 429]
+    assert [response.status_code for response in unknown] == [200, 429]
+
+
+def test_sqlite_buckets_are_shared_between_workers(gemini, tmp_path):
+    path = str(tmp_path / "rate_limit.db")
+    backends = [SQLiteRateLimitBackend(path), SQLiteRateLimitBackend(path)]
+    try:
+        workers = [build_app(gemini, backend, requests=2, window=60) for backend in backends]
+
+        async def main():
+            responses = []
+            for worker in workers + workers:
+                responses += await post_many(worker, 1)
+            return responses
+
+        responses = asyncio.run(main())
+    finally:
+        for backend in backends:
+            backend.close()
+
+    assert [response.status_code for response in responses] == [200, 200, 429, 429]
+
+
+@pytest.mark.parametrize("field", ["rate_limit_requests", "rate_limit_window"])
+def test_settings_reject_non_positive_limits(field):
+    with pytest.raises(ValidationError):
+        Settings(**{field: 0})
@@ -0,0 +1,142 @@
+"""
+Tests for single-flight coalescing of upstream calls and streams.
+"""
+
+import asyncio
+from contextlib import aclosing
+
+import pytest
+
+import fake_gemini
+from src.services.single_flight import SingleFlight
+
+
+def test_concurrent_calls_share_one_upstream_call(gemini):
+    async def main():
+        flight = SingleFlight()
+        results = await asyncio.gather(*[
+            flight.do("key", lambda: gemini.generate_content("hi")) for _ in range(5)
+        ])
+        return flight, results
+
+    flight, results = asyncio.run(main())
+    assert fake_gemini.stats.calls == 1
+    assert len({id(result) for result in results}) == 1
+    assert flight.stats() == {"upstream_calls": 1, "coalesced": 4, "in_flight": 0}
+
+
+def test_cancelled_waiter_leaves_shared_call_running(gemini):
+    async def main():
+        flight = SingleFlight()
+        first = asyncio.create_task(flight.do("key", lambda: gemini.generate_content("hi")))
+        second = asyncio.create_task(flight.do("key", lambda: gemini.generate_content("hi")))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        result = await second
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return flight, result
+
+    flight, result = asyncio.run(main())
+    assert result.text
+    assert fake_gemini.stats.calls == 1
+    assert flight.stats()["in_flight"] == 0
+
+
+def test_shared_call_is_cancelled_once_every_waiter_left(gemini):
+    cancelled = []
+
+    async def call():
+        try:
+            return await gemini.generate_content("hi")
+        except asyncio.CancelledError:
+            cancelled.append(True)
+            raise
+
+    async def main():
+        flight = SingleFlight()
+        waiters = [asyncio.create_task(flight.do("key", call)) for _ in range(2)]
+        await asyncio.sleep(0.01)
+        for waiter in waiters:
+            waiter.cancel()
+        await asyncio.gather(*waiters, return_exceptions=True)
+        await asyncio.sleep(0)
+        assert flight.stats()["in_flight"] == 0
+
+        # The abandoned call is not joined by later requests
+        await flight.do("key", call)
+        return flight
+
+    flight = asyncio.run(main())
+    assert cancelled == [True]
+    assert flight.upstream_calls == 2
+
+
+def test_late_subscriber_replays_stream_from_the_start(gemini):
+    async def stream():
+        async for output in gemini.generate_content_stream("hi"):
+            yield output.text_delta
+
+    async def collect(flight, halfway=None):
+        items = []
+        async for item in flight.subscribe("key", stream):
+            items.append(item)
+            if halfway is not None and len(items) == 2:
+                halfway.set()
+        return items
+
+    async def main():
+        flight = SingleFlight()
+        halfway = asyncio.Event()
+        first = asyncio.create_task(collect(flight, halfway))
+        await halfway.wait()
+        second = asyncio.create_task(collect(flight))
+        return flight, await first, await second
+
+    flight, first, second = asyncio.run(main())
+    assert len(first) == 4
+    assert second == first
+    assert fake_gemini.stats.calls == 1
+    assert flight.stats() == {"upstream_calls": 1, "coalesced": 1, "in_flight": 0}
+
+
+def test_stream_error_reaches_every_subscriber(gemini):
+    fake_gemini.configure(latency=0.05, error_rate=1.0)
+
+    async def stream():
+        async for output in gemini.generate_content_stream("hi"):
+            yield output.text_delta
+
+    async def collect(flight):
+        return [item async for item in flight.subscribe("key", stream)]
+
+    async def main():
+        flight = SingleFlight()
+        return await asyncio.gather(collect(flight), collect(flight), return_exceptions=True)
+
+    results = asyncio.run(main())
+    assert [type(result) for result in results] == [RuntimeError, RuntimeError]
+    assert fake_gemini.stats.calls == 1
+
+
+def test_upstream_stream_closes_when_last_subscriber_leaves(gemini):
+    closed = []
+
+    async def stream():
+        try:
+            async for output in gemini.generate_content_stream("hi"):
+                yield output.text_delta
+        finally:
+            closed.append(True)
+
+    async def main():
+        flight = SingleFlight()
+        async with aclosing(flight.subscribe("key", stream)) as items:
+            async for _ in items:
+                break
+        await asyncio.sleep(0.01)
+        return flight
+
+    flight = asyncio.run(main())
+    assert closed == [True]
+    assert flight.stats()["in_flight"] == 0